@@ -0,0 +1,143 @@
+import codecs
+import csv
+import json
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+from app.domain.models import Book
+
+# レスポンスに含めるエラー行の上限（件数自体はerror_countで全件数える）
+MAX_REPORTED_ERRORS = 1000
+
+@dataclass
+class BookImportResult:
+    """一括インポートの結果"""
+    imported: int = 0
+    error_count: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, line: int, message: str) -> None:
+        """行単位のエラーを記録する"""
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """バイト列のストリームをUTF-8の行に分割する（行全体を溜め込まない）"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def book_from_row(row: Dict[str, Any]) -> Book:
+    """1行分のデータを検証して本に変換する"""
+    title = row.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("タイトルは必須です")
+
+    borrower_name = row.get("borrower_name") or None
+    if borrower_name is not None and not isinstance(borrower_name, str):
+        raise ValueError("borrower_nameは文字列で指定してください")
+
+    return_date: Optional[date] = None
+    raw_date = row.get("return_date") or None
+    if raw_date is not None:
+        try:
+            return_date = date.fromisoformat(raw_date)
+        except (TypeError, ValueError):
+            raise ValueError(f"return_dateの形式が不正です: {raw_date}")
+
+    if (borrower_name is None) != (return_date is None):
+        raise ValueError("borrower_nameとreturn_dateは両方指定してください")
+
+    return Book(id=0, title=title.strip(), borrower_name=borrower_name, return_date=return_date)
+
+class _NeedMoreLines(Exception):
+    """csv.readerが次の行を読もうとしたが、まだ届いていない"""
+
+class _LineFeed:
+    """csv.readerに行を渡す入力口（届いた分だけ積んでおき、尽きたら_NeedMoreLinesにする）"""
+
+    def __init__(self):
+        self.lines: Deque[str] = deque()
+
+    def __iter__(self) -> Iterator[str]:
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise _NeedMoreLines
+        return self.lines.popleft()
+
+async def iter_csv_records(lines: AsyncIterator[str], result: BookImportResult) -> AsyncIterator[Tuple[int, List[str]]]:
+    """CSVの行を1つのcsv.readerで読み、レコードごとに先頭の行番号と値を返す
+
+    レコードの区切りはcsv.reader自身が決める。引用符で囲んだ値の途中で行が尽きると
+    readerが次の行を求めるので、そのレコードの行を取っておき、次の行と合わせて読み直す。
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    record: List[str] = []
+    line_no = 0
+    start = 0
+    async for line in lines:
+        line_no += 1
+        if not record:
+            if not line.strip():
+                continue
+            start = line_no
+        record.append(line + "\n")
+        feed.lines.extend(record)
+        try:
+            values = next(reader)
+        except _NeedMoreLines:
+            continue
+        record = []
+        yield start, values
+    if record:
+        result.add_error(start, "引用符が閉じられていません")
+
+async def parse_books(lines: AsyncIterator[str], fmt: str, result: BookImportResult) -> AsyncIterator[Book]:
+    """CSVまたはNDJSONの行を順に検証し、正しい行だけを本として返す
+
+    CSVは1行目をヘッダーとして扱い、1冊を1レコードで表す（値の中の改行は引用符で囲む）。
+    不正な行はresultにエラーとして記録して読み飛ばす。
+    """
+    if fmt == "csv":
+        header: Optional[List[str]] = None
+        async for line_no, values in iter_csv_records(lines, result):
+            try:
+                if header is None:
+                    names = [name.strip() for name in values]
+                    if "title" not in names:
+                        raise ValueError("ヘッダーにtitle列がありません")
+                    header = names
+                    continue
+                yield book_from_row(dict(zip(header, values)))
+            except ValueError as e:
+                result.add_error(line_no, str(e))
+                if header is None:
+                    return
+        return
+
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("各行はJSONオブジェクトで指定してください")
+            yield book_from_row(row)
+        except ValueError as e:
+            # json.JSONDecodeErrorもValueErrorのサブクラス
+            result.add_error(line_no, str(e))
@@ -1,20 +1,20 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import logging
 from app.domain.feedback_models import Feedback
-from app.domain.feedback_repositories import FeedbackRepository
-from app.application.github_service import GitHubService
+from app.domain.feedback_repositories import AsyncFeedbackRepository, FeedbackCursor
+from app.application.github_issue_outbox import GitHubIssueOutbox
 
 logger = logging.getLogger(__name__)
 
 class FeedbackService:
     """フィードバックのアプリケーションサービス"""
     
-    def __init__(self, repository: FeedbackRepository, github_service: GitHubService):
+    def __init__(self, repository: AsyncFeedbackRepository, outbox: GitHubIssueOutbox):
         self.repository = repository
-        self.github_service = github_service
+        self.outbox = outbox
     
-    def create_feedback(self, title: str, description: str, category: str, author_name: str) -> Feedback:
-        """新しいフィードバックを作成する"""
+    async def create_feedback(self, title: str, description: str, category: str, author_name: str) -> Feedback:
+        """新しいフィードバックを作成する（GitHub Issueは作成待ちの状態で返る）"""
         # フィードバックを作成
         feedback = Feedback.create(title, description, category, author_name)
         
@@ -31,35 +31,42 @@ class FeedbackService:
         if not author_name.strip():
             raise ValueError("投稿者名は必須です")
         
-        # リポジトリに保存
-        saved_feedback = self.repository.add(feedback)
-        
-        # GitHub Issue作成を試行
-        if self.github_service.is_available():
-            try:
-                issue_url = self.github_service.create_issue_from_feedback(saved_feedback)
-                if issue_url:
-                    saved_feedback.set_github_issue_url(issue_url)
-                    # GitHub Issue URLを保存
-                    self.repository.update(saved_feedback)
-                    logger.info(f"GitHub Issue作成成功: {issue_url}")
-                else:
-                    logger.warning("GitHub Issue作成に失敗しました")
-            except Exception as e:
-                logger.error(f"GitHub Issue作成中にエラー: {e}")
-        else:
+        # GitHub Issueはバックグラウンドで作成し、ここでは待たない
+        if not self.outbox.is_available():
             logger.info("GitHub API が利用できないため、Issue作成をスキップします")
+            feedback.skip_github_issue()
+        
+        # リポジトリに保存
+        saved_feedback = await self.repository.add(feedback)
+        if saved_feedback.github_issue_status == "pending":
+            self.outbox.enqueue(saved_feedback.id)
         
         return saved_feedback
     
-    def get_feedbacks(self) -> List[Feedback]:
-        """フィードバック一覧を取得する"""
-        return self.repository.get_all()
+    async def get_feedbacks_page(self, limit: int, category: Optional[str] = None,
+                                 before: Optional[FeedbackCursor] = None) -> Tuple[List[Feedback], Optional[FeedbackCursor]]:
+        """フィードバックを新しい順に1ページ分取得し、次のページのカーソルとともに返す"""
+        # 1件多く読んで次のページがあるかを判定する
+        feedbacks = await self.repository.get_page(limit + 1, category, before)
+        if len(feedbacks) <= limit:
+            return feedbacks, None
+        
+        feedbacks = feedbacks[:limit]
+        return feedbacks, (feedbacks[-1].created_at, feedbacks[-1].id)
     
-    def get_feedback(self, feedback_id: int) -> Optional[Feedback]:
+    async def get_feedback(self, feedback_id: int) -> Optional[Feedback]:
         """IDでフィードバックを取得する"""
-        return self.repository.get_by_id(feedback_id)
+        return await self.repository.get_by_id(feedback_id)
     
-    def delete_feedback(self, feedback_id: int) -> bool:
+    async def delete_feedback(self, feedback_id: int) -> bool:
         """フィードバックを削除する"""
-        return self.repository.delete(feedback_id)
\ No newline at end of file
+        return await self.repository.delete(feedback_id)
+    
+    async def resume_pending_issues(self) -> int:
+        """前回の終了時に作成待ちだったGitHub Issue（送信中のまま残ったものを含む）を送信キューに積み直す"""
+        if not self.outbox.is_available():
+            return 0
+        feedback_ids = await self.repository.get_pending_issue_ids()
+        for feedback_id in feedback_ids:
+            self.outbox.enqueue(feedback_id)
+        return len(feedback_ids)
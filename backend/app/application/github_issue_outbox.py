@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import random
+from typing import List, Optional, Protocol, Set, Tuple
+from app.domain.feedback_models import Feedback
+from app.domain.feedback_repositories import AsyncFeedbackRepository
+from app.application.github_service import GitHubRateLimitError
+
+logger = logging.getLogger(__name__)
+
+class IssueClient(Protocol):
+    """送信キューが使うGitHubクライアント（GitHubServiceまたはテスト用の偽物）"""
+
+    def is_available(self) -> bool: ...
+
+    def create_issue_from_feedback(self, feedback: Feedback) -> Optional[str]: ...
+
+class GitHubIssueOutbox:
+    """フィードバックのGitHub Issueをバックグラウンドで作成する送信キュー
+
+    リクエストはフィードバックを保存してキューに積むだけで返り、Issueの作成は
+    concurrency本のワーカーが行う。一時的な失敗は待ち時間を指数的に延ばしながら
+    max_attempts回まで再試行し、レート制限に達した場合は解除されるまで全ワーカーが送信を止める。
+
+    送信の前にリポジトリで作成待ちから送信中に切り替え（取り出し）、切り替えられたものだけを送る。
+    起動時の積み直しや複数のプロセスの送信キューと重なっても、同じIssueを二重に作らない。
+    再試行を待つ間は作成待ちに戻しておく。
+    """
+
+    def __init__(self, repository: AsyncFeedbackRepository, client: IssueClient, concurrency: int = 2,
+                 max_attempts: int = 5, base_delay: float = 2.0, max_delay: float = 300.0):
+        self.repository = repository
+        self.client = client
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue: asyncio.Queue[Tuple[int, int]] = asyncio.Queue()
+        self.workers: List[asyncio.Task] = []
+        self.retries: Set[asyncio.TimerHandle] = set()
+        # レート制限が解除される時刻（イベントループの時計）
+        self.paused_until = 0.0
+        # キューに積まれてから作成・失敗が確定するまでのフィードバック（同じものは二重に積まない）
+        self.queued: Set[int] = set()
+        self.pending = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def is_available(self) -> bool:
+        return self.client.is_available()
+
+    def enqueue(self, feedback_id: int) -> None:
+        """フィードバックのIssue作成をキューに積む（イベントループのスレッドから呼び出す）"""
+        if feedback_id in self.queued:
+            return
+        self.start()
+        self.queued.add(feedback_id)
+        self.pending += 1
+        self.idle.clear()
+        self.queue.put_nowait((feedback_id, 1))
+
+    def start(self) -> None:
+        """ワーカーを起動する"""
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """ワーカーと予約済みの再試行を止める（未送信のものは送られない）"""
+        for handle in self.retries:
+            handle.cancel()
+        self.retries.clear()
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queue = asyncio.Queue()
+        self.queued.clear()
+        self.pending = 0
+        self.idle.set()
+
+    async def drain(self) -> None:
+        """キューに積んだものがすべて作成済みまたは失敗になるまで待つ"""
+        await self.idle.wait()
+
+    def backoff(self, attempt: int) -> float:
+        """attempt回目の失敗後の待ち時間（同時に失敗したものが揃って再試行しないよう揺らす）"""
+        delay = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _work(self) -> None:
+        while True:
+            feedback_id, attempt = await self.queue.get()
+            try:
+                await self._deliver(feedback_id, attempt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"GitHub Issue作成の処理中にエラー (feedback_id={feedback_id}): {e}")
+                self._done(feedback_id)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, feedback_id: int, attempt: int) -> None:
+        loop = asyncio.get_running_loop()
+        wait = self.paused_until - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        feedback = await self.repository.claim_pending_issue(feedback_id)
+        if feedback is None:
+            # 送信前に削除された、作成済み、または他の送信キューが送信中
+            self._done(feedback_id)
+            return
+
+        try:
+            # PyGithubは同期APIなので、イベントループを止めないようスレッドで呼び出す
+            issue_url = await asyncio.to_thread(self.client.create_issue_from_feedback, feedback)
+        except GitHubRateLimitError as e:
+            self.paused_until = max(self.paused_until, loop.time() + e.retry_after)
+            logger.warning(f"GitHub APIのレート制限のため{e.retry_after:.0f}秒間送信を止めます")
+            # レート制限は試行回数に数えない
+            await self.repository.release_issue_claim(feedback_id)
+            self._retry(feedback_id, attempt, e.retry_after)
+            return
+        except Exception as e:
+            if attempt < self.max_attempts:
+                delay = self.backoff(attempt)
+                logger.warning(f"GitHub Issue作成に失敗しました。{delay:.1f}秒後に再試行します "
+                               f"(feedback_id={feedback_id}, {attempt}/{self.max_attempts}回目): {e}")
+                await self.repository.release_issue_claim(feedback_id)
+                self._retry(feedback_id, attempt + 1, delay)
+                return
+            logger.error(f"GitHub Issue作成を諦めました (feedback_id={feedback_id}): {e}")
+            issue_url = None
+
+        # 送信中に削除・更新されている可能性があるので読み直して記録する
+        feedback = await self.repository.get_by_id(feedback_id)
+        if feedback is not None:
+            if issue_url:
+                feedback.set_github_issue_url(issue_url)
+                logger.info(f"GitHub Issue作成成功: {issue_url}")
+            else:
+                feedback.mark_github_issue_failed()
+            await self.repository.update(feedback)
+        self._done(feedback_id)
+
+    def _retry(self, feedback_id: int, attempt: int, delay: float) -> None:
+        """delay秒後にキューへ積み直す（待っている間はワーカーを占有しない）"""
+        def requeue() -> None:
+            self.retries.discard(handle)
+            self.queue.put_nowait((feedback_id, attempt))
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self.retries.add(handle)
+
+    def _done(self, feedback_id: int) -> None:
+        self.queued.discard(feedback_id)
+        self.pending -= 1
+        if self.pending <= 0:
+            self.pending = 0
+            self.idle.set()
@@ -1,39 +1,91 @@
 import os
+import time
 import logging
-from typing import Optional
-from github import Github, GithubException
+import threading
+from typing import TYPE_CHECKING, Mapping, Optional
 from app.domain.feedback_models import Feedback
 
+if TYPE_CHECKING:
+    from github import Github
+
 logger = logging.getLogger(__name__)
 
+class GitHubRateLimitError(Exception):
+    """GitHub APIのレート制限に達した（retry_after秒後から再試行できる）"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"GitHub APIのレート制限に達しました（{retry_after:.0f}秒後に再試行できます）")
+        self.retry_after = retry_after
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]], default: float = 60.0) -> float:
+    """レート制限のレスポンスヘッダーから、再試行できるまでの秒数を求める"""
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    try:
+        if "retry-after" in headers:
+            return max(float(headers["retry-after"]), 1.0)
+        if "x-ratelimit-reset" in headers:
+            return max(float(headers["x-ratelimit-reset"]) - time.time(), 1.0)
+    except ValueError:
+        pass
+    return default
+
 class GitHubService:
-    """GitHub Issue作成サービス"""
+    """GitHub Issue作成サービス
+
+    クライアントは最初のIssue作成時に作り（起動時やリクエスト中に通信しない）、
+    以後は同じクライアント（HTTPセッション）とリポジトリのハンドルを使い回す。
+    PyGithubの読み込みにも時間がかかるので、importも最初に使うときまで遅らせる。
+    """
+    
+    # 残りの呼び出し回数がこれ以下になったら、制限が解除されるまで送信を控える
+    RATE_LIMIT_RESERVE = 10
     
     def __init__(self):
         self.github_token = os.getenv("GITHUB_TOKEN")
         self.github_repo = os.getenv("GITHUB_REPO", "dl-ezo/library-management-system")
-        self.github_client = None
+        self.github_client: Optional["Github"] = None
+        self.repo = None
+        # トークンが無効だと分かった場合は以後呼び出さない
+        self.disabled = False
+        # 送信キューのワーカーから並行して呼ばれるため、クライアントの初期化を直列にする
+        self.lock = threading.Lock()
         
-        if self.github_token:
-            try:
-                self.github_client = Github(self.github_token)
-                # 接続テスト
-                self.github_client.get_user().login
-                logger.info("GitHub API接続成功")
-            except Exception as e:
-                logger.error(f"GitHub API接続失敗: {e}")
-                self.github_client = None
-        else:
+        if not self.github_token:
             logger.warning("GITHUB_TOKENが設定されていません")
     
+    def _get_repo(self):
+        """リポジトリのハンドルを取得する（初回だけクライアントを作る。通信はしない）"""
+        with self.lock:
+            if self.github_client is None:
+                from github import Auth, Github
+                self.github_client = Github(auth=Auth.Token(self.github_token))
+            if self.repo is None:
+                self.repo = self.github_client.get_repo(self.github_repo, lazy=True)
+            return self.repo
+    
+    def _check_rate_limit(self) -> None:
+        """直近のレスポンスヘッダーで残りの呼び出し回数を確認し、使い切る前に止める"""
+        if self.github_client is None:
+            return
+        remaining, limit = self.github_client.requester.rate_limiting
+        reset_at = self.github_client.requester.rate_limiting_resettime
+        if 0 <= limit and remaining <= self.RATE_LIMIT_RESERVE and reset_at > time.time():
+            raise GitHubRateLimitError(reset_at - time.time())
+    
     def create_issue_from_feedback(self, feedback: Feedback) -> Optional[str]:
-        """フィードバックからGitHub Issueを作成する"""
-        if not self.github_client:
+        """フィードバックからGitHub Issueを作成する
+
+        再試行しても成功しない失敗はNoneを返す。レート制限はGitHubRateLimitError、
+        サーバー側の障害や通信エラーなど一時的な失敗は例外のまま送出する。
+        """
+        if not self.is_available():
             logger.warning("GitHub API が利用できません")
             return None
         
+        self._check_rate_limit()
+        from github import GithubException, RateLimitExceededException
         try:
-            repo = self.github_client.get_repo(self.github_repo)
+            repo = self._get_repo()
             
             # カテゴリに応じたラベルを設定
             labels = ["feedback"]
@@ -68,12 +120,23 @@ class GitHubService:
             logger.info(f"GitHub Issue作成成功: {issue.html_url}")
             return issue.html_url
             
+        except RateLimitExceededException as e:
+            raise GitHubRateLimitError(retry_after_seconds(e.headers)) from e
         except GithubException as e:
+            if e.status == 403 and e.headers and "retry-after" in {key.lower() for key in e.headers}:
+                # 短時間に作成しすぎた場合の二次レート制限
+                raise GitHubRateLimitError(retry_after_seconds(e.headers)) from e
+            if e.status >= 500:
+                raise
+            if e.status == 401:
+                logger.error("GitHubのトークンが無効なため、以後Issueを作成しません")
+                self.disabled = True
+            elif e.status == 404:
+                # リポジトリ名の誤りなど。次回はハンドルを作り直す
+                with self.lock:
+                    self.repo = None
             logger.error(f"GitHub Issue作成失敗: {e}")
             return None
-        except Exception as e:
-            logger.error(f"予期しないエラー: {e}")
-            return None
     
     def _get_category_display_name(self, category: str) -> str:
         """カテゴリの表示名を取得"""
@@ -85,5 +148,5 @@ class GitHubService:
         return category_names.get(category, category)
     
     def is_available(self) -> bool:
-        """GitHub APIが利用可能かチェック"""
-        return self.github_client is not None
\ No newline at end of file
+        """GitHub APIが利用可能かチェック（トークンが設定されていて、無効と分かっていない）"""
+        return bool(self.github_token) and not self.disabled
\ No newline at end of file
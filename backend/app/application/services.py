@@ -1,45 +1,90 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 from datetime import date
-from app.domain.models import Book
-from app.domain.repositories import BookRepository
+from app.domain.models import Book, BorrowerSummary, CatalogVersion, RankedPageCursorError
+from app.domain.repositories import AsyncBookRepository
+from app.application.book_import import BookImportResult, iter_lines, parse_books
 
 class BookService:
     """本のアプリケーションサービス"""
-    
-    def __init__(self, repository: BookRepository):
+
+    def __init__(self, repository: AsyncBookRepository):
         self.repository = repository
-    
-    def create_book(self, title: str) -> Book:
+
+    async def create_book(self, title: str) -> Book:
         """新しい本を作成する"""
         book = Book(id=0, title=title)
-        return self.repository.add(book)
-    
-    def get_books(self, title: Optional[str] = None, borrower_name: Optional[str] = None) -> List[Book]:
+        return await self.repository.add(book)
+
+    async def import_books(self, chunks: AsyncIterator[bytes], fmt: str) -> BookImportResult:
+        """CSV/NDJSONのバイト列を読みながら本を一括登録する"""
+        result = BookImportResult()
+        books = parse_books(iter_lines(chunks), fmt, result)
+        result.imported = await self.repository.bulk_add(books)
+        return result
+
+    async def get_books(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                        limit: Optional[int] = None, rank: bool = False) -> List[Book]:
         """本を検索する"""
-        return self.repository.search(title, borrower_name)
-    
-    def get_book(self, book_id: int) -> Optional[Book]:
+        return await self.repository.search(title, borrower_name, limit, rank)
+
+    async def get_books_page(self, limit: int, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                             after: Optional[int] = None, rank: bool = False) -> Tuple[List[Book], Optional[int]]:
+        """本を1ページ分検索し、次のページのカーソル（最後の本のID）とともに返す"""
+        if rank and after is not None:
+            raise RankedPageCursorError("ランキング検索ではafterを指定できません")
+
+        # 1件多く読んで次のページがあるかを判定する
+        books = await self.repository.search(title, borrower_name, limit + 1, rank, after)
+        if len(books) <= limit:
+            return books, None
+
+        books = books[:limit]
+        # ランキング順はIDの順序と一致しないため、カーソルは返さない
+        next_cursor = None if rank else books[-1].id
+        return books, next_cursor
+
+    def stream_books(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     after: Optional[int] = None, batch_size: int = 500) -> AsyncIterator[Book]:
+        """検索結果の本を件数の上限なしで順に取り出す"""
+        return self.repository.stream(title, borrower_name, after, batch_size)
+
+    def export_books(self, fmt: str, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     loans_only: bool = False) -> AsyncIterator[bytes]:
+        """検索結果の本をCSVまたはNDJSONのバイト列として順に取り出す"""
+        return self.repository.export(fmt, title, borrower_name, loans_only)
+
+    async def get_overdue_books(self, today: date, limit: Optional[int] = None) -> List[Book]:
+        """返却期限を過ぎた貸出中の本を期限の早い順に取得する"""
+        return await self.repository.find_due(today, limit)
+
+    async def get_due_books(self, before: date, limit: Optional[int] = None) -> List[Book]:
+        """返却期限がbeforeより前の貸出中の本を期限の早い順に取得する"""
+        return await self.repository.find_due(before, limit)
+
+    async def get_borrower_books(self, borrower_name: str) -> List[Book]:
+        """その人が借りている本を取得する（名前は完全一致）"""
+        return await self.repository.find_by_borrower(borrower_name)
+
+    async def get_borrowers(self) -> List[BorrowerSummary]:
+        """借りている人ごとの貸出状況を取得する"""
+        return await self.repository.get_borrowers()
+
+    async def get_catalog_version(self) -> CatalogVersion:
+        """蔵書全体のバージョンを取得する"""
+        return await self.repository.get_catalog_version()
+
+    async def get_book(self, book_id: int) -> Optional[Book]:
         """IDで本を取得する"""
-        return self.repository.get_by_id(book_id)
-    
-    def borrow_book(self, book_id: int, borrower_name: str, return_date: date) -> Optional[Book]:
-        """本を借りる"""
-        book = self.repository.get_by_id(book_id)
-        if not book:
-            return None
-        
-        book.borrow(borrower_name, return_date)
-        return self.repository.update(book)
-    
-    def return_book(self, book_id: int) -> Optional[Book]:
-        """本を返却する"""
-        book = self.repository.get_by_id(book_id)
-        if not book:
-            return None
-        
-        book.return_book()
-        return self.repository.update(book)
-    
-    def delete_book(self, book_id: int) -> bool:
+        return await self.repository.get_by_id(book_id)
+
+    async def borrow_book(self, book_id: int, borrower_name: str, return_date: date) -> Optional[Book]:
+        """本を借りる（貸出中の場合はBookAlreadyBorrowedError）"""
+        return await self.repository.borrow(book_id, borrower_name, return_date)
+
+    async def return_book(self, book_id: int) -> Optional[Book]:
+        """本を返却する（貸出中でない場合はBookNotBorrowedError）"""
+        return await self.repository.return_book(book_id)
+
+    async def delete_book(self, book_id: int) -> bool:
         """本を削除する"""
-        return self.repository.delete(book_id)
+        return await self.repository.delete(book_id)
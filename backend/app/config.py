@@ -6,7 +6,71 @@ class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
     GITHUB_TOKEN: str = os.getenv("GITHUB_TOKEN", "")
     GITHUB_REPO: str = os.getenv("GITHUB_REPO", "dl-ezo/library-management-system")
-    
+    # フィードバックのGitHub Issue作成（バックグラウンド）の同時実行数と再試行
+    GITHUB_OUTBOX_CONCURRENCY: int = 2
+    GITHUB_OUTBOX_MAX_ATTEMPTS: int = 5
+    GITHUB_OUTBOX_BASE_DELAY: float = 2.0
+    GITHUB_OUTBOX_MAX_DELAY: float = 300.0
+    # 送信中のまま（送信中にプロセスが終了した）この秒数が過ぎたIssueは、作成待ちとして取り出し直す
+    GITHUB_OUTBOX_CLAIM_TIMEOUT: float = 600.0
+
+    # 書籍推薦（Claude）の設定（時間はすべて秒）
+    ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
+    # 空ならAnthropicのAPIに接続する（テストではローカルのスタブサーバーを指す）
+    ANTHROPIC_BASE_URL: str = ""
+    RECOMMENDATION_MODEL: str = "claude-3-haiku-20240307"
+    RECOMMENDATION_TIMEOUT: float = 30.0
+    RECOMMENDATION_CONNECT_TIMEOUT: float = 5.0
+    RECOMMENDATION_MAX_RETRIES: int = 2
+    # 同時に問い合わせる上限と、上限に達しているときに空きを待つ時間
+    RECOMMENDATION_MAX_CONCURRENCY: int = 4
+    RECOMMENDATION_QUEUE_TIMEOUT: float = 10.0
+    # 起動直後のリクエストがクライアントの準備（SDKのimport）を待つ時間の上限。過ぎたら503を返す
+    RECOMMENDATION_READY_TIMEOUT: float = 5.0
+    # 推薦結果のキャッシュ（問い合わせ文を正規化してキーにする）。パスを指定すると再起動後も残る
+    RECOMMENDATION_CACHE_MAX_ENTRIES: int = 512
+    RECOMMENDATION_CACHE_TTL: float = 86400.0
+    RECOMMENDATION_CACHE_PATH: str = ""
+    # 同じ問い合わせの同時リクエストでまとめた1回の呼び出しの制限時間（秒）
+    RECOMMENDATION_FLIGHT_TIMEOUT: float = 60.0
+    # 蔵書からの推薦（TF-IDF）。類似度がSUFFICIENT_SCORE以上の本がSUFFICIENT_COUNT冊あればClaudeに問い合わせない
+    RECOMMENDATION_LOCAL_LIMIT: int = 5
+    RECOMMENDATION_LOCAL_MIN_SCORE: float = 0.1
+    RECOMMENDATION_LOCAL_SUFFICIENT_SCORE: float = 0.5
+    RECOMMENDATION_LOCAL_SUFFICIENT_COUNT: int = 3
+
+    # コネクションプール設定（時間はすべて秒）
+    DB_POOL_MIN_SIZE: int = 1
+    # 単発の接続（起動時の初期化など）で接続の確立を待つ上限
+    DB_CONNECT_TIMEOUT: int = 10
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_MAX_IDLE: float = 300.0
+    DB_POOL_MAX_LIFETIME: float = 3600.0
+    DB_POOL_CHECK: bool = True
+    # 同じSQLがこの回数実行されたらサーバー側のプリペアドステートメントにする
+    # （0で初回から、負の値で無効。PgBouncerのトランザクションモード経由では無効にする）
+    DB_PREPARE_THRESHOLD: int = 5
+    # 接続ごとに保持するプリペアドステートメントの最大数
+    DB_PREPARED_MAX: int = 100
+
+    # 本一覧APIで1回に返す件数の上限
+    BOOKS_MAX_PAGE_SIZE: int = 1000
+    # ストリーミング時にサーバー側カーソルから一度に取り出す件数
+    BOOKS_STREAM_BATCH_SIZE: int = 500
+
+    # フィードバック一覧APIで1回に返す件数（既定値と上限）
+    FEEDBACK_PAGE_SIZE: int = 50
+    FEEDBACK_MAX_PAGE_SIZE: int = 200
+
+    # 本の読み取りキャッシュ（プロセスごと。蔵書のバージョンが変わったら捨てるので、他のプロセスの書き込みも反映する）
+    BOOK_CACHE_ENABLED: bool = False
+    BOOK_CACHE_MAX_ENTRIES: int = 1024
+    # 検索結果のキャッシュの件数上限。1件に最大BOOKS_MAX_PAGE_SIZE冊を保持するので、
+    # 既定値では最大で約6万4千冊分の本のコピーを持つ
+    BOOK_CACHE_MAX_SEARCHES: int = 64
+    BOOK_CACHE_TTL: float = 30.0
+
     class Config:
         env_file = ".env"
         extra = "ignore"
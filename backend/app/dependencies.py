@@ -1,14 +1,25 @@
+from fastapi import HTTPException
 from app.application.services import BookService
 from app.application.feedback_services import FeedbackService
 from app.application.github_service import GitHubService
-from app.infrastructure.repositories import InMemoryBookRepository
-from app.infrastructure.feedback_repositories import InMemoryFeedbackRepository
-from app.infrastructure.postgres_repository import PostgresBookRepository
-from app.infrastructure.database import get_connection, init_db, is_test_mode
+from app.application.github_issue_outbox import GitHubIssueOutbox
+from app.infrastructure.repositories import AsyncInMemoryBookRepository
+from app.infrastructure.feedback_repositories import AsyncInMemoryFeedbackRepository
+from app.infrastructure.caching_repository import CachingBookRepository
+from app.infrastructure.database import get_pool, is_test_mode
+from app.infrastructure.book_events import BookEventBroadcaster, book_events
+from app.infrastructure.catalog_recommender import CatalogRecommender
+from app.infrastructure.recommendation_cache import RecommendationCache
+from app.infrastructure.single_flight import SingleFlight
+from app.infrastructure.recommendation_model import (
+    AnthropicRecommendationModel, RecommendationModelBusyError, get_recommendation_model as _get_recommendation_model,
+)
+from app.config import settings
 import os
+import logging
+from typing import Optional
 
-# データベースの初期化
-init_db()
+logger = logging.getLogger(__name__)
 
 # シングルトンのリポジトリインスタンス
 _repository_instance = None
@@ -18,6 +29,12 @@ _service_instance = None
 _feedback_repository_instance = None
 _feedback_service_instance = None
 _github_service_instance = None
+_github_issue_outbox_instance = None
+
+# 書籍推薦のキャッシュと、実行中の問い合わせ
+_recommendation_cache_instance = None
+_recommendation_flights_instance = None
+_catalog_recommender_instance = None
 
 def get_book_service():
     """BookServiceのインスタンスを取得する"""
@@ -25,35 +42,133 @@ def get_book_service():
     
     if _service_instance is None:
         if is_test_mode:
-            _repository_instance = InMemoryBookRepository()
+            _repository_instance = AsyncInMemoryBookRepository()
         else:
-            # 通常モード：PostgreSQLを使用
-            conn = get_connection()
-            if conn:
-                conn.close()
-                _repository_instance = PostgresBookRepository()
+            # 通常モード：PostgreSQLを使用（接続はlifespanで開いたプールから借りる）
+            pool = get_pool()
+            if pool:
+                # psycopgはプールを開いたときに読み込まれているので、ここで初めてimportする
+                from app.infrastructure.postgres_repository import PostgresBookRepository
+                _repository_instance = PostgresBookRepository(pool)
             else:
-                _repository_instance = InMemoryBookRepository()
+                _repository_instance = AsyncInMemoryBookRepository()
+        
+        if settings.BOOK_CACHE_ENABLED:
+            _repository_instance = CachingBookRepository(
+                _repository_instance,
+                max_entries=settings.BOOK_CACHE_MAX_ENTRIES,
+                ttl=settings.BOOK_CACHE_TTL,
+                max_searches=settings.BOOK_CACHE_MAX_SEARCHES,
+            )
         
         _service_instance = BookService(repository=_repository_instance)
     
     return _service_instance
 
+def get_book_events() -> BookEventBroadcaster:
+    """本の変更イベントのブロードキャスターを取得する"""
+    return book_events
+
+async def get_recommendation_model() -> Optional[AnthropicRecommendationModel]:
+    """書籍推薦用のクライアントを取得する（APIキーが設定されていなければNone、準備中で待ちきれなければ503）"""
+    try:
+        return await _get_recommendation_model()
+    except RecommendationModelBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def get_recommendation_cache() -> RecommendationCache:
+    """書籍推薦のキャッシュを取得する"""
+    global _recommendation_cache_instance
+    
+    if _recommendation_cache_instance is None:
+        _recommendation_cache_instance = RecommendationCache(
+            max_entries=settings.RECOMMENDATION_CACHE_MAX_ENTRIES,
+            ttl=settings.RECOMMENDATION_CACHE_TTL,
+            path=settings.RECOMMENDATION_CACHE_PATH or None
+        )
+    return _recommendation_cache_instance
+
+def get_recommendation_flights() -> SingleFlight:
+    """実行中の書籍推薦の問い合わせ（同じ問い合わせの同時リクエストを1回にまとめる）を取得する"""
+    global _recommendation_flights_instance
+    
+    if _recommendation_flights_instance is None:
+        _recommendation_flights_instance = SingleFlight(timeout=settings.RECOMMENDATION_FLIGHT_TIMEOUT)
+    return _recommendation_flights_instance
+
+def get_catalog_recommender() -> CatalogRecommender:
+    """蔵書から推薦するエンジンを取得する（初回の問い合わせで蔵書を読み込む）"""
+    global _catalog_recommender_instance
+    
+    if _catalog_recommender_instance is None:
+        _catalog_recommender_instance = CatalogRecommender(
+            get_book_service().repository,
+            book_events,
+            min_score=settings.RECOMMENDATION_LOCAL_MIN_SCORE
+        )
+    return _catalog_recommender_instance
+
+def close_catalog_recommender():
+    """蔵書の変更イベントの購読をやめる（アプリケーション終了時）"""
+    if _catalog_recommender_instance is not None:
+        _catalog_recommender_instance.close()
+
+def close_recommendation_cache():
+    """書籍推薦のキャッシュのファイルを閉じる（アプリケーション終了時）"""
+    if _recommendation_cache_instance is not None:
+        _recommendation_cache_instance.close()
+
+def book_cache_stats():
+    """本の読み取りキャッシュの統計情報を取得する（無効な場合は空）"""
+    if isinstance(_repository_instance, CachingBookRepository):
+        return _repository_instance.stats()
+    return {}
+
 def get_feedback_service():
     """FeedbackServiceのインスタンスを取得する"""
     global _feedback_repository_instance, _feedback_service_instance, _github_service_instance
+    global _github_issue_outbox_instance
     
     if _feedback_service_instance is None:
-        # フィードバックリポジトリのインスタンス作成
-        _feedback_repository_instance = InMemoryFeedbackRepository()
+        # フィードバックリポジトリのインスタンス作成（PostgreSQLがなければインメモリ）
+        pool = None if is_test_mode else get_pool()
+        if pool:
+            from app.infrastructure.postgres_feedback_repository import PostgresFeedbackRepository
+            _feedback_repository_instance = PostgresFeedbackRepository(
+                pool,
+                claim_timeout=settings.GITHUB_OUTBOX_CLAIM_TIMEOUT
+            )
+        else:
+            _feedback_repository_instance = AsyncInMemoryFeedbackRepository()
         
         # GitHubサービスのインスタンス作成
         _github_service_instance = GitHubService()
         
+        # GitHub Issueをバックグラウンドで作成する送信キュー
+        _github_issue_outbox_instance = GitHubIssueOutbox(
+            _feedback_repository_instance,
+            _github_service_instance,
+            concurrency=settings.GITHUB_OUTBOX_CONCURRENCY,
+            max_attempts=settings.GITHUB_OUTBOX_MAX_ATTEMPTS,
+            base_delay=settings.GITHUB_OUTBOX_BASE_DELAY,
+            max_delay=settings.GITHUB_OUTBOX_MAX_DELAY
+        )
+        
         # フィードバックサービスのインスタンス作成
         _feedback_service_instance = FeedbackService(
             repository=_feedback_repository_instance,
-            github_service=_github_service_instance
+            outbox=_github_issue_outbox_instance
         )
     
     return _feedback_service_instance
+
+async def start_github_issue_outbox():
+    """前回の終了時に作成待ちだったGitHub Issueの送信を再開する（アプリケーション起動時）"""
+    resumed = await get_feedback_service().resume_pending_issues()
+    if resumed:
+        logger.info(f"作成待ちのGitHub Issueを{resumed}件再開しました")
+
+async def stop_github_issue_outbox():
+    """GitHub Issueの送信キューを止める（アプリケーション終了時）"""
+    if _github_issue_outbox_instance is not None:
+        await _github_issue_outbox_instance.stop()
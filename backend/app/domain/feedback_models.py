@@ -12,6 +12,8 @@ class Feedback:
     author_name: str
     created_at: datetime
     github_issue_url: Optional[str] = None
+    # GitHub Issueの作成状況（"pending", "sending", "created", "failed", "skipped"）
+    github_issue_status: str = "pending"
     
     @classmethod
     def create(cls, title: str, description: str, category: str, author_name: str) -> 'Feedback':
@@ -26,9 +28,26 @@ class Feedback:
             github_issue_url=None
         )
     
+    def mark_github_issue_sending(self) -> None:
+        """GitHub Issueの作成を始めたことを記録する（送信キューが作成待ちから取り出した）"""
+        self.github_issue_status = "sending"
+    
+    def release_github_issue(self) -> None:
+        """GitHub Issueの作成を作成待ちに戻す（再試行を待つ間）"""
+        self.github_issue_status = "pending"
+    
     def set_github_issue_url(self, url: str) -> None:
         """GitHub Issue URLを設定する"""
         self.github_issue_url = url
+        self.github_issue_status = "created"
+    
+    def mark_github_issue_failed(self) -> None:
+        """GitHub Issueを作成できなかったことを記録する"""
+        self.github_issue_status = "failed"
+    
+    def skip_github_issue(self) -> None:
+        """GitHub Issueを作成しないことを記録する"""
+        self.github_issue_status = "skipped"
     
     def is_valid_category(self) -> bool:
         """カテゴリが有効かチェック"""
@@ -1,7 +1,12 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from datetime import datetime
+from itertools import islice
 from abc import ABC, abstractmethod
 from .feedback_models import Feedback
 
+# 一覧のキーセットページング用カーソル（直前のページの最後のフィードバックの作成日時とID）
+FeedbackCursor = Tuple[datetime, int]
+
 class FeedbackRepository(ABC):
     """フィードバックのリポジトリインターフェース"""
     
@@ -20,6 +25,15 @@ class FeedbackRepository(ABC):
         """全てのフィードバックを取得する"""
         pass
     
+    def get_page(self, limit: int, category: Optional[str] = None,
+                 before: Optional[FeedbackCursor] = None) -> List[Feedback]:
+        """フィードバックを新しい順に最大limit件取得する（beforeより古いものだけ）"""
+        feedbacks = sorted(self.get_all(), key=lambda f: (f.created_at, f.id), reverse=True)
+        matches = (f for f in feedbacks
+                   if (category is None or f.category == category)
+                   and (before is None or (f.created_at, f.id) < before))
+        return list(islice(matches, limit))
+    
     @abstractmethod
     def update(self, feedback: Feedback) -> Feedback:
         """フィードバックを更新する"""
@@ -28,4 +42,54 @@ class FeedbackRepository(ABC):
     @abstractmethod
     def delete(self, feedback_id: int) -> bool:
         """フィードバックを削除する"""
-        pass
\ No newline at end of file
+        pass
+
+class AsyncFeedbackRepository(ABC):
+    """フィードバックのリポジトリインターフェース（非同期版）"""
+
+    @abstractmethod
+    async def add(self, feedback: Feedback) -> Feedback:
+        """フィードバックを追加する"""
+        pass
+
+    @abstractmethod
+    async def get_by_id(self, feedback_id: int) -> Optional[Feedback]:
+        """IDでフィードバックを取得する"""
+        pass
+
+    @abstractmethod
+    async def get_page(self, limit: int, category: Optional[str] = None,
+                       before: Optional[FeedbackCursor] = None) -> List[Feedback]:
+        """フィードバックを新しい順（作成日時・IDの降順）に最大limit件取得する
+
+        categoryを指定した場合はそのカテゴリだけ、beforeを指定した場合はそれより古いものだけを返す。
+        """
+        pass
+
+    @abstractmethod
+    async def get_pending_issue_ids(self) -> List[int]:
+        """GitHub Issueの作成待ちのフィードバックのIDを古い順に取得する"""
+        pass
+
+    @abstractmethod
+    async def claim_pending_issue(self, feedback_id: int) -> Optional[Feedback]:
+        """作成待ちのGitHub Issueを送信中にして返す（作成待ちでなければNone）
+
+        確認と更新は1回の操作で行い、同じフィードバックを複数の送信キューが同時に取り出さないようにする。
+        """
+        pass
+
+    @abstractmethod
+    async def release_issue_claim(self, feedback_id: int) -> None:
+        """送信中のGitHub Issueを作成待ちに戻す"""
+        pass
+
+    @abstractmethod
+    async def update(self, feedback: Feedback) -> Feedback:
+        """フィードバックを更新する"""
+        pass
+
+    @abstractmethod
+    async def delete(self, feedback_id: int) -> bool:
+        """フィードバックを削除する"""
+        pass
@@ -1,26 +1,57 @@
-from datetime import date
+from datetime import date, datetime
 from typing import Optional
+from dataclasses import dataclass
 from pydantic import BaseModel
 
+class BookAlreadyBorrowedError(ValueError):
+    """貸出中の本を借りようとした"""
+    pass
+
+class BookNotBorrowedError(ValueError):
+    """貸し出されていない本を返却しようとした"""
+    pass
+
+class RankedPageCursorError(ValueError):
+    """ランキング検索でカーソル（after）を指定した"""
+    pass
+
+@dataclass(frozen=True)
+class CatalogVersion:
+    """蔵書全体のバージョン（本が変更されるたびに変わる）"""
+    version: int
+    modified_at: datetime
+
+@dataclass(frozen=True)
+class BorrowerSummary:
+    """借りている人ごとの貸出状況"""
+    name: str
+    count: int
+    earliest_return_date: Optional[date]
+
+@dataclass(slots=True, eq=False)
 class Book:
-    """本のドメインモデル"""
-    
-    def __init__(self, id: int, title: str, borrower_name: Optional[str] = None, return_date: Optional[date] = None):
-        self.id = id
-        self.title = title
-        self.borrower_name = borrower_name
-        self.return_date = return_date
+    """本のドメインモデル
+
+    __slots__付きのdataclassにしておくと、orjsonがAPIのレスポンスと同じ形で直接エンコードできる。
+    """
+    id: int
+    title: str
+    borrower_name: Optional[str] = None
+    return_date: Optional[date] = None
     
     def borrow(self, borrower_name: str, return_date: date) -> None:
         """本を借りる"""
         if self.is_borrowed():
-            raise ValueError("この本は既に貸し出されています")
+            raise BookAlreadyBorrowedError("この本は既に貸し出されています")
         
         self.borrower_name = borrower_name
         self.return_date = return_date
     
     def return_book(self) -> None:
         """本を返却する"""
+        if not self.is_borrowed():
+            raise BookNotBorrowedError("この本は貸し出されていません")
+        
         self.borrower_name = None
         self.return_date = None
     
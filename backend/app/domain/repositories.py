@@ -1,5 +1,6 @@
-from typing import List, Optional, Any
-from .models import Book
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Any
+from datetime import date
+from .models import Book, BorrowerSummary, CatalogVersion
 from abc import ABC, abstractmethod
 
 class BookRepository(ABC):
@@ -10,6 +11,14 @@ class BookRepository(ABC):
         """本を追加する"""
         pass
     
+    def add_many(self, books: Iterable[Book]) -> int:
+        """本をまとめて追加し、追加した件数を返す"""
+        count = 0
+        for book in books:
+            self.add(book)
+            count += 1
+        return count
+    
     @abstractmethod
     def get_by_id(self, book_id: int) -> Optional[Book]:
         """IDで本を取得する"""
@@ -21,8 +30,61 @@ class BookRepository(ABC):
         pass
     
     @abstractmethod
-    def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None) -> List[Book]:
-        """本を検索する"""
+    def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+               limit: Optional[int] = None, rank: bool = False, after: Optional[int] = None) -> List[Book]:
+        """本を検索する
+
+        結果はIDの昇順で、afterを指定した場合はそのIDより後の本だけを返す。
+        rankがTrueの場合は類似度の高い順に並べる（afterは使えない）。
+        """
+        pass
+    
+    def borrow(self, book_id: int, borrower_name: str, return_date: date) -> Optional[Book]:
+        """貸出中でなければ本を貸し出す（貸出中の場合はBookAlreadyBorrowedError）"""
+        book = self.get_by_id(book_id)
+        if not book:
+            return None
+        
+        book.borrow(borrower_name, return_date)
+        return self.update(book)
+    
+    def return_book(self, book_id: int) -> Optional[Book]:
+        """貸出中であれば本を返却する（貸出中でない場合はBookNotBorrowedError）"""
+        book = self.get_by_id(book_id)
+        if not book:
+            return None
+        
+        book.return_book()
+        return self.update(book)
+    
+    def find_due(self, before: date, limit: Optional[int] = None) -> List[Book]:
+        """返却期限がbeforeより前の貸出中の本を、期限の早い順（同じ期限はID順）に返す"""
+        books = sorted(
+            (book for book in self.get_all() if book.is_borrowed() and book.return_date < before),
+            key=lambda book: (book.return_date, book.id)
+        )
+        return books[:limit] if limit is not None else books
+    
+    def find_by_borrower(self, borrower_name: str) -> List[Book]:
+        """その人（名前の完全一致）が借りている本をIDの昇順に返す"""
+        return sorted((book for book in self.get_all() if book.borrower_name == borrower_name),
+                      key=lambda book: book.id)
+    
+    def get_borrowers(self) -> List[BorrowerSummary]:
+        """借りている人ごとの冊数と最も早い返却期限を、名前の順に返す"""
+        loans: Dict[str, List[Book]] = {}
+        for book in self.get_all():
+            if book.is_borrowed():
+                loans.setdefault(book.borrower_name, []).append(book)
+        return [
+            BorrowerSummary(name=name, count=len(books),
+                            earliest_return_date=min((b.return_date for b in books if b.return_date), default=None))
+            for name, books in sorted(loans.items())
+        ]
+    
+    @abstractmethod
+    def get_catalog_version(self) -> CatalogVersion:
+        """蔵書全体のバージョンを取得する"""
         pass
     
     @abstractmethod
@@ -34,3 +96,91 @@ class BookRepository(ABC):
     def delete(self, book_id: int) -> bool:
         """本を削除する"""
         pass
+
+class AsyncBookRepository(ABC):
+    """本のリポジトリインターフェース（非同期版）"""
+
+    @abstractmethod
+    async def add(self, book: Book) -> Book:
+        """本を追加する"""
+        pass
+
+    @abstractmethod
+    async def bulk_add(self, books: AsyncIterator[Book]) -> int:
+        """本を1トランザクションでまとめて追加し、追加した件数を返す"""
+        pass
+
+    @abstractmethod
+    async def get_by_id(self, book_id: int) -> Optional[Book]:
+        """IDで本を取得する"""
+        pass
+
+    @abstractmethod
+    async def get_all(self) -> List[Book]:
+        """全ての本を取得する"""
+        pass
+
+    @abstractmethod
+    async def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     limit: Optional[int] = None, rank: bool = False, after: Optional[int] = None) -> List[Book]:
+        """本を検索する
+
+        結果はIDの昇順で、afterを指定した場合はそのIDより後の本だけを返す。
+        rankがTrueの場合は類似度の高い順に並べる（afterは使えない）。
+        """
+        pass
+
+    @abstractmethod
+    def stream(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+               after: Optional[int] = None, batch_size: int = 500) -> AsyncIterator[Book]:
+        """検索結果をIDの昇順で少しずつ取り出す（全件をメモリに載せない）"""
+        pass
+
+    @abstractmethod
+    def export(self, fmt: str, title: Optional[str] = None, borrower_name: Optional[str] = None,
+               loans_only: bool = False) -> AsyncIterator[bytes]:
+        """検索結果をCSV（ヘッダー付き）またはNDJSONのバイト列として少しずつ取り出す"""
+        pass
+
+    @abstractmethod
+    async def borrow(self, book_id: int, borrower_name: str, return_date: date) -> Optional[Book]:
+        """貸出中でなければ本を貸し出す（貸出中の場合はBookAlreadyBorrowedError）
+
+        確認と更新は1回の操作で行い、同時に借りようとしても1人だけが成功する。
+        """
+        pass
+
+    @abstractmethod
+    async def return_book(self, book_id: int) -> Optional[Book]:
+        """貸出中であれば本を返却する（貸出中でない場合はBookNotBorrowedError）"""
+        pass
+
+    @abstractmethod
+    async def find_due(self, before: date, limit: Optional[int] = None) -> List[Book]:
+        """返却期限がbeforeより前の貸出中の本を、期限の早い順（同じ期限はID順）に返す"""
+        pass
+
+    @abstractmethod
+    async def find_by_borrower(self, borrower_name: str) -> List[Book]:
+        """その人（名前の完全一致）が借りている本をIDの昇順に返す"""
+        pass
+
+    @abstractmethod
+    async def get_borrowers(self) -> List[BorrowerSummary]:
+        """借りている人ごとの冊数と最も早い返却期限を、名前の順に返す"""
+        pass
+
+    @abstractmethod
+    async def get_catalog_version(self) -> CatalogVersion:
+        """蔵書全体のバージョンを取得する（本のデータは読まない）"""
+        pass
+
+    @abstractmethod
+    async def update(self, book: Book) -> Book:
+        """本を更新する"""
+        pass
+
+    @abstractmethod
+    async def delete(self, book_id: int) -> bool:
+        """本を削除する"""
+        pass
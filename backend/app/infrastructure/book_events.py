@@ -0,0 +1,55 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set
+from app.domain.models import Book
+
+# PostgreSQLのLISTEN/NOTIFYで使うチャンネル名
+BOOK_EVENTS_CHANNEL = "book_changes"
+
+def book_event(event_type: str, book_id: Optional[int], book: Optional[Book] = None, **extra: Any) -> Dict[str, Any]:
+    """本の変更イベントを作る（created / updated / deleted / bulk_imported）
+
+    PostgreSQLのトリガーは種類とIDだけを通知し、受け取ったPostgresBookEventListenerが
+    作成・更新された本を読み直してこの形にする。削除や読み直せなかった場合は本の内容を含まない
+    （bookがないかNone）ので、購読者は必要なら自分で読み直す。
+    """
+    event = {
+        "type": event_type,
+        "id": book_id,
+        "book": None if book is None else {
+            "id": book.id,
+            "title": book.title,
+            "borrower_name": book.borrower_name,
+            "return_date": book.return_date.isoformat() if book.return_date else None,
+        },
+    }
+    event.update(extra)
+    return event
+
+class BookEventBroadcaster:
+    """本の変更イベントをプロセス内の購読者全員に配信する"""
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Queue]:
+        """購読を開始し、イベントが届くキューを返す"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers.discard(queue)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """イベントを配信する（イベントループのスレッドから呼び出す）"""
+        for queue in list(self.subscribers):
+            if queue.full():
+                # 読み出しが追いつかない購読者は古いイベントから捨てる
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+# プロセス（ワーカー）ごとに共有するブロードキャスター
+book_events = BookEventBroadcaster()
@@ -0,0 +1,42 @@
+import csv
+import io
+from typing import Iterable, Iterator
+import orjson
+from app.domain.models import Book
+
+EXPORT_COLUMNS = ("id", "title", "borrower_name", "return_date")
+
+def encode_ndjson_line(book: Book) -> bytes:
+    """本をNDJSONの1行に変換する"""
+    return orjson.dumps(book, option=orjson.OPT_APPEND_NEWLINE)
+
+def ndjson_chunks(books: Iterable[Book], batch_size: int = 500) -> Iterator[bytes]:
+    """本をNDJSONに変換し、batch_size件ごとにまとめて返す"""
+    lines = []
+    for book in books:
+        lines.append(encode_ndjson_line(book))
+        if len(lines) >= batch_size:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+def csv_chunks(books: Iterable[Book], batch_size: int = 500) -> Iterator[bytes]:
+    """本をヘッダー付きCSVに変換し、batch_size件ごとにまとめて返す
+
+    NULLは空欄として出力する（PostgreSQLのCOPY ... FORMAT csvと同じ表現）。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for book in books:
+        writer.writerow((book.id, book.title, book.borrower_name or "",
+                         book.return_date.isoformat() if book.return_date else ""))
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
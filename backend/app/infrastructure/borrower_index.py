@@ -0,0 +1,36 @@
+from typing import Dict, Optional, Set
+
+class BorrowerIndex:
+    """借りている人の名前（完全一致）から貸出中の本のIDを引く索引"""
+
+    def __init__(self):
+        self.books_by_borrower: Dict[str, Set[int]] = {}
+        self.borrowers: Dict[int, str] = {}
+
+    def add(self, doc_id: int, borrower_name: Optional[str]) -> None:
+        """本の貸出先を索引に追加する（貸出中でなければ何もしない）"""
+        if borrower_name is None:
+            return
+        self.books_by_borrower.setdefault(borrower_name, set()).add(doc_id)
+        self.borrowers[doc_id] = borrower_name
+
+    def remove(self, doc_id: int) -> None:
+        """本を索引から削除する"""
+        borrower_name = self.borrowers.pop(doc_id, None)
+        if borrower_name is None:
+            return
+        ids = self.books_by_borrower[borrower_name]
+        ids.discard(doc_id)
+        if not ids:
+            del self.books_by_borrower[borrower_name]
+
+    def update(self, doc_id: int, borrower_name: Optional[str]) -> None:
+        """本の貸出先を更新する"""
+        if self.borrowers.get(doc_id) == borrower_name:
+            return
+        self.remove(doc_id)
+        self.add(doc_id, borrower_name)
+
+    def get(self, borrower_name: str) -> Set[int]:
+        """その人が借りている本のIDの集合を返す"""
+        return self.books_by_borrower.get(borrower_name, set())
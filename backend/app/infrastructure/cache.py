@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+class LRUCache(Generic[V]):
+    """件数上限（LRU）と有効期限（TTL）を持つキャッシュ
+
+    ヒット・ミス・追い出し（期限切れを含む）の回数を数える。
+    on_removeを渡すと、値が削除されるたび（追い出し・期限切れ・上書きを含む）にキーと値で呼び出す。
+    """
+
+    def __init__(self, max_entries: int, ttl: float, clock: Callable[[], float] = time.monotonic,
+                 on_remove: Optional[Callable[[Hashable, V], None]] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.on_remove = on_remove
+        self.entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """値を取得する。期限切れや未登録の場合はNone"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        """値を登録し、上限を超えた分は最も古く使われたものから追い出す"""
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (self.clock() + self.ttl, value)
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """値を削除する"""
+        if key in self.entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """すべての値を削除する"""
+        entries, self.entries = self.entries, OrderedDict()
+        if self.on_remove is not None:
+            for key, (_, value) in entries.items():
+                self.on_remove(key, value)
+
+    def _remove(self, key: Hashable) -> None:
+        _, value = self.entries.pop(key)
+        if self.on_remove is not None:
+            self.on_remove(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """監視用の統計情報"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
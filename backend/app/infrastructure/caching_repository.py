@@ -0,0 +1,197 @@
+import copy
+from datetime import date
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Set, Tuple
+from app.domain.models import Book, BorrowerSummary, CatalogVersion
+from app.domain.repositories import AsyncBookRepository
+from app.infrastructure.cache import LRUCache
+from app.infrastructure.ngram_index import normalize
+
+SearchFilter = Tuple[Optional[str], Optional[str]]
+SearchKey = Tuple[Optional[str], Optional[str], Optional[int], bool, Optional[int]]
+
+def search_key(title: Optional[str], borrower_name: Optional[str], limit: Optional[int],
+               rank: bool, after: Optional[int]) -> SearchKey:
+    """検索条件をキャッシュのキーにする
+
+    一致の判定（正規化の有無）は前段に置くリポジトリによって違うので、条件はそのままキーにする。
+    空文字だけは条件なしと同じ扱いになる。
+    """
+    return (title or None, borrower_name or None, limit, rank, after)
+
+def _contains(value: Optional[str], pattern: str) -> bool:
+    """部分一致するかどうか（ILIKEの大文字・小文字を区別しない比較と、索引の正規化のどちらかで一致すれば真）"""
+    if not value:
+        return False
+    return pattern.lower() in value.lower() or normalize(pattern) in normalize(value)
+
+def _may_match(search_filter: SearchFilter, book: Book) -> bool:
+    """本がその検索条件の結果に含まれうるかどうか（どのリポジトリの一致の判定でも漏れないよう広めに取る）"""
+    title, borrower_name = search_filter
+    if title is not None and not _contains(book.title, title):
+        return False
+    if borrower_name is not None and not _contains(book.borrower_name, borrower_name):
+        return False
+    return True
+
+class CachingBookRepository(AsyncBookRepository):
+    """任意のリポジトリの前段に置く読み取りキャッシュ
+
+    get_by_idと検索結果をLRU+TTLでキャッシュし、このリポジトリを通した書き込みで
+    影響を受ける項目だけを無効化する。キャッシュはプロセスごとなので、他のプロセスでの
+    書き込みは、蔵書のバージョン（条件付きGETのETagの元）が前回読んだときから変わっていれば
+    キャッシュをすべて捨てて反映する。バージョンを読まない経路ではTTLが切れるまで反映されない。
+
+    検索結果は1件あたり最大でページの上限（BOOKS_MAX_PAGE_SIZE）冊の本を保持するので、
+    件数の上限は本（max_entries）とは別にmax_searchesで指定する。
+    書き込みのたびに全件を調べないよう、検索結果を含まれる本のIDと検索条件で索引しておく。
+    """
+
+    def __init__(self, repository: AsyncBookRepository, max_entries: int = 1024, ttl: float = 30.0,
+                 max_searches: int = 64):
+        self.repository = repository
+        self.books: LRUCache[Book] = LRUCache(max_entries, ttl)
+        self.searches: LRUCache[List[Book]] = LRUCache(max_searches, ttl, on_remove=self._unindex_search)
+        # 本のIDごとの、その本を結果に含む検索
+        self.searches_by_book: Dict[int, Set[SearchKey]] = {}
+        # 検索条件（タイトル・貸出先）ごとの検索（ページの件数・位置・並び順だけが違うものをまとめる）
+        self.searches_by_filter: Dict[SearchFilter, Set[SearchKey]] = {}
+        # 読み込み中に書き込みがあった場合に古い結果を登録しないための世代番号
+        self.generation = 0
+        # 前回読んだ蔵書のバージョン（キャッシュの内容はこの時点以降のもの）
+        self.version: Optional[int] = None
+
+    def stats(self) -> dict:
+        """監視用の統計情報"""
+        return {"books": self.books.stats(), "searches": self.searches.stats()}
+
+    def _index_search(self, key: SearchKey, result: List[Book]) -> None:
+        for book in result:
+            self.searches_by_book.setdefault(book.id, set()).add(key)
+        self.searches_by_filter.setdefault(key[:2], set()).add(key)
+
+    def _unindex_search(self, key: SearchKey, result: List[Book]) -> None:
+        for book in result:
+            keys = self.searches_by_book.get(book.id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.searches_by_book[book.id]
+        keys = self.searches_by_filter.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.searches_by_filter[key[:2]]
+
+    def _invalidate(self, book_id: int, book: Optional[Book] = None) -> None:
+        """書き込まれた本に関係するキャッシュを削除する
+
+        調べるのは、その本を結果に含む検索と、検索条件の種類ごとに1回の一致の判定だけ。
+        """
+        self.generation += 1
+        self.books.pop(book_id)
+        keys = set(self.searches_by_book.get(book_id, ()))
+        if book is not None:
+            for search_filter, filter_keys in self.searches_by_filter.items():
+                if _may_match(search_filter, book):
+                    # IDがafter以下の本は、afterの後から始まるページには現れない
+                    keys.update(key for key in filter_keys if key[4] is None or book.id > key[4])
+        for key in keys:
+            self.searches.pop(key)
+
+    async def add(self, book: Book) -> Book:
+        book = await self.repository.add(book)
+        self._invalidate(book.id, book)
+        return book
+
+    async def bulk_add(self, books: AsyncIterator[Book]) -> int:
+        try:
+            return await self.repository.bulk_add(books)
+        finally:
+            self.generation += 1
+            self.searches.clear()
+
+    async def get_by_id(self, book_id: int) -> Optional[Book]:
+        cached = self.books.get(book_id)
+        if cached is not None:
+            return copy.copy(cached)
+
+        generation = self.generation
+        book = await self.repository.get_by_id(book_id)
+        if book is not None and generation == self.generation:
+            self.books.set(book_id, copy.copy(book))
+        return book
+
+    async def get_all(self) -> List[Book]:
+        return await self.repository.get_all()
+
+    async def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     limit: Optional[int] = None, rank: bool = False, after: Optional[int] = None) -> List[Book]:
+        key = search_key(title, borrower_name, limit, rank, after)
+        cached = self.searches.get(key)
+        if cached is not None:
+            return [copy.copy(book) for book in cached]
+
+        generation = self.generation
+        books = await self.repository.search(title, borrower_name, limit, rank, after)
+        if generation == self.generation:
+            cached = [copy.copy(book) for book in books]
+            self.searches.set(key, cached)
+            self._index_search(key, cached)
+        return books
+
+    def stream(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+               after: Optional[int] = None, batch_size: int = 500) -> AsyncIterator[Book]:
+        return self.repository.stream(title, borrower_name, after, batch_size)
+
+    def export(self, fmt: str, title: Optional[str] = None, borrower_name: Optional[str] = None,
+               loans_only: bool = False) -> AsyncIterator[bytes]:
+        return self.repository.export(fmt, title, borrower_name, loans_only)
+
+    async def borrow(self, book_id: int, borrower_name: str, return_date: date) -> Optional[Book]:
+        book = None
+        try:
+            book = await self.repository.borrow(book_id, borrower_name, return_date)
+            return book
+        finally:
+            # 競合した場合もキャッシュが古かった可能性があるので無効化する
+            self._invalidate(book_id, book)
+
+    async def return_book(self, book_id: int) -> Optional[Book]:
+        book = None
+        try:
+            book = await self.repository.return_book(book_id)
+            return book
+        finally:
+            self._invalidate(book_id, book)
+
+    async def find_due(self, before: date, limit: Optional[int] = None) -> List[Book]:
+        # 貸出・返却のたびに結果が変わる集計用の問い合わせなのでキャッシュしない
+        return await self.repository.find_due(before, limit)
+
+    async def find_by_borrower(self, borrower_name: str) -> List[Book]:
+        return await self.repository.find_by_borrower(borrower_name)
+
+    async def get_borrowers(self) -> List[BorrowerSummary]:
+        return await self.repository.get_borrowers()
+
+    async def get_catalog_version(self) -> CatalogVersion:
+        # 条件付きGETの判定に使うため、キャッシュせず常に最新を読む
+        version = await self.repository.get_catalog_version()
+        if version.version != self.version:
+            # 新しいETagで古い本文を返さないよう、バージョンが変わる前にキャッシュしたものは使わない
+            # （このプロセスの書き込みで変わった場合も区別できないので捨てる）
+            self.generation += 1
+            self.books.clear()
+            self.searches.clear()
+            self.version = version.version
+        return version
+
+    async def update(self, book: Book) -> Book:
+        book = await self.repository.update(book)
+        self._invalidate(book.id, book)
+        return book
+
+    async def delete(self, book_id: int) -> bool:
+        deleted = await self.repository.delete(book_id)
+        self._invalidate(book_id)
+        return deleted
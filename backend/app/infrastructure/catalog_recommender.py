@@ -0,0 +1,223 @@
+import asyncio
+import copy
+import logging
+from dataclasses import dataclass, replace
+from datetime import date
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from app.domain.models import Book
+from app.domain.repositories import AsyncBookRepository
+from app.infrastructure.book_events import BookEventBroadcaster
+from app.infrastructure.ngram_index import ngrams, normalize_query
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class CatalogMatch:
+    """問い合わせに近い蔵書と、その類似度（0〜1）"""
+    book: Book
+    score: float
+
+def _book_from_event(data: Dict[str, Any]) -> Book:
+    return Book(
+        id=data["id"],
+        title=data["title"],
+        borrower_name=data.get("borrower_name"),
+        return_date=date.fromisoformat(data["return_date"]) if data.get("return_date") else None,
+    )
+
+@dataclass(frozen=True)
+class _Index:
+    """検索用の索引（作り直すときは新しいものに丸ごと差し替え、問い合わせ中のものは変更しない）"""
+    books: Dict[int, Book]
+    vocabulary: Dict[str, int]
+    # 列ごとに行番号と正規化済みの重みを並べたCSC形式
+    ids: "np.ndarray"
+    available: "np.ndarray"
+    idf: "np.ndarray"
+    indptr: "np.ndarray"
+    rows: "np.ndarray"
+    weights: "np.ndarray"
+
+class CatalogRecommender:
+    """蔵書のタイトルから問い合わせに近い貸出可能な本を探す推薦エンジン
+
+    タイトルと問い合わせを正規化して文字n-gram（部分一致検索の索引と同じ分割）にし、
+    TF-IDFで重み付けしたベクトルのコサイン類似度で順位を付ける。タイトルは短いので、
+    TFはn-gramが含まれるかどうか（0/1）とする。
+
+    本の追加・変更・削除は本の変更イベントから受け取り、変わった本のn-gramだけを作り直す。
+    IDFとノルムは全体に依存するので、変更があった後の最初の問い合わせでNumPyでまとめて計算し直す。
+    イベントの取りこぼし（購読キューのあふれ）や一括登録、本の内容が付いていないイベントがあった場合は
+    リポジトリから読み直す。
+    読み直しと計算はイベントループを止めないようスレッドで行い、できた索引を差し替える。
+    作り直している間に来た問い合わせは前回の索引で答える。
+    NumPyは最初の問い合わせのときにimportする（起動を遅くしないため）。
+    """
+
+    def __init__(self, repository: AsyncBookRepository, events: BookEventBroadcaster, min_score: float = 0.1):
+        self.repository = repository
+        self.events = events
+        self.min_score = min_score
+        self.lock = asyncio.Lock()
+        self.subscription = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.index: Optional[_Index] = None
+
+        # 以下は索引を作るための状態（lockを持ったスレッドだけが変更する）
+        self.books: Dict[int, Book] = {}
+        # n-gram -> 列番号（削除された本のn-gramも残るが、文書頻度0になるだけで結果には影響しない）
+        self.vocabulary: Dict[str, int] = {}
+        # 本のID -> タイトルに含まれるn-gramの列番号
+        self.doc_columns: Dict[int, "np.ndarray"] = {}
+        self.dirty = True
+        self.availability_dirty = True
+
+    async def recommend(self, query: str, limit: int = 5) -> List[CatalogMatch]:
+        """問い合わせに近い貸出可能な本を類似度の高い順に返す"""
+        if self.index is None or not self.lock.locked():
+            async with self.lock:
+                await self._refresh()
+        index = self.index
+        # 索引を作ったスレッドでimport済み
+        import numpy as np
+
+        grams = ngrams(normalize_query(query))
+        columns = [index.vocabulary[gram] for gram in grams if gram in index.vocabulary]
+        if not columns or not len(index.ids):
+            return []
+
+        # 蔵書にないn-gramも問い合わせのノルムには含める（最大のIDFを持つものとして扱う）
+        n = len(index.ids)
+        unknown_idf = np.log(1 + n) + 1
+        query_weights = index.idf[columns]
+        query_norm = np.sqrt(np.sum(query_weights ** 2) + (len(grams) - len(columns)) * unknown_idf ** 2)
+
+        scores = np.zeros(n)
+        for column, weight in zip(columns, query_weights):
+            start, end = index.indptr[column], index.indptr[column + 1]
+            scores[index.rows[start:end]] += weight * index.weights[start:end]
+        scores /= query_norm
+        scores[~index.available] = 0.0
+
+        candidates = np.flatnonzero(scores >= self.min_score)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [CatalogMatch(copy.copy(index.books[int(index.ids[row])]), float(scores[row])) for row in candidates]
+
+    def close(self) -> None:
+        """変更イベントの購読をやめる"""
+        if self.subscription is not None:
+            self.subscription.__exit__(None, None, None)
+            self.subscription = None
+            self.queue = None
+
+    async def _refresh(self) -> None:
+        """前回の問い合わせ以降の変更を反映した索引にする"""
+        books: Optional[List[Book]] = None
+        events: List[Dict[str, Any]] = []
+        if self.queue is None:
+            # 読み込み中の変更を取りこぼさないよう、先に購読してから読み込む
+            self.subscription = self.events.subscribe()
+            self.queue = self.subscription.__enter__()
+            books = await self.repository.get_all()
+        else:
+            overflowed = self.queue.full()
+            while not self.queue.empty():
+                events.append(self.queue.get_nowait())
+            # 本の内容が付いていない追加・更新（DBから読み直せなかった通知）も全体を読み直す
+            if overflowed or any(event["type"] == "bulk_imported" or (event["type"] != "deleted" and not event.get("book"))
+                                 for event in events):
+                books = await self.repository.get_all()
+                events = []
+
+        if books is not None or events or self.index is None:
+            self.index = await asyncio.to_thread(self._update, books, events)
+
+    def _update(self, books: Optional[List[Book]], events: List[Dict[str, Any]]) -> _Index:
+        """変更を反映して新しい索引を作る（スレッドで実行する）"""
+        if books is not None:
+            self._reload(books)
+        for event in events:
+            if event["type"] == "deleted":
+                self._remove(event["id"])
+            else:
+                self._set(_book_from_event(event["book"]))
+
+        if self.dirty:
+            return self._build()
+        if self.availability_dirty:
+            return replace(self.index, books=dict(self.books), available=self._availability(self.index.ids))
+        return self.index
+
+    def _reload(self, books: List[Book]) -> None:
+        ids = set()
+        for book in books:
+            ids.add(book.id)
+            self._set(copy.copy(book))
+        for book_id in [book_id for book_id in self.books if book_id not in ids]:
+            self._remove(book_id)
+        logger.info(f"蔵書の推薦インデックスを読み込みました（{len(self.books)}冊）")
+
+    def _set(self, book: Book) -> None:
+        import numpy as np
+
+        old = self.books.get(book.id)
+        self.books[book.id] = book
+        if old is not None and old.title == book.title:
+            # 貸出・返却はタイトルの重みに影響しない
+            if old.is_borrowed() != book.is_borrowed():
+                self.availability_dirty = True
+            return
+
+        columns = [self.vocabulary.setdefault(gram, len(self.vocabulary)) for gram in ngrams(normalize_query(book.title))]
+        self.doc_columns[book.id] = np.array(sorted(columns), dtype=np.int64)
+        self.dirty = True
+
+    def _remove(self, book_id: int) -> None:
+        if self.books.pop(book_id, None) is not None:
+            del self.doc_columns[book_id]
+            self.dirty = True
+
+    def _build(self) -> _Index:
+        """TF-IDFの重みを計算し直す"""
+        import numpy as np
+
+        ids = np.fromiter(self.books.keys(), dtype=np.int64, count=len(self.books))
+        doc_columns = [self.doc_columns[book_id] for book_id in ids.tolist()]
+        n, vocabulary_size = len(ids), len(self.vocabulary)
+
+        lengths = np.fromiter((len(columns) for columns in doc_columns), dtype=np.int64, count=n)
+        rows = np.repeat(np.arange(n), lengths)
+        columns = np.concatenate(doc_columns) if n else np.zeros(0, dtype=np.int64)
+
+        # scikit-learnのsmooth_idfと同じ定義
+        df = np.bincount(columns, minlength=vocabulary_size)
+        idf = np.log((1 + n) / (1 + df)) + 1
+        weights = idf[columns]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n))
+        weights = weights / np.where(norms > 0, norms, 1)[rows]
+
+        order = np.argsort(columns, kind="stable")
+        self.dirty = False
+        return _Index(
+            books=dict(self.books),
+            vocabulary=dict(self.vocabulary),
+            ids=ids,
+            available=self._availability(ids),
+            idf=idf,
+            indptr=np.concatenate(([0], np.cumsum(df))),
+            rows=rows[order],
+            weights=weights[order],
+        )
+
+    def _availability(self, ids: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+
+        self.availability_dirty = False
+        return np.fromiter(
+            (not self.books[book_id].is_borrowed() for book_id in ids.tolist()), dtype=bool, count=len(ids)
+        )
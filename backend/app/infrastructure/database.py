@@ -1,29 +1,119 @@
+import asyncio
 import os
-from typing import Optional
-import psycopg
+import logging
+from typing import TYPE_CHECKING, Dict, Optional
 from app.config import settings
+from app.infrastructure.book_events import BOOK_EVENTS_CHANNEL
+
+if TYPE_CHECKING:
+    import psycopg
+    from psycopg_pool import AsyncConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# psycopgはPostgreSQLを使う場合（DATABASE_URLが設定されている場合）だけ関数の中でimportする。
+# テストモードやDBを使わないプロセスでは読み込まないので、起動が速くなる
 
 # テストモードかどうかを確認
 is_test_mode = os.environ.get("TEST_MODE", "0") == "1"
 
-def get_connection():
-    """データベース接続を取得する"""
+# プロセス内で共有するコネクションプール（FastAPIのlifespanで開閉する）
+_pool: Optional["AsyncConnectionPool"] = None
+
+def get_database_url() -> Optional[str]:
+    """接続先のデータベースURLを取得する"""
     if is_test_mode:
         return None
-    
-    # 通常モードの場合はPostgreSQLを使用
-    if settings.DATABASE_URL:
-        db_url = settings.DATABASE_URL
-        if db_url.startswith('postgres://'):
-            db_url = db_url.replace('postgres://', 'postgresql://', 1)
-        return psycopg.connect(db_url)
+
+    if not settings.DATABASE_URL:
+        return None
+
+    db_url = settings.DATABASE_URL
+    if db_url.startswith('postgres://'):
+        db_url = db_url.replace('postgres://', 'postgresql://', 1)
+    return db_url
+
+def get_connection():
+    """データベース接続を取得する（プールを使わない単発の接続）"""
+    db_url = get_database_url()
+    if db_url:
+        import psycopg
+        # DBが応答しなくても起動処理が止まり続けないよう、接続の待ち時間に上限を設ける
+        return psycopg.connect(db_url, connect_timeout=settings.DB_CONNECT_TIMEOUT)
     else:
         return None
 
+def get_pool() -> Optional["AsyncConnectionPool"]:
+    """開かれているコネクションプールを取得する"""
+    return _pool
+
+async def configure_connection(conn: "psycopg.AsyncConnection") -> None:
+    """プールが新しく作った接続にプリペアドステートメントの設定を適用する"""
+    threshold = settings.DB_PREPARE_THRESHOLD
+    conn.prepare_threshold = threshold if threshold >= 0 else None
+    conn.prepared_max = settings.DB_PREPARED_MAX
+
+async def open_pool() -> Optional["AsyncConnectionPool"]:
+    """アプリケーション起動時にコネクションプールを開く"""
+    global _pool
+
+    if _pool is not None:
+        return _pool
+
+    db_url = get_database_url()
+    if not db_url:
+        return None
+
+    from psycopg_pool import AsyncConnectionPool
+    pool = AsyncConnectionPool(
+        db_url,
+        min_size=settings.DB_POOL_MIN_SIZE,
+        max_size=settings.DB_POOL_MAX_SIZE,
+        timeout=settings.DB_POOL_TIMEOUT,
+        max_idle=settings.DB_POOL_MAX_IDLE,
+        max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+        check=AsyncConnectionPool.check_connection if settings.DB_POOL_CHECK else None,
+        configure=configure_connection,
+        name="books",
+        open=False,
+    )
+    # 接続の確立はバックグラウンドで行うため、ここではブロックしない
+    await pool.open(wait=False)
+    _pool = pool
+    return _pool
+
+async def close_pool() -> None:
+    """アプリケーション終了時にコネクションプールを閉じる"""
+    global _pool
+
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+def pool_stats() -> Dict[str, int]:
+    """監視用にコネクションプールの統計情報を取得する"""
+    if _pool is None:
+        return {}
+    return _pool.get_stats()
+
+def create_trigger_if_missing(cursor: "psycopg.Cursor", table: str, name: str, definition: str) -> None:
+    """トリガーがなければ作成する
+
+    DROP TRIGGERとCREATE TRIGGERはテーブルにACCESS EXCLUSIVEロックを取るので、起動のたびには作り直さない。
+    （トリガーが呼ぶ関数はCREATE OR REPLACE FUNCTIONで更新できる）
+    """
+    cursor.execute("SELECT 1 FROM pg_trigger WHERE tgrelid = %s::regclass AND tgname = %s", (table, name))
+    if cursor.fetchone() is None:
+        cursor.execute(definition)
+
 def init_db():
     """データベースを初期化する"""
-    conn = get_connection()
-    if conn:
+    if not get_database_url():
+        return
+
+    import psycopg
+    # DDLが失敗した場合も、withを抜けるときにロールバックして接続を閉じる
+    with get_connection() as conn:
         # PostgreSQL用のテーブル作成クエリ
         cursor = conn.cursor()
         cursor.execute("""
@@ -34,5 +124,140 @@ def init_db():
             return_date DATE
         )
         """)
+        # 延滞・返却期限の問い合わせ用：貸出中の行だけを返却期限順に持つ部分インデックス
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS books_due_idx ON books (return_date, id)
+        WHERE borrower_name IS NOT NULL
+        """)
+        # 貸出先ごとの問い合わせ用：名前の完全一致（と集計）はbtreeインデックスで引く
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS books_borrower_name_idx ON books (borrower_name, id)
+        WHERE borrower_name IS NOT NULL
+        """)
+        conn.commit()
+
+        # 部分一致検索（ILIKE '%...%'）用のトライグラムインデックス
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute("CREATE INDEX IF NOT EXISTS books_title_trgm_idx ON books USING gin (title gin_trgm_ops)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS books_borrower_name_trgm_idx ON books USING gin (borrower_name gin_trgm_ops)")
+            conn.commit()
+        except psycopg.Error as e:
+            # 拡張を作成する権限がない場合でも、インデックスなしで動作は継続できる
+            conn.rollback()
+            logger.warning(f"pg_trgmインデックスの作成に失敗しました: {e}")
+
+        # 変更フィード用：行の変更をNOTIFYで通知する（一括インポート中は抑止する）
+        # ペイロードの上限（8000バイト）を超えないよう種類とIDだけを送り、本の内容は受け取った側で読み直す
+        cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_book_change() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('app.suppress_book_notify', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('{BOOK_EVENTS_CHANNEL}', json_build_object(
+                'type', CASE TG_OP WHEN 'INSERT' THEN 'created' WHEN 'UPDATE' THEN 'updated' ELSE 'deleted' END,
+                'id', CASE TG_OP WHEN 'DELETE' THEN OLD.id ELSE NEW.id END
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+        create_trigger_if_missing(cursor, "books", "books_notify_change", """
+        CREATE TRIGGER books_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON books
+        FOR EACH ROW EXECUTE FUNCTION notify_book_change()
+        """)
+
+        # フィードバック：一覧は新しい順（作成日時・IDの降順）にキーセットページングで読む
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feedback (
+            id SERIAL PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT NOT NULL,
+            author_name TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT now(),
+            github_issue_url TEXT,
+            github_issue_status TEXT NOT NULL DEFAULT 'pending',
+            github_issue_claimed_at TIMESTAMPTZ
+        )
+        """)
+        # 送信キューが取り出した時刻（以前に作成したテーブルには列がないので追加する）
+        cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'feedback' AND column_name = 'github_issue_claimed_at'
+        """)
+        if cursor.fetchone() is None:
+            cursor.execute("ALTER TABLE feedback ADD COLUMN github_issue_claimed_at TIMESTAMPTZ")
+        cursor.execute("CREATE INDEX IF NOT EXISTS feedback_created_at_idx ON feedback (created_at DESC, id DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS feedback_category_created_at_idx ON feedback (category, created_at DESC, id DESC)")
+        # 起動時にGitHub Issueの作成待ち（と送信中のまま残ったもの）を拾い直すための部分インデックス
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS feedback_unsent_issue_idx ON feedback (id)
+        WHERE github_issue_status IN ('pending', 'sending')
+        """)
+        cursor.execute("DROP INDEX IF EXISTS feedback_pending_issue_idx")
         conn.commit()
-        conn.close()
+
+        # 条件付きGET用の蔵書バージョン：booksを変更したトランザクションのIDにする
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL,
+            modified_at TIMESTAMPTZ NOT NULL
+        )
+        """)
+        cursor.execute("""
+        INSERT INTO catalog_version (id, version, modified_at) VALUES (TRUE, 1, now())
+        ON CONFLICT (id) DO NOTHING
+        """)
+        # 1行も変えなかった文（該当なしのUPDATE・DELETEなど）では行を書き換えず、
+        # 同じトランザクションの2つ目以降の文でも書き換えない（バージョンの行のロックを取る回数を減らす）。
+        # 変更した行はトリガーの遷移テーブル（changed_books）で確かめる
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        DECLARE
+            xact_version BIGINT := pg_current_xact_id()::text::bigint;
+        BEGIN
+            IF TG_OP <> 'TRUNCATE' THEN
+                IF NOT EXISTS (SELECT 1 FROM changed_books) THEN
+                    RETURN NULL;
+                END IF;
+            END IF;
+            UPDATE catalog_version SET version = xact_version, modified_at = now() WHERE version <> xact_version;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+        # 以前の1つにまとめたトリガー（遷移テーブルは複数のイベントのトリガーには付けられない）
+        cursor.execute("SELECT 1 FROM pg_trigger WHERE tgrelid = 'books'::regclass AND tgname = 'books_bump_catalog_version'")
+        if cursor.fetchone() is not None:
+            cursor.execute("DROP TRIGGER books_bump_catalog_version ON books")
+        for event, transition in [("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"), ("TRUNCATE", None)]:
+            referencing = f"REFERENCING {transition} TABLE AS changed_books" if transition else ""
+            create_trigger_if_missing(cursor, "books", f"books_catalog_version_{event.lower()}", f"""
+            CREATE TRIGGER books_catalog_version_{event.lower()}
+            AFTER {event} ON books {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+            """)
+        conn.commit()
+
+async def init_db_with_retry(max_delay: float = 60.0) -> None:
+    """データベースを初期化する（起動処理をブロックしないよう、バックグラウンドで呼び出す）
+
+    接続やDDLはスレッドで行い、DBが起動中などで失敗した場合は待ち時間を延ばしながら成功するまで再試行する。
+    """
+    if not get_database_url():
+        return
+
+    delay = 1.0
+    while True:
+        try:
+            await asyncio.to_thread(init_db)
+            logger.info("データベースを初期化しました")
+            return
+        except Exception as e:
+            logger.warning(f"データベースの初期化に失敗しました。{delay:.0f}秒後に再試行します: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
@@ -0,0 +1,42 @@
+from bisect import bisect_left, insort
+from datetime import date
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+class DueDateIndex:
+    """返却期限の順序付きインデックス
+
+    (返却期限, ID) を昇順に並べたリストを二分探索し、期限が指定日より前の本を
+    O(log n + k) で取り出す。並びが期限順のまま保たれるので、取り出した結果は並べ替え不要。
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[date, int]] = []
+        self.due_dates: Dict[int, date] = {}
+
+    def add(self, doc_id: int, due: Optional[date]) -> None:
+        """本の返却期限を索引に追加する（期限がなければ何もしない）"""
+        if due is None:
+            return
+        insort(self.entries, (due, doc_id))
+        self.due_dates[doc_id] = due
+
+    def remove(self, doc_id: int) -> None:
+        """本を索引から削除する"""
+        due = self.due_dates.pop(doc_id, None)
+        if due is None:
+            return
+        del self.entries[bisect_left(self.entries, (due, doc_id))]
+
+    def update(self, doc_id: int, due: Optional[date]) -> None:
+        """本の返却期限を更新する"""
+        if self.due_dates.get(doc_id) == due:
+            return
+        self.remove(doc_id)
+        self.add(doc_id, due)
+
+    def before(self, due: date, limit: Optional[int] = None) -> List[int]:
+        """返却期限がdueより前の本のIDを期限の早い順に返す"""
+        # (due,) は同じ期限のどの (due, ID) よりも小さいので、期限がdueの本は含まれない
+        end = bisect_left(self.entries, (due,))
+        return [doc_id for _, doc_id in islice(self.entries, min(end, limit) if limit is not None else end)]
@@ -1,7 +1,8 @@
 from typing import List, Optional, Dict
 from datetime import datetime
+from itertools import islice
 from app.domain.feedback_models import Feedback
-from app.domain.feedback_repositories import FeedbackRepository
+from app.domain.feedback_repositories import AsyncFeedbackRepository, FeedbackCursor, FeedbackRepository
 
 class InMemoryFeedbackRepository(FeedbackRepository):
     """インメモリのフィードバックリポジトリ実装"""
@@ -22,6 +23,14 @@ class InMemoryFeedbackRepository(FeedbackRepository):
     def get_all(self) -> List[Feedback]:
         return list(self.feedbacks.values())
     
+    def get_page(self, limit: int, category: Optional[str] = None,
+                 before: Optional[FeedbackCursor] = None) -> List[Feedback]:
+        # feedbacksは登録順（作成日時・IDの昇順）なので、後ろから必要な件数だけ読む
+        matches = (f for f in reversed(self.feedbacks.values())
+                   if (category is None or f.category == category)
+                   and (before is None or (f.created_at, f.id) < before))
+        return list(islice(matches, limit))
+    
     def update(self, feedback: Feedback) -> Feedback:
         if feedback.id in self.feedbacks:
             self.feedbacks[feedback.id] = feedback
@@ -31,4 +40,43 @@ class InMemoryFeedbackRepository(FeedbackRepository):
         if feedback_id in self.feedbacks:
             del self.feedbacks[feedback_id]
             return True
-        return False
\ No newline at end of file
+        return False
+
+class AsyncInMemoryFeedbackRepository(AsyncFeedbackRepository):
+    """インメモリリポジトリを非同期インターフェースで公開するアダプタ"""
+
+    def __init__(self, repository: Optional[FeedbackRepository] = None):
+        self.repository = repository if repository is not None else InMemoryFeedbackRepository()
+
+    async def add(self, feedback: Feedback) -> Feedback:
+        return self.repository.add(feedback)
+
+    async def get_by_id(self, feedback_id: int) -> Optional[Feedback]:
+        return self.repository.get_by_id(feedback_id)
+
+    async def get_page(self, limit: int, category: Optional[str] = None,
+                       before: Optional[FeedbackCursor] = None) -> List[Feedback]:
+        return self.repository.get_page(limit, category, before)
+
+    async def get_pending_issue_ids(self) -> List[int]:
+        return [f.id for f in self.repository.get_all() if f.github_issue_status == "pending"]
+
+    async def claim_pending_issue(self, feedback_id: int) -> Optional[Feedback]:
+        # 同期処理のため、確認から更新までの間に他のタスクが割り込むことはない
+        feedback = self.repository.get_by_id(feedback_id)
+        if feedback is None or feedback.github_issue_status != "pending":
+            return None
+        feedback.mark_github_issue_sending()
+        return self.repository.update(feedback)
+
+    async def release_issue_claim(self, feedback_id: int) -> None:
+        feedback = self.repository.get_by_id(feedback_id)
+        if feedback is not None and feedback.github_issue_status == "sending":
+            feedback.release_github_issue()
+            self.repository.update(feedback)
+
+    async def update(self, feedback: Feedback) -> Feedback:
+        return self.repository.update(feedback)
+
+    async def delete(self, feedback_id: int) -> bool:
+        return self.repository.delete(feedback_id)
@@ -0,0 +1,72 @@
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+class JSONObjectStreamParser:
+    """少しずつ届くテキストから、JSON配列の要素のオブジェクトを完成した順に取り出す
+
+    最初の'['より前（説明文やコードブロックの開始）は読み飛ばし、配列内のオブジェクトは
+    対応する'}'が届いた時点で1件ずつ返す。文字列内の括弧やエスケープは区別する。
+    全体を受け取ってから解析し直すことはしないので、処理量は受け取った文字数に比例する。
+    """
+
+    def __init__(self):
+        self.in_array = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        # 組み立て中のオブジェクトの断片
+        self.parts: List[str] = []
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """テキストの続きを受け取り、完成したオブジェクトを返す"""
+        objects = []
+        # 組み立て中のオブジェクトが始まった位置（このtextの中での位置）
+        start = 0 if self.depth else None
+
+        for i, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if not self.in_array:
+                self.in_array = char == "["
+            elif self.depth == 0:
+                if char == "{":
+                    self.depth = 1
+                    start = i
+                elif char == "]":
+                    # 配列が閉じた後（コードブロックの終わりなど）は読み飛ばす
+                    self.in_array = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.parts.append(text[start:i + 1])
+                    start = None
+                    self._emit(objects)
+
+        if start is not None:
+            self.parts.append(text[start:])
+        return objects
+
+    def _emit(self, objects: List[Dict[str, Any]]) -> None:
+        source = "".join(self.parts)
+        self.parts = []
+        try:
+            value = json.loads(source)
+        except ValueError as e:
+            logger.warning(f"応答のJSONオブジェクトを解析できませんでした: {e}")
+            return
+        if isinstance(value, dict):
+            objects.append(value)
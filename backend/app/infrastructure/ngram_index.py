@@ -0,0 +1,111 @@
+import unicodedata
+from typing import Dict, Iterable, Optional, Set
+
+# 日本語などのCJK文字はバイグラム、それ以外（ラテン文字など）はトライグラムで分割する
+CJK_GRAM_SIZE = 2
+DEFAULT_GRAM_SIZE = 3
+
+_CJK_RANGES = (
+    (0x3040, 0x30FF),  # ひらがな・カタカナ
+    (0x3400, 0x4DBF),  # CJK統合漢字拡張A
+    (0x4E00, 0x9FFF),  # CJK統合漢字
+    (0xAC00, 0xD7AF),  # ハングル
+    (0xF900, 0xFAFF),  # CJK互換漢字
+)
+
+def normalize(text: str) -> str:
+    """検索用に文字列を正規化する（NFKC + casefold）"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+def _is_cjk(ch: str) -> bool:
+    code = ord(ch)
+    return any(start <= code <= end for start, end in _CJK_RANGES)
+
+def normalize_query(text: str) -> str:
+    """問い合わせ文を比較用に正規化する
+
+    NFKC + casefoldのあと空白の連続を1つにまとめ、CJK文字に隣接する空白は取り除く
+    （「python 入門 」と「Python入門」を同じ問い合わせとして扱う）。
+    """
+    words = normalize(text).split()
+    if not words:
+        return ""
+    result = words[0]
+    for word in words[1:]:
+        if not (_is_cjk(result[-1]) or _is_cjk(word[0])):
+            result += " "
+        result += word
+    return result
+
+def ngrams(normalized: str) -> Set[str]:
+    """正規化済み文字列のn-gramを返す
+
+    各位置の先頭文字の種類でn-gramの長さを決めるため、部分文字列から作った
+    n-gramは必ず元の文字列のn-gramにも含まれる。
+    """
+    grams = set()
+    for i, ch in enumerate(normalized):
+        size = CJK_GRAM_SIZE if _is_cjk(ch) else DEFAULT_GRAM_SIZE
+        if i + size > len(normalized):
+            continue
+        grams.add(normalized[i:i + size])
+    return grams
+
+class NgramIndex:
+    """部分一致検索のためのn-gram転置インデックス"""
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = {}
+        self.texts: Dict[int, str] = {}
+
+    def add(self, doc_id: int, text: Optional[str]) -> None:
+        """文書を索引に追加する"""
+        if text is None:
+            return
+
+        normalized = normalize(text)
+        self.texts[doc_id] = normalized
+        for gram in ngrams(normalized):
+            self.postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id: int) -> None:
+        """文書を索引から削除する"""
+        normalized = self.texts.pop(doc_id, None)
+        if normalized is None:
+            return
+
+        for gram in ngrams(normalized):
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            posting.discard(doc_id)
+            if not posting:
+                del self.postings[gram]
+
+    def update(self, doc_id: int, text: Optional[str]) -> None:
+        """文書の索引を更新する"""
+        if self.texts.get(doc_id) == (normalize(text) if text is not None else None):
+            return
+        self.remove(doc_id)
+        self.add(doc_id, text)
+
+    def search(self, query: str) -> Set[int]:
+        """queryを部分文字列として含む文書IDの集合を返す"""
+        needle = normalize(query)
+        grams = ngrams(needle)
+
+        candidates: Iterable[int]
+        if grams:
+            # 短いポスティングリストから順に積集合をとる
+            postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= posting
+        else:
+            # n-gramを作れない短いクエリは正規化済みの文字列を走査する
+            candidates = self.texts.keys()
+
+        # n-gramの一致は候補の絞り込みなので、最後に部分一致を確認する
+        return {doc_id for doc_id in candidates if needle in self.texts[doc_id]}
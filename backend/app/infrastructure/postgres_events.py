@@ -0,0 +1,82 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.domain.models import Book
+from app.infrastructure.book_events import BOOK_EVENTS_CHANNEL, BookEventBroadcaster, book_event
+
+logger = logging.getLogger(__name__)
+
+class PostgresBookEventListener:
+    """LISTENで受け取った本の変更通知をブロードキャスターに流す
+
+    ワーカーごとに専用の接続を1本だけ使い、切断された場合は待ち時間を延ばしながら再接続する。
+    通知には種類とIDしか含まれないので、追加・更新された本はload_bookで読み直してイベントに付ける
+    （インメモリのリポジトリが配信するイベントと同じ形にする）。
+    """
+
+    def __init__(self, conninfo: str, broadcaster: BookEventBroadcaster,
+                 load_book: Optional[Callable[[int], Awaitable[Optional[Book]]]] = None, max_backoff: float = 30.0):
+        self.conninfo = conninfo
+        self.broadcaster = broadcaster
+        self.load_book = load_book
+        self.max_backoff = max_backoff
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """バックグラウンドで通知の受信を開始する"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """通知の受信を停止する"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True)
+                async with conn:
+                    await conn.execute(f"LISTEN {BOOK_EVENTS_CHANNEL}")
+                    logger.info("本の変更通知の受信を開始しました")
+                    backoff = 1.0
+                    async for notify in conn.notifies():
+                        event = await self.event_from_payload(notify.payload)
+                        if event is not None:
+                            self.broadcaster.publish(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"変更通知の接続が切れました。{backoff}秒後に再接続します: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    async def event_from_payload(self, payload: str) -> Optional[Dict[str, Any]]:
+        """通知のペイロードを配信するイベントにする（配信しない場合はNone）"""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"不正な変更通知を無視しました: {payload}")
+            return None
+        if event.get("type") not in ("created", "updated") or self.load_book is None:
+            return event
+
+        try:
+            book = await self.load_book(event["id"])
+        except Exception as e:
+            # 本の内容なしで配信する（購読者は必要に応じて読み直す）
+            logger.warning(f"変更された本を読み直せませんでした: {e}")
+            return event
+        if book is None:
+            # 通知の後に削除された（削除の通知が続けて届く）
+            return None
+        return book_event(event["type"], book.id, book)
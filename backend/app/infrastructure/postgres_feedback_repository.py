@@ -0,0 +1,133 @@
+from typing import List, Optional
+from psycopg_pool import AsyncConnectionPool
+from app.domain.feedback_models import Feedback
+from app.domain.feedback_repositories import AsyncFeedbackRepository, FeedbackCursor
+
+FEEDBACK_COLUMNS = "id, title, description, category, author_name, created_at, github_issue_url, github_issue_status"
+SELECT_FEEDBACK = f"SELECT {FEEDBACK_COLUMNS} FROM feedback"
+SELECT_FEEDBACK_BY_ID = SELECT_FEEDBACK + " WHERE id = %s"
+INSERT_FEEDBACK = (
+    "INSERT INTO feedback (title, description, category, author_name, created_at, github_issue_url, github_issue_status) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id"
+)
+UPDATE_FEEDBACK = (
+    "UPDATE feedback SET title = %s, description = %s, category = %s, author_name = %s, "
+    "github_issue_url = %s, github_issue_status = %s WHERE id = %s"
+)
+DELETE_FEEDBACK = "DELETE FROM feedback WHERE id = %s"
+# 作成待ち、または送信中のままclaim_timeout秒を過ぎた（送信中にプロセスが終了した）もの
+UNSENT_ISSUE = (
+    "(github_issue_status = 'pending' OR (github_issue_status = 'sending' "
+    "AND github_issue_claimed_at < now() - make_interval(secs => %s)))"
+)
+SELECT_PENDING_ISSUE_IDS = f"SELECT id FROM feedback WHERE {UNSENT_ISSUE} ORDER BY id"
+# 確認と更新を1文で行い、同じフィードバックを取り出せるのは1つの送信キューだけにする
+CLAIM_PENDING_ISSUE = (
+    "UPDATE feedback SET github_issue_status = 'sending', github_issue_claimed_at = now() "
+    f"WHERE id = %s AND {UNSENT_ISSUE} RETURNING {FEEDBACK_COLUMNS}"
+)
+RELEASE_ISSUE_CLAIM = "UPDATE feedback SET github_issue_status = 'pending' WHERE id = %s AND github_issue_status = 'sending'"
+
+def _page_query(has_category: bool, has_before: bool) -> str:
+    """一覧のSELECT文（(created_at, id)の降順インデックスをたどって必要な件数だけ読む）"""
+    query = SELECT_FEEDBACK + " WHERE 1=1"
+    if has_category:
+        query += " AND category = %s"
+    if has_before:
+        query += " AND (created_at, id) < (%s, %s)"
+    return query + " ORDER BY created_at DESC, id DESC LIMIT %s"
+
+# 条件の組み合わせごとに固定の文字列にしてプリペアドステートメントを再利用する
+PAGE_QUERIES = {(c, b): _page_query(c, b) for c in (False, True) for b in (False, True)}
+
+def _row_to_feedback(row) -> Feedback:
+    """SELECT結果の行をドメインモデルに変換する"""
+    id, title, description, category, author_name, created_at, github_issue_url, github_issue_status = row
+    return Feedback(
+        id=id,
+        title=title,
+        description=description,
+        category=category,
+        author_name=author_name,
+        created_at=created_at,
+        github_issue_url=github_issue_url,
+        github_issue_status=github_issue_status
+    )
+
+class PostgresFeedbackRepository(AsyncFeedbackRepository):
+    """PostgreSQLのフィードバックリポジトリ実装（非同期接続をコネクションプールから借りる）"""
+
+    def __init__(self, pool: AsyncConnectionPool, claim_timeout: float = 600.0):
+        self.pool = pool
+        self.claim_timeout = claim_timeout
+
+    async def add(self, feedback: Feedback) -> Feedback:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(INSERT_FEEDBACK, (
+                    feedback.title, feedback.description, feedback.category, feedback.author_name,
+                    feedback.created_at, feedback.github_issue_url, feedback.github_issue_status
+                ))
+                feedback.id = (await cur.fetchone())[0]
+        return feedback
+
+    async def get_by_id(self, feedback_id: int) -> Optional[Feedback]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SELECT_FEEDBACK_BY_ID, (feedback_id,))
+                result = await cur.fetchone()
+        if not result:
+            return None
+        return _row_to_feedback(result)
+
+    async def get_page(self, limit: int, category: Optional[str] = None,
+                       before: Optional[FeedbackCursor] = None) -> List[Feedback]:
+        params = []
+        if category is not None:
+            params.append(category)
+        if before is not None:
+            params.extend(before)
+        params.append(limit)
+
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(PAGE_QUERIES[category is not None, before is not None], params)
+                rows = await cur.fetchall()
+        return [_row_to_feedback(row) for row in rows]
+
+    async def get_pending_issue_ids(self) -> List[int]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SELECT_PENDING_ISSUE_IDS, (self.claim_timeout,))
+                rows = await cur.fetchall()
+        return [row[0] for row in rows]
+
+    async def claim_pending_issue(self, feedback_id: int) -> Optional[Feedback]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(CLAIM_PENDING_ISSUE, (feedback_id, self.claim_timeout))
+                result = await cur.fetchone()
+        if not result:
+            return None
+        return _row_to_feedback(result)
+
+    async def release_issue_claim(self, feedback_id: int) -> None:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(RELEASE_ISSUE_CLAIM, (feedback_id,))
+
+    async def update(self, feedback: Feedback) -> Feedback:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(UPDATE_FEEDBACK, (
+                    feedback.title, feedback.description, feedback.category, feedback.author_name,
+                    feedback.github_issue_url, feedback.github_issue_status, feedback.id
+                ))
+        return feedback
+
+    async def delete(self, feedback_id: int) -> bool:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(DELETE_FEEDBACK, (feedback_id,))
+                deleted = cur.rowcount > 0
+        return deleted
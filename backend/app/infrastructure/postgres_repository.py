@@ -1,110 +1,255 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
+import json
 from datetime import date
-import psycopg
-from app.domain.models import Book
-from app.domain.repositories import BookRepository
-from app.infrastructure.database import get_connection
-
-class PostgresBookRepository(BookRepository):
-    """PostgreSQLの本リポジトリ実装"""
-
-    def add(self, book: Book) -> Book:
-        conn = get_connection()
-        if not conn:
-            from app.infrastructure.repositories import InMemoryBookRepository
-            return InMemoryBookRepository().add(book)
-
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO books (title, borrower_name, return_date) VALUES (%s, %s, %s) RETURNING id",
-                (book.title, book.borrower_name, book.return_date)
-            )
-            book.id = cur.fetchone()[0]
-        conn.commit()
-        conn.close()
-        return book
+from psycopg_pool import AsyncConnectionPool
+from app.domain.models import Book, BookAlreadyBorrowedError, BookNotBorrowedError, BorrowerSummary, CatalogVersion
+from app.domain.repositories import AsyncBookRepository
+from app.infrastructure.book_events import BOOK_EVENTS_CHANNEL, book_event
+
+def _row_to_book(row) -> Book:
+    """SELECT結果の行をドメインモデルに変換する"""
+    id, title, borrower_name, return_date = row
+    return Book(id=id, title=title, borrower_name=borrower_name, return_date=return_date)
+
+def _escape_like(value: str) -> str:
+    """LIKEパターンのワイルドカードをエスケープする"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# psycopgは同じ内容のSQLがprepare_threshold回実行されると、接続ごとにプリペアドステートメントにする
+SELECT_BOOKS = "SELECT id, title, borrower_name, return_date FROM books"
+SELECT_BOOK_BY_ID = SELECT_BOOKS + " WHERE id = %s"
+SELECT_BOOK_EXISTS = "SELECT 1 FROM books WHERE id = %s"
+INSERT_BOOK = "INSERT INTO books (title, borrower_name, return_date) VALUES (%s, %s, %s) RETURNING id"
+UPDATE_BOOK = "UPDATE books SET title = %s, borrower_name = %s, return_date = %s WHERE id = %s"
+DELETE_BOOK = "DELETE FROM books WHERE id = %s"
+BORROW_BOOK = (
+    "UPDATE books SET borrower_name = %s, return_date = %s "
+    "WHERE id = %s AND borrower_name IS NULL "
+    "RETURNING id, title, borrower_name, return_date"
+)
+RETURN_BOOK = (
+    "UPDATE books SET borrower_name = NULL, return_date = NULL "
+    "WHERE id = %s AND borrower_name IS NOT NULL "
+    "RETURNING id, title, borrower_name, return_date"
+)
+# books_due_idx（貸出中の行だけの部分インデックス）を期限順にたどる
+SELECT_DUE_BOOKS = SELECT_BOOKS + " WHERE borrower_name IS NOT NULL AND return_date < %s ORDER BY return_date, id"
+SELECT_DUE_BOOKS_LIMIT = SELECT_DUE_BOOKS + " LIMIT %s"
+# books_borrower_name_idx（btree）で完全一致の名前を引く
+SELECT_BOOKS_BY_BORROWER = SELECT_BOOKS + " WHERE borrower_name = %s ORDER BY id"
+SELECT_BORROWERS = (
+    "SELECT borrower_name, count(*), min(return_date) FROM books "
+    "WHERE borrower_name IS NOT NULL GROUP BY borrower_name ORDER BY borrower_name"
+)
+SELECT_CATALOG_VERSION = "SELECT version, modified_at FROM catalog_version"
+
+def _search_where(has_title: bool, has_borrower_name: bool, has_after: bool, loans_only: bool = False) -> str:
+    """検索条件の組み合わせごとに決まったWHERE句を返す"""
+    # ILIKE '%...%' は title / borrower_name のトライグラムGINインデックスで評価される
+    where = " WHERE 1=1"
+    if has_title:
+        where += " AND title ILIKE %s"
+    if has_borrower_name:
+        where += " AND borrower_name ILIKE %s"
+    if loans_only:
+        where += " AND borrower_name IS NOT NULL"
+    if has_after:
+        # キーセットページング：主キーの範囲スキャンで次のページだけを読む
+        where += " AND id > %s"
+    return where
+
+def _search_conditions(title: Optional[str], borrower_name: Optional[str],
+                       after: Optional[int], loans_only: bool = False) -> Tuple[str, list]:
+    """検索条件のWHERE句とパラメータを組み立てる"""
+    params = []
+    if title:
+        params.append(f"%{_escape_like(title)}%")
+    if borrower_name:
+        params.append(f"%{_escape_like(borrower_name)}%")
+    if after is not None:
+        params.append(after)
+    return _search_where(bool(title), bool(borrower_name), after is not None, loans_only), params
 
-    def get_by_id(self, book_id: int) -> Optional[Book]:
-        conn = get_connection()
-        if not conn:
-            from app.infrastructure.repositories import InMemoryBookRepository
-            return InMemoryBookRepository().get_by_id(book_id)
-
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, title, borrower_name, return_date FROM books WHERE id = %s", (book_id,))
-            result = cur.fetchone()
-            if not result:
-                return None
-            id, title, borrower_name, return_date = result
-            book = Book(id=id, title=title, borrower_name=borrower_name, return_date=return_date)
-        conn.close()
+def _search_query(has_title: bool, has_borrower_name: bool, has_after: bool, rank: bool, has_limit: bool) -> str:
+    """検索のSELECT文を返す（条件の組み合わせごとに同じ文字列になる）"""
+    query = SELECT_BOOKS + _search_where(has_title, has_borrower_name, has_after)
+    if rank and (has_title or has_borrower_name):
+        rank_terms = []
+        if has_title:
+            rank_terms.append("similarity(title, %s)")
+        if has_borrower_name:
+            rank_terms.append("similarity(borrower_name, %s)")
+        query += " ORDER BY " + " + ".join(rank_terms) + " DESC, id"
+    else:
+        query += " ORDER BY id"
+    if has_limit:
+        query += " LIMIT %s"
+    return query
+
+class PostgresBookRepository(AsyncBookRepository):
+    """PostgreSQLの本リポジトリ実装（非同期接続をコネクションプールから借りる）"""
+
+    def __init__(self, pool: AsyncConnectionPool):
+        self.pool = pool
+
+    async def add(self, book: Book) -> Book:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(INSERT_BOOK, (book.title, book.borrower_name, book.return_date))
+                book.id = (await cur.fetchone())[0]
         return book
 
-    def get_all(self) -> List[Book]:
-        conn = get_connection()
-        if not conn:
-            from app.infrastructure.repositories import InMemoryBookRepository
-            return InMemoryBookRepository().get_all()
-
-        books = []
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, title, borrower_name, return_date FROM books")
-            for row in cur.fetchall():
-                id, title, borrower_name, return_date = row
-                books.append(Book(id=id, title=title, borrower_name=borrower_name, return_date=return_date))
-        conn.close()
-        return books
-
-    def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None) -> List[Book]:
-        conn = get_connection()
-        if not conn:
-            from app.infrastructure.repositories import InMemoryBookRepository
-            return InMemoryBookRepository().search(title, borrower_name)
-
-        books = []
-        query = "SELECT id, title, borrower_name, return_date FROM books WHERE 1=1"
-        params = []
-
-        if title:
-            query += " AND title ILIKE %s"
-            params.append(f"%{title}%")
-
-        if borrower_name:
-            query += " AND borrower_name ILIKE %s"
-            params.append(f"%{borrower_name}%")
-
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            for row in cur.fetchall():
-                id, title, borrower_name, return_date = row
-                books.append(Book(id=id, title=title, borrower_name=borrower_name, return_date=return_date))
-        conn.close()
-        return books
-
-    def update(self, book: Book) -> Book:
-        conn = get_connection()
-        if not conn:
-            from app.infrastructure.repositories import InMemoryBookRepository
-            return InMemoryBookRepository().update(book)
-
-        with conn.cursor() as cur:
-            cur.execute(
-                "UPDATE books SET title = %s, borrower_name = %s, return_date = %s WHERE id = %s",
-                (book.title, book.borrower_name, book.return_date, book.id)
+    async def bulk_add(self, books: AsyncIterator[Book]) -> int:
+        count = 0
+        # 1回のCOPY FROM STDINで流し込み、コネクションのトランザクションでまとめてコミットする
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                # 行ごとの変更通知は送らず、最後に1件だけまとめて通知する
+                await cur.execute("SET LOCAL app.suppress_book_notify = 'on'")
+                async with cur.copy("COPY books (title, borrower_name, return_date) FROM STDIN") as copy:
+                    async for book in books:
+                        await copy.write_row((book.title, book.borrower_name, book.return_date))
+                        count += 1
+                await cur.execute(
+                    "SELECT pg_notify(%s, %s)",
+                    (BOOK_EVENTS_CHANNEL, json.dumps(book_event("bulk_imported", None, count=count)))
+                )
+        return count
+
+    async def get_by_id(self, book_id: int) -> Optional[Book]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SELECT_BOOK_BY_ID, (book_id,))
+                result = await cur.fetchone()
+        if not result:
+            return None
+        return _row_to_book(result)
+
+    async def get_all(self) -> List[Book]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SELECT_BOOKS)
+                rows = await cur.fetchall()
+        return [_row_to_book(row) for row in rows]
+
+    async def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     limit: Optional[int] = None, rank: bool = False, after: Optional[int] = None) -> List[Book]:
+        query = _search_query(bool(title), bool(borrower_name), after is not None, rank, limit is not None)
+        _, params = _search_conditions(title, borrower_name, after)
+        if rank:
+            if title:
+                params.append(title)
+            if borrower_name:
+                params.append(borrower_name)
+        if limit is not None:
+            params.append(limit)
+
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params)
+                rows = await cur.fetchall()
+        return [_row_to_book(row) for row in rows]
+
+    async def stream(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     after: Optional[int] = None, batch_size: int = 500) -> AsyncIterator[Book]:
+        where, params = _search_conditions(title, borrower_name, after)
+        query = SELECT_BOOKS + where + " ORDER BY id"
+
+        async with self.pool.connection() as conn:
+            # 名前付き（サーバー側）カーソルで結果を保持し、batch_size件ずつ取り出す
+            async with conn.cursor(name="books_stream") as cur:
+                cur.itersize = batch_size
+                await cur.execute(query, params)
+                async for row in cur:
+                    yield _row_to_book(row)
+
+    async def export(self, fmt: str, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     loans_only: bool = False) -> AsyncIterator[bytes]:
+        where, params = _search_conditions(title, borrower_name, None, loans_only)
+        select = SELECT_BOOKS + where + " ORDER BY id"
+        if fmt == "csv":
+            statement = f"COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER)"
+        else:
+            # textフォーマットではJSON中のバックスラッシュがエスケープされるため、
+            # 値に現れない文字を引用符・区切り文字にしたcsvフォーマットでそのまま出力する
+            statement = (
+                f"COPY (SELECT row_to_json(b) FROM ({select}) b) TO STDOUT "
+                "WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
             )
-        conn.commit()
-        conn.close()
+
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                async with cur.copy(statement, params) as copy:
+                    async for data in copy:
+                        yield bytes(data)
+
+    async def borrow(self, book_id: int, borrower_name: str, return_date: date) -> Optional[Book]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(BORROW_BOOK, (borrower_name, return_date, book_id))
+                result = await cur.fetchone()
+                if not result:
+                    # 更新できなかった場合だけ、存在しないのか貸出中なのかを確認する
+                    await cur.execute(SELECT_BOOK_EXISTS, (book_id,))
+                    if not await cur.fetchone():
+                        return None
+                    raise BookAlreadyBorrowedError("この本は既に貸し出されています")
+        return _row_to_book(result)
+
+    async def return_book(self, book_id: int) -> Optional[Book]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(RETURN_BOOK, (book_id,))
+                result = await cur.fetchone()
+                if not result:
+                    await cur.execute(SELECT_BOOK_EXISTS, (book_id,))
+                    if not await cur.fetchone():
+                        return None
+                    raise BookNotBorrowedError("この本は貸し出されていません")
+        return _row_to_book(result)
+
+    async def find_due(self, before: date, limit: Optional[int] = None) -> List[Book]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                if limit is None:
+                    await cur.execute(SELECT_DUE_BOOKS, (before,))
+                else:
+                    await cur.execute(SELECT_DUE_BOOKS_LIMIT, (before, limit))
+                rows = await cur.fetchall()
+        return [_row_to_book(row) for row in rows]
+
+    async def find_by_borrower(self, borrower_name: str) -> List[Book]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SELECT_BOOKS_BY_BORROWER, (borrower_name,))
+                rows = await cur.fetchall()
+        return [_row_to_book(row) for row in rows]
+
+    async def get_borrowers(self) -> List[BorrowerSummary]:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SELECT_BORROWERS)
+                rows = await cur.fetchall()
+        return [BorrowerSummary(name=name, count=count, earliest_return_date=earliest)
+                for name, count, earliest in rows]
+
+    async def get_catalog_version(self) -> CatalogVersion:
+        # booksを変更したトランザクションごとにトリガーで更新される1行だけのテーブルを読む
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SELECT_CATALOG_VERSION)
+                version, modified_at = await cur.fetchone()
+        return CatalogVersion(version=version, modified_at=modified_at)
+
+    async def update(self, book: Book) -> Book:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(UPDATE_BOOK, (book.title, book.borrower_name, book.return_date, book.id))
         return book
-        
-    def delete(self, book_id: int) -> bool:
-        conn = get_connection()
-        if not conn:
-            from app.infrastructure.repositories import InMemoryBookRepository
-            return InMemoryBookRepository().delete(book_id)
-        
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM books WHERE id = %s", (book_id,))
-            deleted = cur.rowcount > 0
-        conn.commit()
-        conn.close()
+
+    async def delete(self, book_id: int) -> bool:
+        async with self.pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(DELETE_BOOK, (book_id,))
+                deleted = cur.rowcount > 0
         return deleted
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from app.infrastructure.cache import LRUCache
+from app.infrastructure.ngram_index import normalize_query
+
+logger = logging.getLogger(__name__)
+
+class RecommendationCache:
+    """正規化した問い合わせ文をキーにした書籍推薦のキャッシュ
+
+    メモリ上のLRU+TTLキャッシュの後ろに、pathを指定した場合はSQLiteのファイルを置き、
+    再起動後も有効期限内の結果を使えるようにする。値はJSONに変換できるもの（推薦のリスト）に限る。
+    SQLiteの読み書きはイベントループを止めないようスレッドで行い、期限切れの行はpurge_interval秒ごとに掃除する。
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 86400.0, path: Optional[str] = None,
+                 purge_interval: float = 3600.0):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.next_purge = 0.0
+        self.memory: LRUCache[List[Dict[str, Any]]] = LRUCache(max_entries, ttl)
+        self.path = path
+        self.db: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        """ディスクのキャッシュを開く（初回だけ）"""
+        if self.path and self.db is None:
+            try:
+                self.db = sqlite3.connect(self.path, check_same_thread=False)
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS recommendations (query TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                # 期限切れの行の掃除用
+                self.db.execute("CREATE INDEX IF NOT EXISTS recommendations_expires_at_idx ON recommendations (expires_at)")
+                self.db.commit()
+            except sqlite3.Error as e:
+                # ディスクが使えなくてもメモリのキャッシュだけで動作は継続できる
+                logger.warning(f"推薦キャッシュのファイルを開けませんでした: {e}")
+                self.path = None
+                self.db = None
+        return self.db
+
+    async def get(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """問い合わせ文に対するキャッシュ済みの推薦を返す（なければNone）"""
+        key = normalize_query(query)
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        row = await asyncio.to_thread(self._read, key) if self.path else None
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        value = json.loads(row)
+        self.memory.set(key, value)
+        return value
+
+    async def set(self, query: str, value: List[Dict[str, Any]]) -> None:
+        """推薦を登録する"""
+        key = normalize_query(query)
+        self.memory.set(key, value)
+        if self.path:
+            await asyncio.to_thread(self._write, key, json.dumps(value, ensure_ascii=False))
+
+    def _read(self, key: str) -> Optional[str]:
+        with self.lock:
+            db = self._disk()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT value FROM recommendations WHERE query = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _write(self, key: str, value: str) -> None:
+        with self.lock:
+            db = self._disk()
+            if db is None:
+                return
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO recommendations (query, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + self.ttl)
+            )
+            if now >= self.next_purge:
+                db.execute("DELETE FROM recommendations WHERE expires_at <= ?", (now,))
+                self.next_purge = now + self.purge_interval
+            db.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """監視用の統計情報（ヒット率はメモリとディスクを合わせたもの）"""
+        hits = self.memory.hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory": self.memory.stats(),
+            "persistent": bool(self.path),
+            "disk_hits": self.disk_hits,
+            "hits": hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
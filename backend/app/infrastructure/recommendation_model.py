@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+from app.config import settings
+
+if TYPE_CHECKING:
+    import anthropic
+
+logger = logging.getLogger(__name__)
+
+class RecommendationModelBusyError(Exception):
+    """同時実行数の上限に達していて、待ち時間内に問い合わせを始められなかった"""
+    pass
+
+class RecommendationModelError(Exception):
+    """Anthropic APIの呼び出しに失敗した（SDKの例外を包む）"""
+    pass
+
+class AnthropicRecommendationModel:
+    """書籍推薦に使うClaudeのクライアント
+
+    プロセスで1つの非同期クライアント（HTTP接続プール）を共有し、同時に問い合わせる数を
+    max_concurrencyまでに抑える。上限に達している間はqueue_timeout秒まで空きを待つ。
+    SDKの読み込みは重いので、呼び出し側がanthropicをimportしなくて済むよう例外は包んで返す。
+    """
+
+    def __init__(self, client: "anthropic.AsyncAnthropic", model: str, max_tokens: int = 2000,
+                 max_concurrency: int = 4, queue_timeout: float = 10.0):
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _acquire(self) -> None:
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise RecommendationModelBusyError("推薦の問い合わせが混み合っています")
+
+    def _params(self, prompt: str) -> dict:
+        return dict(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0.7
+        )
+
+    async def complete(self, prompt: str) -> str:
+        """プロンプトを送り、応答のテキストを返す"""
+        import anthropic
+
+        await self._acquire()
+        try:
+            message = await self.client.messages.create(**self._params(prompt))
+        except anthropic.APIError as e:
+            raise RecommendationModelError(str(e)) from e
+        finally:
+            self.semaphore.release()
+        return message.content[0].text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """プロンプトを送り、応答のテキストを生成された順に少しずつ返す"""
+        import anthropic
+
+        await self._acquire()
+        try:
+            async with self.client.messages.stream(**self._params(prompt)) as stream:
+                async for text in stream.text_stream:
+                    yield text
+        except anthropic.APIError as e:
+            raise RecommendationModelError(str(e)) from e
+        finally:
+            self.semaphore.release()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+def create_recommendation_model(api_key: str, base_url: Optional[str] = None) -> AnthropicRecommendationModel:
+    """設定に従って推薦用のクライアントを作る"""
+    # SDKの読み込みには1秒以上かかることがあるため、APIキーがあってクライアントを作るときだけimportする
+    import anthropic
+
+    # 同時実行数はセマフォで抑えるので、接続プールはSDKの既定のものをクライアントごと使い回す
+    client = anthropic.AsyncAnthropic(
+        api_key=api_key,
+        base_url=base_url or None,
+        timeout=anthropic.Timeout(settings.RECOMMENDATION_TIMEOUT, connect=settings.RECOMMENDATION_CONNECT_TIMEOUT),
+        max_retries=settings.RECOMMENDATION_MAX_RETRIES,
+    )
+    return AnthropicRecommendationModel(
+        client,
+        model=settings.RECOMMENDATION_MODEL,
+        max_concurrency=settings.RECOMMENDATION_MAX_CONCURRENCY,
+        queue_timeout=settings.RECOMMENDATION_QUEUE_TIMEOUT,
+    )
+
+# プロセス内で共有するクライアント（FastAPIのlifespanで作成・破棄する）
+_model: Optional[AnthropicRecommendationModel] = None
+# クライアントを作っている起動時のタスク
+_opening: Optional[asyncio.Task] = None
+
+async def _create_model() -> AnthropicRecommendationModel:
+    global _model
+
+    # SDKのimportとクライアントの作成はスレッドで行い、イベントループを止めない
+    _model = await asyncio.to_thread(
+        create_recommendation_model, settings.ANTHROPIC_API_KEY, settings.ANTHROPIC_BASE_URL
+    )
+    return _model
+
+def _start_opening() -> asyncio.Task:
+    """クライアントを作るタスクを返す（まだない、または失敗していれば始める）"""
+    global _opening
+
+    if _opening is None or (_opening.done() and _model is None):
+        _opening = asyncio.get_running_loop().create_task(_create_model())
+    return _opening
+
+async def open_recommendation_model() -> Optional[AnthropicRecommendationModel]:
+    """アプリケーション起動時に推薦用のクライアントを作る（APIキーがなければ作らない）
+
+    lifespanからタスクとして起動すれば待ち受けの開始を遅らせない。
+    """
+    if not settings.ANTHROPIC_API_KEY:
+        logger.warning("ANTHROPIC_API_KEYが設定されていないため、書籍推薦は利用できません")
+        return None
+    return await _start_opening()
+
+async def close_recommendation_model() -> None:
+    """アプリケーション終了時に推薦用のクライアントを閉じる"""
+    global _model, _opening
+
+    if _opening is not None and not _opening.done():
+        _opening.cancel()
+    _opening = None
+    if _model is not None:
+        await _model.close()
+        _model = None
+
+async def get_recommendation_model() -> Optional[AnthropicRecommendationModel]:
+    """推薦用のクライアントを取得する（APIキーが設定されていなければNone）
+
+    起動時の準備が終わっていなければ、RECOMMENDATION_READY_TIMEOUT秒まで待つ。
+    それでも準備ができなければRecommendationModelBusyErrorにする。
+    """
+    if _model is not None or not settings.ANTHROPIC_API_KEY:
+        return _model
+    try:
+        # 待つのをやめても、起動時のタスクは止めない
+        return await asyncio.wait_for(asyncio.shield(_start_opening()), timeout=settings.RECOMMENDATION_READY_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise RecommendationModelBusyError("書籍推薦の準備中です。しばらくしてから再度お試しください")
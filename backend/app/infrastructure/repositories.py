@@ -1,7 +1,32 @@
-from typing import List, Optional, Dict
-from datetime import date
-from app.domain.models import Book
-from app.domain.repositories import BookRepository
+from typing import AsyncIterator, Iterable, List, Optional, Dict
+from itertools import islice
+from datetime import date, datetime, timezone
+from app.domain.models import Book, BorrowerSummary, CatalogVersion
+from app.domain.repositories import BookRepository, AsyncBookRepository
+from app.infrastructure.ngram_index import NgramIndex, normalize
+from app.infrastructure.due_date_index import DueDateIndex
+from app.infrastructure.borrower_index import BorrowerIndex
+from app.infrastructure.book_export import csv_chunks, ndjson_chunks
+from app.infrastructure.book_events import BookEventBroadcaster, book_event, book_events
+
+def _trigrams(text: str) -> set:
+    """pg_trgmと同様に単語ごとに空白を補ってトライグラムを作る"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _similarity(a: str, b: str) -> float:
+    """トライグラムの一致率による類似度（pg_trgmのsimilarity相当）"""
+    grams_a, grams_b = _trigrams(a), _trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+def _due_date(book: Book) -> Optional[date]:
+    """貸出中の本の返却期限（貸出中でなければNone）"""
+    return book.return_date if book.is_borrowed() else None
 
 class InMemoryBookRepository(BookRepository):
     """インメモリの本リポジトリ実装"""
@@ -9,37 +34,222 @@ class InMemoryBookRepository(BookRepository):
     def __init__(self):
         self.books: Dict[int, Book] = {}
         self.next_id = 1
+        # 部分一致検索用のn-gram索引（add/update/deleteで差分更新する）
+        self.title_index = NgramIndex()
+        self.borrower_index = NgramIndex()
+        # 延滞・返却期限の近い本を探すための返却期限順の索引
+        self.due_index = DueDateIndex()
+        # 貸出先の名前（完全一致）から本を引く索引
+        self.loan_index = BorrowerIndex()
+        self.catalog_version = CatalogVersion(version=1, modified_at=datetime.now(timezone.utc))
+    
+    def _touch(self) -> None:
+        """書き込みのたびに蔵書のバージョンを進める"""
+        self.catalog_version = CatalogVersion(
+            version=self.catalog_version.version + 1,
+            modified_at=datetime.now(timezone.utc)
+        )
     
     def add(self, book: Book) -> Book:
         book.id = self.next_id
         self.books[book.id] = book
         self.next_id += 1
+        self.title_index.add(book.id, book.title)
+        self.borrower_index.add(book.id, book.borrower_name)
+        self.due_index.add(book.id, _due_date(book))
+        self.loan_index.add(book.id, book.borrower_name)
+        self._touch()
         return book
     
+    def add_many(self, books: Iterable[Book]) -> int:
+        books_by_id = self.books
+        title_index = self.title_index
+        borrower_index = self.borrower_index
+        due_index = self.due_index
+        loan_index = self.loan_index
+        next_id = self.next_id
+        for book in books:
+            book.id = next_id
+            books_by_id[next_id] = book
+            title_index.add(next_id, book.title)
+            borrower_index.add(next_id, book.borrower_name)
+            due_index.add(next_id, _due_date(book))
+            loan_index.add(next_id, book.borrower_name)
+            next_id += 1
+        count = next_id - self.next_id
+        self.next_id = next_id
+        if count:
+            self._touch()
+        return count
+    
     def get_by_id(self, book_id: int) -> Optional[Book]:
         return self.books.get(book_id)
     
     def get_all(self) -> List[Book]:
         return list(self.books.values())
     
-    def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None) -> List[Book]:
-        result = self.get_all()
+    def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+               limit: Optional[int] = None, rank: bool = False, after: Optional[int] = None) -> List[Book]:
+        ids = None
         
         if title:
-            result = [book for book in result if title.lower() in book.title.lower()]
+            ids = self.title_index.search(title)
         
         if borrower_name:
-            result = [book for book in result if book.borrower_name and borrower_name.lower() in book.borrower_name.lower()]
+            matched = self.borrower_index.search(borrower_name)
+            ids = matched if ids is None else ids & matched
+        
+        # booksは採番順（IDの昇順）に並んでいる
+        if ids is None:
+            matches = iter(self.books.values())
+        else:
+            matches = (self.books[book_id] for book_id in sorted(ids))
+        
+        if after is not None:
+            matches = (book for book in matches if book.id > after)
+        
+        if not (rank and (title or borrower_name)):
+            # ランキングしない場合は必要な件数だけ取り出す
+            return list(islice(matches, limit))
+        
+        def score(book: Book) -> float:
+            total = 0.0
+            if title:
+                total += _similarity(title, book.title)
+            if borrower_name:
+                total += _similarity(borrower_name, book.borrower_name)
+            return total
+        
+        result = sorted(matches, key=score, reverse=True)
+        
+        if limit is not None:
+            result = result[:limit]
         
         return result
     
     def update(self, book: Book) -> Book:
         if book.id in self.books:
             self.books[book.id] = book
+            self.title_index.update(book.id, book.title)
+            self.borrower_index.update(book.id, book.borrower_name)
+            self.due_index.update(book.id, _due_date(book))
+            self.loan_index.update(book.id, book.borrower_name)
+            self._touch()
         return book
     
     def delete(self, book_id: int) -> bool:
         if book_id in self.books:
             del self.books[book_id]
+            self.title_index.remove(book_id)
+            self.borrower_index.remove(book_id)
+            self.due_index.remove(book_id)
+            self.loan_index.remove(book_id)
+            self._touch()
             return True
         return False
+    
+    def find_due(self, before: date, limit: Optional[int] = None) -> List[Book]:
+        return [self.books[book_id] for book_id in self.due_index.before(before, limit)]
+    
+    def find_by_borrower(self, borrower_name: str) -> List[Book]:
+        return [self.books[book_id] for book_id in sorted(self.loan_index.get(borrower_name))]
+    
+    def get_borrowers(self) -> List[BorrowerSummary]:
+        due_dates = self.due_index.due_dates
+        return [
+            BorrowerSummary(name=name, count=len(ids),
+                            earliest_return_date=min((due_dates[i] for i in ids if i in due_dates), default=None))
+            for name, ids in sorted(self.loan_index.books_by_borrower.items())
+        ]
+    
+    def get_catalog_version(self) -> CatalogVersion:
+        return self.catalog_version
+
+class AsyncInMemoryBookRepository(AsyncBookRepository):
+    """インメモリリポジトリを非同期インターフェースで公開するアダプタ
+
+    インメモリ実装はI/Oを伴わないため、スレッドに逃がさずそのまま呼び出す。
+    書き込みのたびに変更イベントをプロセス内のブロードキャスターへ配信する。
+    """
+
+    def __init__(self, repository: Optional[BookRepository] = None, events: BookEventBroadcaster = book_events):
+        self.repository = repository if repository is not None else InMemoryBookRepository()
+        self.events = events
+
+    async def add(self, book: Book) -> Book:
+        book = self.repository.add(book)
+        self.events.publish(book_event("created", book.id, book))
+        return book
+
+    async def bulk_add(self, books: AsyncIterator[Book], batch_size: int = 1000) -> int:
+        count = 0
+        batch = []
+        async for book in books:
+            batch.append(book)
+            if len(batch) >= batch_size:
+                count += self.repository.add_many(batch)
+                batch = []
+        if batch:
+            count += self.repository.add_many(batch)
+        self.events.publish(book_event("bulk_imported", None, count=count))
+        return count
+
+    async def get_by_id(self, book_id: int) -> Optional[Book]:
+        return self.repository.get_by_id(book_id)
+
+    async def get_all(self) -> List[Book]:
+        return self.repository.get_all()
+
+    async def search(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     limit: Optional[int] = None, rank: bool = False, after: Optional[int] = None) -> List[Book]:
+        return self.repository.search(title, borrower_name, limit, rank, after)
+
+    async def stream(self, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     after: Optional[int] = None, batch_size: int = 500) -> AsyncIterator[Book]:
+        for book in self.repository.search(title, borrower_name, after=after):
+            yield book
+
+    async def export(self, fmt: str, title: Optional[str] = None, borrower_name: Optional[str] = None,
+                     loans_only: bool = False) -> AsyncIterator[bytes]:
+        books = self.repository.search(title, borrower_name)
+        if loans_only:
+            books = [book for book in books if book.is_borrowed()]
+        encode = csv_chunks if fmt == "csv" else ndjson_chunks
+        for chunk in encode(books):
+            yield chunk
+
+    async def borrow(self, book_id: int, borrower_name: str, return_date: date) -> Optional[Book]:
+        # 同期処理のため、確認から更新までの間に他のリクエストが割り込むことはない
+        book = self.repository.borrow(book_id, borrower_name, return_date)
+        if book:
+            self.events.publish(book_event("updated", book.id, book))
+        return book
+
+    async def return_book(self, book_id: int) -> Optional[Book]:
+        book = self.repository.return_book(book_id)
+        if book:
+            self.events.publish(book_event("updated", book.id, book))
+        return book
+
+    async def find_due(self, before: date, limit: Optional[int] = None) -> List[Book]:
+        return self.repository.find_due(before, limit)
+
+    async def find_by_borrower(self, borrower_name: str) -> List[Book]:
+        return self.repository.find_by_borrower(borrower_name)
+
+    async def get_borrowers(self) -> List[BorrowerSummary]:
+        return self.repository.get_borrowers()
+
+    async def get_catalog_version(self) -> CatalogVersion:
+        return self.repository.get_catalog_version()
+
+    async def update(self, book: Book) -> Book:
+        book = self.repository.update(book)
+        self.events.publish(book_event("updated", book.id, book))
+        return book
+
+    async def delete(self, book_id: int) -> bool:
+        deleted = self.repository.delete(book_id)
+        if deleted:
+            self.events.publish(book_event("deleted", book_id))
+        return deleted
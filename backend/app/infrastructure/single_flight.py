@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+class _Flight:
+    """実行中の1つの呼び出しと、その結果を待っている数"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight(Generic[T]):
+    """同じキーの同時の呼び出しを1回にまとめる
+
+    実行中のキーにdo()が呼ばれた場合は新たに呼び出さず、実行中の呼び出しの結果（または例外）を
+    全員に返す。呼び出しは待っている側とは別のタスクで実行するので、1人がキャンセル
+    （クライアントの切断など）されても他の待ち手には影響しない。全員がいなくなった場合は呼び出しも
+    キャンセルする。timeoutを指定した場合、1回の呼び出しがその秒数を超えると全員にTimeoutErrorを返す。
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.flights: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """keyの呼び出しが実行中ならその結果を待ち、なければfnを呼び出して結果を待つ"""
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(self._run(fn)))
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            self.calls += 1
+        else:
+            self.shared += 1
+
+        flight.waiters += 1
+        try:
+            # shieldで包み、待ち手のキャンセルが共有の呼び出しに伝わらないようにする
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                # 最後の待ち手がいなくなったので呼び出しも止める。後から来たものは新たに呼び出す
+                self._forget(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def _run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        if self.timeout is None:
+            return await fn()
+        return await asyncio.wait_for(fn(), timeout=self.timeout)
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        self._forget(key, flight)
+        if not flight.task.cancelled():
+            # 待ち手が誰もいない場合に「例外が取り出されなかった」警告を出さない
+            flight.task.exception()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """監視用の統計情報（sharedは実行中の呼び出しに相乗りした回数）"""
+        return {
+            "in_flight": len(self.flights),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
@@ -1,11 +1,64 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
-import psycopg
-from app.routers import books, feedback, recommendations
+from app.routers import books, borrowers, feedback, recommendations
+from app.infrastructure.database import open_pool, close_pool, get_pool, pool_stats, get_database_url, init_db_with_retry
+from app.infrastructure.book_events import book_events
+from app.infrastructure.postgres_events import PostgresBookEventListener
+from app.infrastructure.recommendation_model import open_recommendation_model, close_recommendation_model
+from app.dependencies import (
+    book_cache_stats, close_catalog_recommender, close_recommendation_cache, get_recommendation_cache,
+    get_recommendation_flights, start_github_issue_outbox, stop_github_issue_outbox,
+)
+
+logger = logging.getLogger(__name__)
+
+async def initialize_in_background():
+    """DBを使う起動処理（初期化と、作成待ちのGitHub Issueの再開）
+
+    DBが遅い・落ちている場合でもアプリケーションの起動（ポートの待ち受け）を止めないよう、
+    lifespanからはタスクとして起動して待たない。
+    """
+    await init_db_with_retry()
+    try:
+        await start_github_issue_outbox()
+    except Exception as e:
+        logger.warning(f"作成待ちのGitHub Issueを再開できませんでした: {e}")
 
-app = FastAPI(title="Company Library Management System")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # コネクションプールはアプリケーションのライフサイクルで管理する（接続はバックグラウンドで確立する）
+    await open_pool()
+    # DBの初期化と、書籍推薦用のClaudeクライアント（SDKのimportに時間がかかる）の準備は待たない
+    background = [
+        asyncio.create_task(initialize_in_background()),
+        asyncio.create_task(open_recommendation_model()),
+    ]
+    # 変更フィード：ワーカーごとに1本のLISTEN接続で受け取り、購読者全員に配信する
+    listener = None
+    db_url = get_database_url()
+    if db_url:
+        # 通知には本の内容が含まれないので、キャッシュを通さずにDBから読み直す
+        from app.infrastructure.postgres_repository import PostgresBookRepository
+        listener = PostgresBookEventListener(db_url, book_events, PostgresBookRepository(get_pool()).get_by_id)
+        listener.start()
+    yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await close_recommendation_model()
+    close_recommendation_cache()
+    close_catalog_recommender()
+    await stop_github_issue_outbox()
+    if listener:
+        await listener.stop()
+    await close_pool()
+
+app = FastAPI(title="Company Library Management System", lifespan=lifespan)
 
 # Disable CORS. Do not remove this for full-stack development.
 app.add_middleware(
@@ -19,9 +72,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],  # Pagination cursor and cache validators for GET /api/books
 )
 
 app.include_router(books.router, prefix="/api")
+app.include_router(borrowers.router, prefix="/api")
 app.include_router(feedback.router, prefix="/api")
 app.include_router(recommendations.router, prefix="/api")
 
@@ -33,5 +88,26 @@ async def healthz():
 async def api_healthz():
     return {"status": "ok"}
 
+@app.get("/api/healthz/db")
+async def db_healthz():
+    """監視用にコネクションプールの統計情報を返す"""
+    stats = pool_stats()
+    return {"status": "ok" if stats else "unavailable", "pool": stats}
+
+@app.get("/api/healthz/cache")
+async def cache_healthz():
+    """監視用に本の読み取りキャッシュの統計情報を返す"""
+    stats = book_cache_stats()
+    return {"status": "ok" if stats else "disabled", "cache": stats}
+
+@app.get("/api/healthz/recommendations")
+async def recommendations_healthz():
+    """監視用に書籍推薦キャッシュのヒット率や、まとめた問い合わせの数を返す"""
+    return {
+        "status": "ok",
+        "cache": get_recommendation_cache().stats(),
+        "flights": get_recommendation_flights().stats(),
+    }
+
 if os.path.exists("static"):
     app.mount("/", StaticFiles(directory="static", html=True), name="static")
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional, Dict
-from datetime import date
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Dict
+import asyncio
+import json
+import zlib
+from datetime import date, timezone
+from email.utils import format_datetime
+import hashlib
 from pydantic import BaseModel
 from app.application.services import BookService
-from app.domain.models import Book as DomainBook
-from app.dependencies import get_book_service
+from app.domain.models import (
+    Book as DomainBook, BookAlreadyBorrowedError, BookNotBorrowedError, CatalogVersion, RankedPageCursorError,
+)
+from app.dependencies import get_book_service, get_book_events
+from app.config import settings
+from app.infrastructure.book_export import encode_ndjson_line
+from app.infrastructure.book_events import BookEventBroadcaster
+from app.routers.responses import json_response
 
 router = APIRouter(
     prefix="/books",
@@ -33,26 +45,200 @@ def domain_to_dto(book: DomainBook) -> Book:
         return_date=book.return_date
     )
 
+def catalog_etag(version: CatalogVersion, *parts) -> str:
+    """蔵書のバージョンとリクエストの内容から強いETagを作る"""
+    digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:16]
+    return f'"{version.version}-{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-MatchのいずれかのETagが一致するかどうか"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def validator_headers(version: CatalogVersion, etag: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(version.modified_at.astimezone(timezone.utc), usegmt=True),
+        # キャッシュしてよいが、使う前に必ず再検証させる
+        "Cache-Control": "no-cache",
+    }
+
+async def ndjson_stream(books: AsyncIterator[DomainBook], batch_size: int) -> AsyncIterator[bytes]:
+    """本をNDJSONに変換し、batch_size件ごとにまとめて送り出す"""
+    lines = []
+    async for book in books:
+        lines.append(encode_ndjson_line(book))
+        if len(lines) >= batch_size:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """バイト列のストリームをgzip形式で圧縮しながら送り出す"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
 @router.post("/", response_model=Book)
 async def create_book(book: BookCreate, service: BookService = Depends(get_book_service)):
-    domain_book = service.create_book(book.title)
+    domain_book = await service.create_book(book.title)
     return domain_to_dto(domain_book)
 
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportResult(BaseModel):
+    imported: int
+    error_count: int
+    errors: List[ImportRowError]
+
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+@router.post("/import", response_model=ImportResult)
+async def import_books(request: Request, service: BookService = Depends(get_book_service)):
+    """CSV（ヘッダー付き）またはNDJSONのリクエストボディから本を一括登録する"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = IMPORT_CONTENT_TYPES.get(content_type)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Content-Type must be text/csv or application/x-ndjson")
+
+    result = await service.import_books(request.stream(), fmt)
+    return ImportResult(imported=result.imported, error_count=result.error_count, errors=result.errors)
+
 @router.get("/", response_model=List[Book])
 async def read_books(
+    request: Request,
     title: Optional[str] = None, 
     borrower_name: Optional[str] = None, 
+    limit: int = Query(settings.BOOKS_MAX_PAGE_SIZE, ge=1, le=settings.BOOKS_MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, ge=0, description="前のページのX-Next-Cursor"),
+    rank: bool = False,
+    format: str = Query("json", pattern="^(json|ndjson)$",
+                        description="ndjsonの場合は件数の上限なしで全件をストリーミングする"),
+    if_none_match: Optional[str] = Header(None),
     service: BookService = Depends(get_book_service)
 ):
-    domain_books = service.get_books(title, borrower_name)
-    return [domain_to_dto(book) for book in domain_books]
+    # 蔵書が変わっていなければ本のデータを読まずに304を返す
+    version = await service.get_catalog_version()
+    etag = catalog_etag(version, "books", sorted(request.query_params.multi_items()))
+    headers = validator_headers(version, etag)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if format == "ndjson":
+        batch_size = settings.BOOKS_STREAM_BATCH_SIZE
+        books = service.stream_books(title, borrower_name, after, batch_size)
+        return StreamingResponse(ndjson_stream(books, batch_size), media_type="application/x-ndjson", headers=headers)
+
+    try:
+        domain_books, next_cursor = await service.get_books_page(limit, title, borrower_name, after, rank)
+    except RankedPageCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    return json_response(domain_books, headers=headers)
+
+@router.get("/export")
+async def export_books(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    title: Optional[str] = None,
+    borrower_name: Optional[str] = None,
+    loans_only: bool = Query(False, description="貸出中の本（貸出情報）だけを出力する"),
+    gzip: bool = False,
+    service: BookService = Depends(get_book_service)
+):
+    """本の一覧をCSVまたはNDJSONでストリーミング出力する"""
+    chunks = service.export_books(format, title, borrower_name, loans_only)
+    filename = f"books.{format}"
+    media_type = EXPORT_MEDIA_TYPES[format]
+    if gzip:
+        chunks = gzip_stream(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/overdue", response_model=List[Book])
+async def read_overdue_books(
+    limit: Optional[int] = Query(None, ge=1),
+    service: BookService = Depends(get_book_service)
+):
+    """返却期限を過ぎた貸出中の本を期限の早い順に取得する"""
+    domain_books = await service.get_overdue_books(date.today(), limit)
+    return json_response(domain_books)
+
+@router.get("/due", response_model=List[Book])
+async def read_due_books(
+    before: date = Query(..., description="この日より前に返却期限が来る本を返す（この日は含まない）"),
+    limit: Optional[int] = Query(None, ge=1),
+    service: BookService = Depends(get_book_service)
+):
+    """返却期限がbeforeより前の貸出中の本を期限の早い順に取得する"""
+    domain_books = await service.get_due_books(before, limit)
+    return json_response(domain_books)
+
+# 中継サーバーに接続を切られないよう、イベントがなくても定期的にコメント行を送る
+SSE_KEEPALIVE_SECONDS = 15.0
+
+def format_sse(event: Dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+async def sse_stream(request: Request, events: BookEventBroadcaster) -> AsyncIterator[str]:
+    with events.subscribe() as queue:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+
+@router.get("/events")
+async def book_events_stream(request: Request, events: BookEventBroadcaster = Depends(get_book_events)):
+    """本の追加・更新・削除をServer-Sent Eventsで配信する"""
+    return StreamingResponse(
+        sse_stream(request, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{book_id}", response_model=Book)
-async def read_book(book_id: int, service: BookService = Depends(get_book_service)):
-    domain_book = service.get_book(book_id)
+async def read_book(
+    book_id: int,
+    if_none_match: Optional[str] = Header(None),
+    service: BookService = Depends(get_book_service)
+):
+    version = await service.get_catalog_version()
+    etag = catalog_etag(version, "book", book_id)
+    headers = validator_headers(version, etag)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    domain_book = await service.get_book(book_id)
     if not domain_book:
         raise HTTPException(status_code=404, detail="Book not found")
-    return domain_to_dto(domain_book)
+    return json_response(domain_book, headers=headers)
 
 class BorrowRequest(BaseModel):
     borrower_name: str
@@ -64,21 +250,27 @@ async def borrow_book(
     borrow_data: BorrowRequest,
     service: BookService = Depends(get_book_service)
 ):
-    domain_book = service.borrow_book(book_id, borrow_data.borrower_name, borrow_data.return_date)
+    try:
+        domain_book = await service.borrow_book(book_id, borrow_data.borrower_name, borrow_data.return_date)
+    except BookAlreadyBorrowedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not domain_book:
         raise HTTPException(status_code=404, detail="Book not found")
     return domain_to_dto(domain_book)
 
 @router.put("/{book_id}/return", response_model=Book)
 async def return_book(book_id: int, service: BookService = Depends(get_book_service)):
-    domain_book = service.return_book(book_id)
+    try:
+        domain_book = await service.return_book(book_id)
+    except BookNotBorrowedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not domain_book:
         raise HTTPException(status_code=404, detail="Book not found")
     return domain_to_dto(domain_book)
 
 @router.delete("/{book_id}", response_model=Dict[str, str])
 async def delete_book(book_id: int, service: BookService = Depends(get_book_service)):
-    success = service.delete_book(book_id)
+    success = await service.delete_book(book_id)
     if not success:
         raise HTTPException(status_code=404, detail="Book not found")
     return {"message": "Book deleted successfully"}
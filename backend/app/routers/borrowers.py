@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends
+from typing import List, Optional
+from datetime import date
+from pydantic import BaseModel
+from app.application.services import BookService
+from app.dependencies import get_book_service
+from app.routers.books import Book
+from app.routers.responses import json_response
+
+router = APIRouter(
+    prefix="/borrowers",
+    tags=["borrowers"],
+)
+
+class BorrowerSummary(BaseModel):
+    name: str
+    count: int
+    earliest_return_date: Optional[date] = None
+
+@router.get("/", response_model=List[BorrowerSummary])
+async def read_borrowers(service: BookService = Depends(get_book_service)):
+    """借りている人ごとの冊数と最も早い返却期限を取得する"""
+    return json_response(await service.get_borrowers())
+
+@router.get("/{name}/books", response_model=List[Book])
+async def read_borrower_books(name: str, service: BookService = Depends(get_book_service)):
+    """その人が借りている本を取得する（名前は完全一致）"""
+    return json_response(await service.get_borrower_books(name))
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
+from app.config import settings
+from app.domain.feedback_repositories import FeedbackCursor
 from app.application.feedback_services import FeedbackService
 from app.domain.feedback_models import Feedback as DomainFeedback
 from app.dependencies import get_feedback_service
+from app.routers.responses import json_response
 
 router = APIRouter(
     prefix="/feedback",
@@ -24,6 +27,8 @@ class Feedback(FeedbackBase):
     id: int
     created_at: datetime
     github_issue_url: Optional[str] = None
+    # "pending"（作成待ち）, "created", "failed", "skipped"（GitHub未設定）
+    github_issue_status: str = "pending"
 
     class Config:
         from_attributes = True
@@ -36,14 +41,15 @@ def domain_to_dto(feedback: DomainFeedback) -> Feedback:
         category=feedback.category,
         author_name=feedback.author_name,
         created_at=feedback.created_at,
-        github_issue_url=feedback.github_issue_url
+        github_issue_url=feedback.github_issue_url,
+        github_issue_status=feedback.github_issue_status
     )
 
 @router.post("/", response_model=Feedback)
 async def create_feedback(feedback: FeedbackCreate, service: FeedbackService = Depends(get_feedback_service)):
     """フィードバックを作成する"""
     try:
-        domain_feedback = service.create_feedback(
+        domain_feedback = await service.create_feedback(
             title=feedback.title,
             description=feedback.description,
             category=feedback.category,
@@ -55,16 +61,36 @@ async def create_feedback(feedback: FeedbackCreate, service: FeedbackService = D
     except Exception as e:
         raise HTTPException(status_code=500, detail="フィードバックの作成に失敗しました")
 
+def format_cursor(cursor: FeedbackCursor) -> str:
+    """一覧のカーソルをX-Next-Cursorヘッダーの値にする"""
+    created_at, feedback_id = cursor
+    return f"{created_at.isoformat()},{feedback_id}"
+
+def parse_cursor(value: str) -> FeedbackCursor:
+    """beforeパラメータのカーソルを読む（不正な形式はValueError）"""
+    created_at, feedback_id = value.rsplit(",", 1)
+    return datetime.fromisoformat(created_at), int(feedback_id)
+
 @router.get("/", response_model=List[Feedback])
-async def read_feedbacks(service: FeedbackService = Depends(get_feedback_service)):
-    """フィードバック一覧を取得する"""
-    domain_feedbacks = service.get_feedbacks()
-    return [domain_to_dto(feedback) for feedback in domain_feedbacks]
+async def read_feedbacks(
+    limit: int = Query(settings.FEEDBACK_PAGE_SIZE, ge=1, le=settings.FEEDBACK_MAX_PAGE_SIZE),
+    category: Optional[str] = Query(None, pattern="^(bug|feature|improvement)$"),
+    before: Optional[str] = Query(None, description="前のページのX-Next-Cursorの値。これより古いものを返す"),
+    service: FeedbackService = Depends(get_feedback_service)
+):
+    """フィードバック一覧を新しい順に取得する（次のページがあればX-Next-Cursorヘッダーを返す）"""
+    try:
+        cursor = parse_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="beforeの形式が正しくありません")
+    domain_feedbacks, next_cursor = await service.get_feedbacks_page(limit, category, cursor)
+    headers = {"X-Next-Cursor": format_cursor(next_cursor)} if next_cursor else None
+    return json_response(domain_feedbacks, headers=headers)
 
 @router.get("/{feedback_id}", response_model=Feedback)
 async def read_feedback(feedback_id: int, service: FeedbackService = Depends(get_feedback_service)):
     """IDでフィードバックを取得する"""
-    domain_feedback = service.get_feedback(feedback_id)
+    domain_feedback = await service.get_feedback(feedback_id)
     if not domain_feedback:
         raise HTTPException(status_code=404, detail="フィードバックが見つかりません")
     return domain_to_dto(domain_feedback)
@@ -72,7 +98,7 @@ async def read_feedback(feedback_id: int, service: FeedbackService = Depends(get
 @router.delete("/{feedback_id}")
 async def delete_feedback(feedback_id: int, service: FeedbackService = Depends(get_feedback_service)):
     """フィードバックを削除する"""
-    success = service.delete_feedback(feedback_id)
+    success = await service.delete_feedback(feedback_id)
     if not success:
         raise HTTPException(status_code=404, detail="フィードバックが見つかりません")
     return {"message": "フィードバックを削除しました"}
@@ -1,10 +1,26 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
-import anthropic
-import os
+from typing import AsyncIterator, List, Optional
+import asyncio
 import json
+import logging
 import re
+from app.config import settings
+from app.dependencies import (
+    get_catalog_recommender, get_recommendation_cache, get_recommendation_flights, get_recommendation_model,
+)
+from app.infrastructure.catalog_recommender import CatalogRecommender
+from app.infrastructure.json_stream import JSONObjectStreamParser
+from app.infrastructure.ngram_index import normalize_query
+from app.infrastructure.recommendation_cache import RecommendationCache
+from app.infrastructure.single_flight import SingleFlight
+from app.routers.books import format_sse
+from app.infrastructure.recommendation_model import (
+    AnthropicRecommendationModel, RecommendationModelBusyError, RecommendationModelError,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/books/recommendations",
@@ -20,14 +36,32 @@ class BookRecommendation(BaseModel):
     amazon_url: str
     recommendation_reason: str
 
+class LibraryBookRecommendation(BaseModel):
+    """蔵書にある貸出可能な本（scoreは問い合わせとの類似度）"""
+    id: int
+    title: str
+    score: float
+
 class RecommendationResponse(BaseModel):
     recommendations: List[BookRecommendation]
+    library_books: List[LibraryBookRecommendation] = []
 
 def create_amazon_url(title: str, author: str) -> str:
     """書籍のタイトルと著者からAmazonの検索URLを生成"""
     search_query = f"{title} {author}".replace(" ", "+")
     return f"https://www.amazon.co.jp/s?k={search_query}&i=stripbooks"
 
+def to_recommendation(item: dict) -> BookRecommendation:
+    """AIの応答の1件（title, author, reason）を書籍推薦に変換"""
+    title = item.get('title', '')
+    author = item.get('author', '')
+    return BookRecommendation(
+        title=title,
+        author=author,
+        amazon_url=create_amazon_url(title, author),
+        recommendation_reason=item.get('reason', '')
+    )
+
 def parse_ai_response(response_text: str) -> List[BookRecommendation]:
     """AIの応答を解析して書籍推薦リストに変換"""
     try:
@@ -49,37 +83,18 @@ def parse_ai_response(response_text: str) -> List[BookRecommendation]:
         recommendations = []
         
         for item in recommendations_data:
-            title = item.get('title', '')
-            author = item.get('author', '')
-            amazon_url = create_amazon_url(title, author)
-            recommendation_reason = item.get('reason', '')
-            
-            recommendations.append(BookRecommendation(
-                title=title,
-                author=author,
-                amazon_url=amazon_url,
-                recommendation_reason=recommendation_reason
-            ))
+            recommendations.append(to_recommendation(item))
         
         return recommendations
     except Exception as e:
         raise ValueError(f"Failed to parse AI response: {str(e)}")
 
-@router.post("/", response_model=RecommendationResponse)
-async def get_book_recommendations(request: RecommendationRequest):
-    try:
-        # Anthropic APIキーを環境変数から取得
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=500, detail="Anthropic API key not configured")
-        
-        client = anthropic.Anthropic(api_key=api_key)
-        
-        # プロンプトを作成
-        prompt = f"""
+def build_prompt(query: str) -> str:
+    """書籍推薦のプロンプトを作成する"""
+    return f"""
 あなたは経験豊富な書籍推薦エキスパートです。以下のユーザーのリクエストに基づいて、5冊の書籍を推薦してください。
 
-ユーザーのリクエスト: {request.query}
+ユーザーのリクエスト: {query}
 
 以下のJSON形式で回答してください：
 
@@ -98,29 +113,147 @@ async def get_book_recommendations(request: RecommendationRequest):
 - 各書籍について、なぜその本がユーザーのリクエストに適しているかを明確に説明してください
 - 多様なジャンルや著者から選んでください
 """
+
+async def find_library_books(catalog: CatalogRecommender, query: str) -> List[LibraryBookRecommendation]:
+    """蔵書から問い合わせに近い貸出可能な本を探す（外部への問い合わせはしない）"""
+    matches = await catalog.recommend(query, settings.RECOMMENDATION_LOCAL_LIMIT)
+    return [
+        LibraryBookRecommendation(id=match.book.id, title=match.book.title, score=round(match.score, 4))
+        for match in matches
+    ]
+
+def is_sufficient(library_books: List[LibraryBookRecommendation]) -> bool:
+    """蔵書からの推薦だけで十分か（Claudeに問い合わせなくてよいか）"""
+    strong = [book for book in library_books if book.score >= settings.RECOMMENDATION_LOCAL_SUFFICIENT_SCORE]
+    return len(strong) >= settings.RECOMMENDATION_LOCAL_SUFFICIENT_COUNT
+
+async def fetch_recommendations(
+    query: str,
+    model: Optional[AnthropicRecommendationModel],
+    cache: RecommendationCache,
+    flights: SingleFlight
+) -> List[BookRecommendation]:
+    """Claudeに書籍推薦を問い合わせる（失敗した場合はHTTPExceptionにする）"""
+    try:
+        # クライアントはAPIキーが設定されている場合だけ起動時に作られる
+        if model is None:
+            raise HTTPException(status_code=500, detail="Anthropic API key not configured")
         
-        # Claude APIを呼び出し
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=2000,
-            temperature=0.7,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        )
-        
-        # レスポンスを解析
-        ai_response = message.content[0].text
-        recommendations = parse_ai_response(ai_response)
+        async def fetch() -> List[BookRecommendation]:
+            # Claude APIを呼び出し（待っている間も他のリクエストは処理される）
+            ai_response = await model.complete(build_prompt(query))
+            
+            # レスポンスを解析
+            recommendations = parse_ai_response(ai_response)
+            if recommendations:
+                await cache.set(query, [recommendation.model_dump() for recommendation in recommendations])
+            return recommendations
         
-        return RecommendationResponse(recommendations=recommendations)
+        # 同じ問い合わせが同時に来た場合は1回だけ呼び出し、全員に同じ結果（またはエラー）を返す
+        return await flights.do(normalize_query(query), fetch)
         
-    except anthropic.APIError as e:
+    except HTTPException:
+        raise
+    except RecommendationModelBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Recommendation request timed out")
+    except RecommendationModelError as e:
         raise HTTPException(status_code=500, detail=f"Anthropic API error: {str(e)}")
     except ValueError as e:
         raise HTTPException(status_code=500, detail=f"Response parsing error: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.post("/", response_model=RecommendationResponse)
+async def get_book_recommendations(
+    request: RecommendationRequest,
+    model: Optional[AnthropicRecommendationModel] = Depends(get_recommendation_model),
+    cache: RecommendationCache = Depends(get_recommendation_cache),
+    flights: SingleFlight = Depends(get_recommendation_flights),
+    catalog: CatalogRecommender = Depends(get_catalog_recommender)
+):
+    library_books = await find_library_books(catalog, request.query)
+    
+    # 表記ゆれ（全角・半角、大文字・小文字、空白）を除いた同じ問い合わせなら前回の結果を返す
+    cached = await cache.get(request.query)
+    if cached is not None:
+        return RecommendationResponse(recommendations=cached, library_books=library_books)
+    
+    # 蔵書に十分近い本があればClaudeには問い合わせない
+    if is_sufficient(library_books):
+        return RecommendationResponse(recommendations=[], library_books=library_books)
+    
+    try:
+        recommendations = await fetch_recommendations(request.query, model, cache, flights)
+    except HTTPException as e:
+        if not library_books:
+            raise
+        # Claudeに問い合わせられなくても、蔵書からの推薦は返す
+        logger.warning(f"書籍推薦の問い合わせに失敗したため蔵書からの推薦のみ返します: {e.detail}")
+        recommendations = []
+    
+    return RecommendationResponse(recommendations=recommendations, library_books=library_books)
+
+def library_event(library_books: List[LibraryBookRecommendation]) -> str:
+    return format_sse({"type": "library", "books": [book.model_dump() for book in library_books]})
+
+async def recommendation_events(
+    query: str, model: AnthropicRecommendationModel, cache: RecommendationCache,
+    library_books: Optional[List[LibraryBookRecommendation]] = None
+) -> AsyncIterator[str]:
+    """推薦を1件ずつServer-Sent Eventsに変換する（応答のJSONオブジェクトが閉じた時点で送る）
+
+    最初に蔵書からの推薦を送る。クライアントが切断するとStreamingResponseがこの
+    ジェネレーターをキャンセルし、モデルへの問い合わせも打ち切られる。
+    """
+    yield library_event(library_books or [])
+    recommendations: List[BookRecommendation] = []
+    parser = JSONObjectStreamParser()
+    try:
+        async for text in model.stream(build_prompt(query)):
+            for item in parser.feed(text):
+                recommendation = to_recommendation(item)
+                recommendations.append(recommendation)
+                yield format_sse({"type": "recommendation", "recommendation": recommendation.model_dump()})
+    except RecommendationModelBusyError as e:
+        yield format_sse({"type": "error", "status": 503, "detail": str(e)})
+        return
+    except Exception as e:
+        yield format_sse({"type": "error", "status": 500, "detail": f"Anthropic API error: {str(e)}"})
+        return
+
+    if recommendations:
+        await cache.set(query, [recommendation.model_dump() for recommendation in recommendations])
+    yield format_sse({"type": "done", "count": len(recommendations)})
+
+@router.get("/stream")
+async def stream_book_recommendations(
+    query: str = Query(..., min_length=1),
+    model: Optional[AnthropicRecommendationModel] = Depends(get_recommendation_model),
+    cache: RecommendationCache = Depends(get_recommendation_cache),
+    catalog: CatalogRecommender = Depends(get_catalog_recommender)
+):
+    """書籍推薦をServer-Sent Eventsで1件ずつ配信する
+
+    最初にlibrary（蔵書からの推薦）、続いてrecommendationを推薦ごとに送り、最後にdoneかerrorを送る。
+    """
+    library_books = await find_library_books(catalog, query)
+    cached = await cache.get(query)
+    if cached is not None:
+        events = [library_event(library_books)]
+        events.extend(format_sse({"type": "recommendation", "recommendation": item}) for item in cached)
+        events.append(format_sse({"type": "done", "count": len(cached)}))
+        stream = iter(events)
+    elif is_sufficient(library_books) or (model is None and library_books):
+        # 蔵書からの推薦だけで返す
+        stream = iter([library_event(library_books), format_sse({"type": "done", "count": 0})])
+    elif model is None:
+        raise HTTPException(status_code=500, detail="Anthropic API key not configured")
+    else:
+        stream = recommendation_events(query, model, cache, library_books)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
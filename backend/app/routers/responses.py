@@ -0,0 +1,11 @@
+from typing import Any, Dict, Optional
+import orjson
+from fastapi import Response
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """ドメインオブジェクト（dataclass）をorjsonで直接JSONにして返す
+
+    DTOへの変換とresponse_modelによる再検証を省く高速パス。
+    OpenAPIのスキーマはエンドポイントのresponse_modelから生成されるので変わらない。
+    """
+    return Response(content=orjson.dumps(content), media_type="application/json", headers=headers)
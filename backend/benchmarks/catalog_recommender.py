@@ -0,0 +1,50 @@
+"""蔵書からの推薦（TF-IDF）の索引作成と問い合わせにかかる時間を測る
+
+    python -m benchmarks.catalog_recommender [冊数]
+
+build:  全冊を読み込んで重みを計算する（起動後の最初の問い合わせ）
+update: 1冊追加した後の問い合わせ（変わった本のn-gramだけ作り直し、重みはまとめて再計算）
+query:  変更がないときの問い合わせ
+"""
+import asyncio
+import random
+import sys
+import time
+
+from app.domain.models import Book
+from app.infrastructure.book_events import BookEventBroadcaster
+from app.infrastructure.catalog_recommender import CatalogRecommender
+from app.infrastructure.repositories import AsyncInMemoryBookRepository
+
+WORDS = ["Python", "入門", "実践", "機械学習", "データ分析", "歴史", "ミステリー", "経営", "設計", "ガイド",
+         "基礎", "アルゴリズム", "小説", "心理学", "統計", "Rust", "Web", "クラウド", "日本", "世界"]
+QUERIES = ["機械学習の入門書", "python データ分析", "日本の歴史を学びたい", "おすすめのミステリー小説"]
+
+async def run(count: int) -> None:
+    rng = random.Random(0)
+    events = BookEventBroadcaster()
+    repository = AsyncInMemoryBookRepository(events=events)
+    for i in range(count):
+        repository.repository.add(Book(id=0, title=" ".join(rng.sample(WORDS, 3)) + f" {i}"))
+    recommender = CatalogRecommender(repository, events)
+
+    started = time.perf_counter()
+    await recommender.recommend(QUERIES[0])
+    print(f" build: {(time.perf_counter() - started) * 1000:8.2f} ms / {count}冊")
+
+    await repository.add(Book(id=0, title="機械学習 入門 新刊"))
+    started = time.perf_counter()
+    await recommender.recommend(QUERIES[0])
+    print(f"update: {(time.perf_counter() - started) * 1000:8.2f} ms")
+
+    started = time.perf_counter()
+    for query in QUERIES * 25:
+        await recommender.recommend(query)
+    print(f" query: {(time.perf_counter() - started) * 1000 / (len(QUERIES) * 25):8.2f} ms")
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    asyncio.run(run(count))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""本の一覧のシリアライズにかかる1件あたりの時間を比べる
+
+    python -m benchmarks.serialization [件数]
+
+before: ドメイン → DTO → response_modelでの再検証 → JSON（従来のFastAPIの経路）
+after:  ドメイン（dataclass）を直接orjsonでエンコード
+"""
+import sys
+import timeit
+from datetime import date
+from typing import List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.domain.models import Book as DomainBook
+from app.routers.books import Book, domain_to_dto
+
+def make_books(count: int) -> List[DomainBook]:
+    return [
+        DomainBook(id=i, title=f"本のタイトル {i}",
+                   borrower_name="山田太郎" if i % 3 == 0 else None,
+                   return_date=date(2030, 1, 1) if i % 3 == 0 else None)
+        for i in range(1, count + 1)
+    ]
+
+def before(books: List[DomainBook], adapter: TypeAdapter) -> bytes:
+    dtos = [domain_to_dto(book) for book in books]
+    validated = adapter.validate_python(dtos, from_attributes=True)
+    return JSONResponse(jsonable_encoder(adapter.dump_python(validated, mode="json"))).body
+
+def after(books: List[DomainBook]) -> bytes:
+    return orjson.dumps(books)
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    books = make_books(count)
+    adapter = TypeAdapter(List[Book])
+    assert orjson.loads(before(books, adapter)) == orjson.loads(after(books))
+
+    for name, func in (("before", lambda: before(books, adapter)), ("after", lambda: after(books))):
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{name:>6}: {best * 1000:8.2f} ms / {count}件  {best / count * 1e6:6.3f} µs/件")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""アプリケーションのimportとlifespanの起動にかかる時間を測り、予算を超えていないか確認する
+
+    python -m benchmarks.startup [--budget-ms ミリ秒] [--top 件数]
+
+`python -X importtime -c "import app.main"` を別プロセスで実行して、全体と時間のかかったモジュールを表示する。
+起動時に読み込まない約束のSDK（HEAVY_MODULES）が読み込まれている場合や、importが予算を超えた場合は
+終了コード1で終わる（CIやデプロイ前の確認に使う）。
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 最初に使うときまでimportを遅らせているもの（起動時に読み込まれていたら退行）
+HEAVY_MODULES = ("anthropic", "github", "psycopg", "psycopg_pool", "numpy")
+
+STARTUP_SCRIPT = """
+import asyncio, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def run():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(run())
+print(f"{(imported - started) * 1000:.1f} {(ready - imported) * 1000:.1f}")
+"""
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    # DBや外部APIに接続しない構成で測る
+    env = dict(os.environ, TEST_MODE="1", ANTHROPIC_API_KEY="")
+    return subprocess.run([sys.executable, *args], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """-X importtimeの出力をモジュール名 -> (自身の時間, 累積時間)（マイクロ秒）にする"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # 見出しの行
+            continue
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="import app.mainにかけてよい時間")
+    parser.add_argument("--top", type=int, default=10, help="表示するモジュールの数")
+    args = parser.parse_args()
+
+    times = parse_importtime(run_python("-X", "importtime", "-c", "import app.main").stderr)
+    total_ms = times["app.main"][1] / 1000
+    top: List[Tuple[str, Tuple[int, int]]] = sorted(
+        ((name, value) for name, value in times.items() if "." not in name and name != "app"),
+        key=lambda item: item[1][1], reverse=True
+    )[:args.top]
+    print(f"import app.main: {total_ms:8.1f} ms (予算 {args.budget_ms:.0f} ms)")
+    for name, (_, cumulative_us) in top:
+        print(f"  {name:<24} {cumulative_us / 1000:8.1f} ms")
+
+    import_ms, lifespan_ms = run_python("-c", STARTUP_SCRIPT).stdout.split()
+    print(f"import + lifespan起動: {float(import_ms):8.1f} ms + {float(lifespan_ms):.1f} ms")
+
+    loaded = sorted({name.split(".")[0] for name in times} & set(HEAVY_MODULES))
+    if loaded:
+        print(f"起動時に読み込まれたSDK: {', '.join(loaded)}")
+    if total_ms > args.budget_ms:
+        print("importの時間が予算を超えています")
+    return 1 if loaded or total_ms > args.budget_ms else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,7 @@
+import csv
+import gzip
+import io
+import json
 import pytest
 from fastapi.testclient import TestClient
 from datetime import date, timedelta
@@ -8,11 +12,11 @@ from app.main import app
 # テストクライアントを作成
 from app.main import app
 from fastapi.testclient import TestClient
-from app.infrastructure.repositories import InMemoryBookRepository
+from app.infrastructure.repositories import AsyncInMemoryBookRepository
 from app.application.services import BookService
 from app.dependencies import get_book_service
 
-_test_repository = InMemoryBookRepository()
+_test_repository = AsyncInMemoryBookRepository()
 
 def get_test_book_service():
     return BookService(repository=_test_repository)
@@ -115,3 +119,227 @@ def test_delete_book(client):
     
     response = client.get(f"/api/books/{book_id}")
     assert response.status_code == 404
+
+def test_search_rank_and_limit(client):
+    client.post("/api/books/", json={"title": "ランキングテスト 応用編 第二版"})
+    client.post("/api/books/", json={"title": "ランキングテスト"})
+    
+    response = client.get("/api/books/?title=ランキングテスト&rank=true")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 2
+    assert data[0]["title"] == "ランキングテスト"
+    
+    response = client.get("/api/books/?title=ランキングテスト&limit=1")
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+def test_read_books_pagination(client):
+    for i in range(3):
+        client.post("/api/books/", json={"title": f"ページングテスト{i}"})
+    
+    response = client.get("/api/books/?title=ページングテスト&limit=2")
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [book["title"] for book in first_page] == ["ページングテスト0", "ページングテスト1"]
+    cursor = response.headers["X-Next-Cursor"]
+    assert cursor == str(first_page[-1]["id"])
+    
+    response = client.get(f"/api/books/?title=ページングテスト&limit=2&after={cursor}")
+    assert response.status_code == 200
+    assert [book["title"] for book in response.json()] == ["ページングテスト2"]
+    assert "X-Next-Cursor" not in response.headers
+    
+    response = client.get("/api/books/?limit=100000")
+    assert response.status_code == 422
+    
+    response = client.get(f"/api/books/?title=ページングテスト&rank=true&after={cursor}")
+    assert response.status_code == 400
+
+def test_read_books_ndjson_stream(client):
+    for i in range(3):
+        client.post("/api/books/", json={"title": f"ストリームテスト{i}"})
+    
+    response = client.get("/api/books/?title=ストリームテスト&format=ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [book["title"] for book in lines] == ["ストリームテスト0", "ストリームテスト1", "ストリームテスト2"]
+    assert lines[0]["borrower_name"] is None
+
+def test_import_books_csv(client):
+    body = "\n".join([
+        "title,borrower_name,return_date",
+        "インポートCSV本1,,",
+        "インポートCSV本2,インポート太郎,2030-01-31",
+        ",,",
+        "インポートCSV本3,インポート次郎,",
+    ])
+    response = client.post("/api/books/import", content=body.encode("utf-8"), headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["error_count"] == 2
+    assert [error["line"] for error in data["errors"]] == [4, 5]
+    
+    response = client.get("/api/books/?borrower_name=インポート太郎")
+    assert [book["return_date"] for book in response.json()] == ["2030-01-31"]
+
+def test_import_books_csv_quoted_newlines(client):
+    body = "\r\n".join([
+        "title,borrower_name,return_date",
+        '"改行を含む本\r\n第2行 ""引用"", 続き",,',
+        "改行の後の本,,",
+        '"閉じていない本,,',
+    ])
+    response = client.post("/api/books/import", content=body.encode("utf-8"), headers={"Content-Type": "text/csv"})
+    data = response.json()
+    assert data["imported"] == 2
+    assert [error["line"] for error in data["errors"]] == [5]
+    
+    response = client.get("/api/books/?title=第2行")
+    assert [book["title"] for book in response.json()] == ['改行を含む本\n第2行 "引用", 続き']
+
+def test_import_books_csv_stray_quote_in_unquoted_field(client):
+    # 引用符で始まらない値の中の"はただの文字で、次の行と合わせない
+    body = "\n".join([
+        "title,borrower_name,return_date",
+        '12" LPの本,山田,2030-01-01',
+        "引用符の後の本1,,",
+        "引用符の後の本2,,",
+    ])
+    response = client.post("/api/books/import", content=body.encode("utf-8"), headers={"Content-Type": "text/csv"})
+    data = response.json()
+    assert data["imported"] == 3
+    assert data["error_count"] == 0
+
+    response = client.get("/api/books/?title=LPの本")
+    assert [book["title"] for book in response.json()] == ['12" LPの本']
+
+def test_import_books_ndjson(client):
+    body = '{"title": "インポートNDJSON本1"}\n{"title": "インポートNDJSON本2"}\nnot json\n'
+    response = client.post("/api/books/import", content=body.encode("utf-8"), headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["errors"][0]["line"] == 3
+    
+    response = client.get("/api/books/?title=インポートNDJSON")
+    assert len(response.json()) == 2
+    
+    response = client.post("/api/books/import", content=b"{}", headers={"Content-Type": "application/json"})
+    assert response.status_code == 415
+
+def test_export_books(client):
+    response = client.post("/api/books/", json={"title": "エクスポート本, 上巻"})
+    book_id = response.json()["id"]
+    client.post("/api/books/", json={"title": "エクスポート本 下巻"})
+    client.put(f"/api/books/{book_id}/borrow", json={"borrower_name": "エクスポート花子", "return_date": "2030-04-01"})
+    
+    response = client.get("/api/books/export?title=エクスポート本")
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "title", "borrower_name", "return_date"]
+    assert rows[1] == [str(book_id), "エクスポート本, 上巻", "エクスポート花子", "2030-04-01"]
+    assert rows[2][1:] == ["エクスポート本 下巻", "", ""]
+    
+    response = client.get("/api/books/export?format=ndjson&title=エクスポート本&loans_only=true&gzip=true")
+    assert response.status_code == 200
+    lines = gzip.decompress(response.content).decode("utf-8").splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [book_id]
+
+def test_borrow_conflict(client):
+    response = client.post("/api/books/", json={"title": "競合テスト本"})
+    book_id = response.json()["id"]
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    
+    response = client.put(f"/api/books/{book_id}/return")
+    assert response.status_code == 409
+    
+    response = client.put(f"/api/books/{book_id}/borrow", json={"borrower_name": "先着ユーザー", "return_date": tomorrow})
+    assert response.status_code == 200
+    
+    response = client.put(f"/api/books/{book_id}/borrow", json={"borrower_name": "後着ユーザー", "return_date": tomorrow})
+    assert response.status_code == 409
+    assert client.get(f"/api/books/{book_id}").json()["borrower_name"] == "先着ユーザー"
+    
+    response = client.put("/api/books/999999/borrow", json={"borrower_name": "先着ユーザー", "return_date": tomorrow})
+    assert response.status_code == 404
+
+def test_conditional_get(client):
+    response = client.post("/api/books/", json={"title": "ETagテスト本"})
+    book_id = response.json()["id"]
+    
+    response = client.get("/api/books/?title=ETagテスト")
+    assert response.status_code == 200
+    list_etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+    
+    response = client.get("/api/books/?title=ETagテスト", headers={"If-None-Match": list_etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    
+    response = client.get(f"/api/books/{book_id}")
+    book_etag = response.headers["ETag"]
+    assert book_etag != list_etag
+    assert client.get(f"/api/books/{book_id}", headers={"If-None-Match": book_etag}).status_code == 304
+    
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    client.put(f"/api/books/{book_id}/borrow", json={"borrower_name": "ETagユーザー", "return_date": tomorrow})
+    
+    response = client.get("/api/books/?title=ETagテスト", headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+    assert response.json()[0]["borrower_name"] == "ETagユーザー"
+    assert response.headers["ETag"] != list_etag
+
+def test_fast_json_keeps_response_shape_and_schema(client):
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    book_id = client.post("/api/books/", json={"title": "シリアライズ本"}).json()["id"]
+    client.put(f"/api/books/{book_id}/borrow", json={"borrower_name": "高橋", "return_date": tomorrow})
+    
+    response = client.get(f"/api/books/{book_id}")
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"id": book_id, "title": "シリアライズ本", "borrower_name": "高橋", "return_date": tomorrow}
+    
+    schema = client.get("/openapi.json").json()
+    list_schema = schema["paths"]["/api/books/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert list_schema["items"]["$ref"] == "#/components/schemas/Book"
+    assert "/api/feedback/" in schema["paths"]
+
+def test_overdue_and_due_books(client):
+    ids = [client.post("/api/books/", json={"title": f"期限テスト本{i}"}).json()["id"] for i in range(4)]
+    client.put(f"/api/books/{ids[0]}/borrow", json={"borrower_name": "延滞者", "return_date": "2000-01-03"})
+    client.put(f"/api/books/{ids[1]}/borrow", json={"borrower_name": "延滞者", "return_date": "2000-01-01"})
+    client.put(f"/api/books/{ids[2]}/borrow", json={"borrower_name": "期限内", "return_date": "2999-01-01"})
+    
+    overdue = [book["id"] for book in client.get("/api/books/overdue").json()]
+    assert [book_id for book_id in overdue if book_id in ids] == [ids[1], ids[0]]
+    
+    response = client.get("/api/books/due?before=2000-01-03")
+    assert [book["id"] for book in response.json()] == [ids[1]]
+    
+    due = [book["id"] for book in client.get("/api/books/due?before=3000-01-01").json()]
+    assert ids[2] in due and ids[3] not in due
+    
+    client.put(f"/api/books/{ids[1]}/return")
+    assert [book["id"] for book in client.get("/api/books/overdue?limit=1").json()] == [ids[0]]
+    assert client.get("/api/books/due").status_code == 422
+
+def test_borrower_books_and_summary(client):
+    ids = [client.post("/api/books/", json={"title": f"貸出先テスト本{i}"}).json()["id"] for i in range(3)]
+    client.put(f"/api/books/{ids[0]}/borrow", json={"borrower_name": "退職 予定者", "return_date": "2999-02-01"})
+    client.put(f"/api/books/{ids[1]}/borrow", json={"borrower_name": "退職 予定者", "return_date": "2999-01-15"})
+    client.put(f"/api/books/{ids[2]}/borrow", json={"borrower_name": "退職", "return_date": "2999-03-01"})
+    
+    response = client.get("/api/borrowers/退職 予定者/books")
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json()] == ids[:2]
+    assert [book["id"] for book in client.get("/api/borrowers/退職/books").json()] == [ids[2]]
+    
+    summary = {row["name"]: row for row in client.get("/api/borrowers/").json()}
+    assert summary["退職 予定者"] == {"name": "退職 予定者", "count": 2, "earliest_return_date": "2999-01-15"}
+    
+    client.put(f"/api/books/{ids[0]}/return")
+    client.put(f"/api/books/{ids[1]}/return")
+    assert client.get("/api/borrowers/退職 予定者/books").json() == []
+    assert "退職 予定者" not in {row["name"] for row in client.get("/api/borrowers/").json()}
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.application.feedback_services import FeedbackService
+from app.application.github_issue_outbox import GitHubIssueOutbox
+from app.application.github_service import GitHubRateLimitError
+from app.dependencies import get_feedback_service
+from app.infrastructure.feedback_repositories import AsyncInMemoryFeedbackRepository
+
+class FakeGitHubClient:
+    """テスト用のGitHubクライアント（決められた回数だけ失敗してからIssueを作る）"""
+
+    def __init__(self, failures=0, rate_limited=0, delay=0.0, available=True):
+        self.failures = failures
+        self.rate_limited = rate_limited
+        self.delay = delay
+        self.available = available
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def is_available(self):
+        return self.available
+
+    def create_issue_from_feedback(self, feedback):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            with self.lock:
+                if self.rate_limited:
+                    self.rate_limited -= 1
+                    raise GitHubRateLimitError(0.05)
+                if self.failures:
+                    self.failures -= 1
+                    raise ConnectionError("GitHubに接続できません")
+            return f"https://github.com/example/repo/issues/{feedback.id}"
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def make_service(client, **options):
+    repository = AsyncInMemoryFeedbackRepository()
+    options = {"base_delay": 0.01, "max_delay": 0.05, **options}
+    outbox = GitHubIssueOutbox(repository, client, **options)
+    return FeedbackService(repository, outbox), outbox
+
+async def submit(service, n):
+    return [(await service.create_feedback(f"要望{i}", "詳細", "feature", "利用者")).id for i in range(n)]
+
+def get_feedback(service, feedback_id):
+    return service.outbox.repository.repository.get_by_id(feedback_id)
+
+def test_outbox_retries_with_bounded_concurrency():
+    client = FakeGitHubClient(failures=3, delay=0.01)
+    service, outbox = make_service(client, concurrency=2)
+
+    async def scenario():
+        ids = await submit(service, 5)
+        assert all(get_feedback(service, i).github_issue_status == "pending" for i in ids)
+        await asyncio.wait_for(outbox.drain(), timeout=5)
+        await outbox.stop()
+        return ids
+
+    ids = asyncio.run(scenario())
+    for feedback_id in ids:
+        feedback = get_feedback(service, feedback_id)
+        assert feedback.github_issue_status == "created"
+        assert feedback.github_issue_url.endswith(f"/issues/{feedback_id}")
+    assert client.calls == 8
+    assert client.max_active <= 2
+
+def test_outbox_pauses_on_rate_limit_and_gives_up_after_max_attempts():
+    client = FakeGitHubClient(rate_limited=1)
+    service, outbox = make_service(client, concurrency=1, max_attempts=2)
+
+    async def scenario():
+        ids = await submit(service, 1)
+        await asyncio.wait_for(outbox.drain(), timeout=5)
+        client.failures = 2
+        ids += await submit(service, 1)
+        await asyncio.wait_for(outbox.drain(), timeout=5)
+        await outbox.stop()
+        return ids
+
+    first, second = asyncio.run(scenario())
+    assert get_feedback(service, first).github_issue_status == "created"
+    assert get_feedback(service, second).github_issue_status == "failed"
+    assert get_feedback(service, second).github_issue_url is None
+    assert client.calls == 4
+
+def test_outbox_does_not_create_duplicate_issues():
+    client = FakeGitHubClient(delay=0.05)
+    service, outbox = make_service(client, concurrency=2)
+    # 同じリポジトリを使う別の送信キュー（別のプロセスで起動時に積み直した場合）
+    other = GitHubIssueOutbox(outbox.repository, client, concurrency=2)
+
+    async def scenario():
+        ids = await submit(service, 3)
+        # 起動時の積み直しと重なっても、同じプロセスでは二重に積まない
+        assert await service.resume_pending_issues() == 3
+        assert outbox.pending == 3
+        for feedback_id in ids:
+            other.enqueue(feedback_id)
+        await asyncio.wait_for(asyncio.gather(outbox.drain(), other.drain()), timeout=5)
+        await outbox.stop()
+        await other.stop()
+        return ids
+
+    ids = asyncio.run(scenario())
+    assert client.calls == 3
+    assert all(get_feedback(service, i).github_issue_status == "created" for i in ids)
+
+def test_create_feedback_returns_pending_immediately():
+    client = FakeGitHubClient(delay=0.2)
+    service, _ = make_service(client)
+    app.dependency_overrides[get_feedback_service] = lambda: service
+    try:
+        with TestClient(app) as test_client:
+            response = test_client.post("/api/feedback/", json={
+                "title": "貸出履歴を見たい", "description": "過去の貸出を一覧したい",
+                "category": "feature", "author_name": "田中",
+            })
+            assert response.status_code == 200
+            assert response.json()["github_issue_status"] == "pending"
+            assert response.json()["github_issue_url"] is None
+
+            feedback_id = response.json()["id"]
+            for _ in range(100):
+                feedback = test_client.get(f"/api/feedback/{feedback_id}").json()
+                if feedback["github_issue_status"] not in ("pending", "sending"):
+                    break
+                time.sleep(0.05)
+            assert feedback["github_issue_status"] == "created"
+            assert feedback["github_issue_url"].endswith(f"/issues/{feedback_id}")
+    finally:
+        app.dependency_overrides = {}
+
+def test_create_feedback_without_github_is_skipped():
+    service, outbox = make_service(FakeGitHubClient(available=False))
+    feedback = asyncio.run(service.create_feedback("要望", "詳細", "bug", "利用者"))
+    assert feedback.github_issue_status == "skipped"
+    assert outbox.pending == 0
+
+class FakeRequester:
+    def __init__(self):
+        self.rate_limiting = (-1, -1)
+        self.rate_limiting_resettime = 0
+
+class FakeRepository:
+    def __init__(self, client):
+        self.client = client
+
+    def create_issue(self, title, body, labels):
+        self.client.calls.append(f"create_issue:{','.join(labels)}")
+        self.client.requester.rate_limiting = (4999 - len(self.client.calls), 5000)
+        return type("Issue", (), {"html_url": f"https://github.com/example/repo/issues/{len(self.client.calls)}"})
+
+class FakePyGithub:
+    """PyGithubのGithubクラスの代わり（呼び出されたAPIを記録する）"""
+    instances = []
+
+    def __init__(self, auth=None):
+        self.calls = []
+        self.requester = FakeRequester()
+        FakePyGithub.instances.append(self)
+
+    def get_repo(self, full_name, lazy=False):
+        assert lazy
+        self.calls.append("get_repo")
+        return FakeRepository(self)
+
+def test_github_service_is_lazy_and_caches_repo(monkeypatch):
+    from app.application import github_service
+    from app.domain.feedback_models import Feedback
+
+    monkeypatch.setenv("GITHUB_TOKEN", "test-token")
+    monkeypatch.setattr("github.Github", FakePyGithub)
+    FakePyGithub.instances = []
+
+    service = github_service.GitHubService()
+    assert service.is_available()
+    assert FakePyGithub.instances == []
+
+    for category in ("bug", "bug", "feature"):
+        feedback = Feedback.create("タイトル", "詳細", category, "利用者")
+        assert service.create_issue_from_feedback(feedback).startswith("https://github.com/")
+
+    [client] = FakePyGithub.instances
+    # ラベルの確認・作成はせず、Issue作成の1回の呼び出しだけで済ませる
+    assert client.calls == ["get_repo", "create_issue:feedback,bug", "create_issue:feedback,bug",
+                            "create_issue:feedback,enhancement"]
+
+    client.requester.rate_limiting = (3, 5000)
+    client.requester.rate_limiting_resettime = time.time() + 120
+    with pytest.raises(GitHubRateLimitError) as error:
+        service.create_issue_from_feedback(Feedback.create("タイトル", "詳細", "bug", "利用者"))
+    assert 100 < error.value.retry_after <= 120
+    assert client.calls[-1] == "create_issue:feedback,enhancement"
+
+def test_read_feedbacks_keyset_pagination_and_category():
+    service, _ = make_service(FakeGitHubClient(available=False))
+    app.dependency_overrides[get_feedback_service] = lambda: service
+    try:
+        with TestClient(app) as test_client:
+            for i in range(5):
+                test_client.post("/api/feedback/", json={
+                    "title": f"ページ{i}", "description": "詳細",
+                    "category": "bug" if i % 2 == 0 else "feature", "author_name": "田中",
+                })
+
+            response = test_client.get("/api/feedback/?limit=2")
+            assert [f["title"] for f in response.json()] == ["ページ4", "ページ3"]
+            cursor = response.headers["X-Next-Cursor"]
+
+            response = test_client.get("/api/feedback/", params={"limit": 2, "before": cursor})
+            assert [f["title"] for f in response.json()] == ["ページ2", "ページ1"]
+            response = test_client.get("/api/feedback/", params={"limit": 2, "before": response.headers["X-Next-Cursor"]})
+            assert [f["title"] for f in response.json()] == ["ページ0"]
+            assert "X-Next-Cursor" not in response.headers
+
+            response = test_client.get("/api/feedback/?category=bug")
+            assert [f["title"] for f in response.json()] == ["ページ4", "ページ2", "ページ0"]
+            assert test_client.get("/api/feedback/?before=invalid").status_code == 400
+    finally:
+        app.dependency_overrides = {}
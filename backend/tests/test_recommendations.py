@@ -0,0 +1,517 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.routers.recommendations import recommendation_events
+from app.dependencies import (
+    get_catalog_recommender, get_recommendation_cache, get_recommendation_flights, get_recommendation_model,
+)
+from app.domain.models import Book
+from app.infrastructure.book_events import BookEventBroadcaster
+from app.infrastructure.catalog_recommender import CatalogRecommender
+from app.infrastructure.repositories import AsyncInMemoryBookRepository
+from app.infrastructure.json_stream import JSONObjectStreamParser
+from app.infrastructure.ngram_index import normalize_query
+from app.infrastructure.recommendation_cache import RecommendationCache
+from app.infrastructure import recommendation_model
+from app.infrastructure.recommendation_model import create_recommendation_model
+from app.infrastructure.single_flight import SingleFlight
+
+STUB_RECOMMENDATIONS = [
+    {"title": "Python入門", "author": "山田太郎", "reason": "基礎から学べる"},
+    {"title": "実践Python", "author": "佐藤花子", "reason": "実務の例が多い"},
+]
+
+class StubAnthropicServer(ThreadingHTTPServer):
+    """Messages APIの代わりに決まった推薦を返すローカルのスタブサーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, delay: float):
+        super().__init__(("127.0.0.1", 0), StubMessagesHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class StubMessagesHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+        finally:
+            with server.lock:
+                server.active -= 1
+        text = "おすすめはこちらです。\n```json\n" + json.dumps(STUB_RECOMMENDATIONS, ensure_ascii=False) + "\n```"
+        body = json.dumps({
+            "id": "msg_stub", "type": "message", "role": "assistant", "model": "stub",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 1},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = StubAnthropicServer(delay=0.3)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+class FakeModel:
+    """テスト用のモデルクライアント（問い合わせ回数を数えて決まった推薦を返す）"""
+
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.prompts = []
+
+    async def complete(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return "```json\n" + json.dumps(STUB_RECOMMENDATIONS, ensure_ascii=False) + "\n```"
+
+    async def stream(self, prompt):
+        """応答を数文字ずつ、delay秒おきに返す"""
+        self.prompts.append(prompt)
+        text = "おすすめはこちらです。\n```json\n" + json.dumps(STUB_RECOMMENDATIONS, ensure_ascii=False, indent=2) + "\n```"
+        for i in range(0, len(text), 8):
+            await asyncio.sleep(self.delay)
+            yield text[i:i + 8]
+        if self.error is not None:
+            raise self.error
+
+def make_catalog(*titles):
+    """テスト用の蔵書（変更イベントも独立させる）と、それを使う推薦エンジンを作る"""
+    events = BookEventBroadcaster()
+    repository = AsyncInMemoryBookRepository(events=events)
+    for title in titles:
+        repository.repository.add(Book(id=0, title=title))
+    return repository, CatalogRecommender(repository, events)
+
+def post_queries(model, cache, queries, flights=None, concurrent=False, catalog=None):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            requests = [client.post("/api/books/recommendations/", json={"query": query}) for query in queries]
+            if concurrent:
+                return await asyncio.gather(*requests)
+            return [await request for request in requests]
+
+    app.dependency_overrides[get_recommendation_model] = lambda: model
+    app.dependency_overrides[get_recommendation_cache] = lambda: cache
+    flights = flights or SingleFlight()
+    catalog = catalog or make_catalog()[1]
+    app.dependency_overrides[get_recommendation_flights] = lambda: flights
+    app.dependency_overrides[get_catalog_recommender] = lambda: catalog
+    try:
+        return asyncio.run(run())
+    finally:
+        app.dependency_overrides = {}
+
+def run_with_model(stub_server, scenario):
+    async def run():
+        model = create_recommendation_model("test-key", stub_server.url)
+        cache = RecommendationCache()
+        flights = SingleFlight()
+        _, catalog = make_catalog()
+        app.dependency_overrides[get_recommendation_model] = lambda: model
+        app.dependency_overrides[get_recommendation_cache] = lambda: cache
+        app.dependency_overrides[get_recommendation_flights] = lambda: flights
+        app.dependency_overrides[get_catalog_recommender] = lambda: catalog
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client)
+        finally:
+            app.dependency_overrides = {}
+            await model.close()
+
+    return asyncio.run(run())
+
+def test_recommendations_do_not_block_other_requests(stub_server):
+    async def scenario(client):
+        pending = asyncio.create_task(client.post("/api/books/recommendations/", json={"query": "Python"}))
+        await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        health = await client.get("/api/healthz")
+        elapsed = time.perf_counter() - started
+        assert health.status_code == 200
+        assert elapsed < 0.2
+        assert not pending.done()
+
+        return await pending
+
+    response = run_with_model(stub_server, scenario)
+    assert response.status_code == 200
+    recommendations = response.json()["recommendations"]
+    assert [r["title"] for r in recommendations] == ["Python入門", "実践Python"]
+    assert recommendations[0]["amazon_url"].startswith("https://www.amazon.co.jp/s?k=")
+
+def test_recommendations_concurrency_is_bounded(stub_server, monkeypatch):
+    from app.config import settings
+    monkeypatch.setattr(settings, "RECOMMENDATION_MAX_CONCURRENCY", 2)
+    stub_server.delay = 0.1
+
+    async def scenario(client):
+        return await asyncio.gather(*[
+            client.post("/api/books/recommendations/", json={"query": f"テーマ{i}"}) for i in range(5)
+        ])
+
+    responses = run_with_model(stub_server, scenario)
+    assert all(response.status_code == 200 for response in responses)
+    assert stub_server.requests == 5
+    assert stub_server.max_active <= 2
+
+def test_recommendations_without_api_key():
+    [response] = post_queries(None, RecommendationCache(), ["Python"])
+    assert response.status_code == 500
+
+def test_recommendation_model_is_created_in_the_startup_task(monkeypatch):
+    created = threading.Event()
+
+    def slow_create(api_key, base_url=None):
+        # SDKのimportの代わりにスレッドを止める（イベントループのスレッドで呼ばれていないことも確かめる）
+        assert threading.current_thread() is not threading.main_thread()
+        created.wait(5)
+        return "model"
+
+    monkeypatch.setattr(settings, "ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "RECOMMENDATION_READY_TIMEOUT", 0.05)
+    monkeypatch.setattr(recommendation_model, "create_recommendation_model", slow_create)
+
+    async def scenario():
+        opening = asyncio.create_task(recommendation_model.open_recommendation_model())
+        await asyncio.sleep(0)
+        # 準備が終わるまで待ちきれなければ503になり、起動時のタスクは止めない
+        with pytest.raises(HTTPException) as excinfo:
+            await get_recommendation_model()
+        assert excinfo.value.status_code == 503
+        assert not opening.done()
+
+        created.set()
+        assert await get_recommendation_model() == "model"
+        assert await opening == "model"
+        recommendation_model._model = None
+        await recommendation_model.close_recommendation_model()
+
+    asyncio.run(scenario())
+
+def test_normalize_query():
+    assert normalize_query("Python入門") == "python入門"
+    assert normalize_query("  ｐｙｔｈｏｎ 　入門 ") == "python入門"
+    assert normalize_query("Machine   Learning") == "machine learning"
+
+def test_recommendations_cache_normalized_queries(tmp_path):
+    model = FakeModel()
+    path = str(tmp_path / "recommendations.sqlite3")
+    cache = RecommendationCache(max_entries=10, ttl=60, path=path)
+    responses = post_queries(model, cache, ["Python入門", "python 入門 ", "ＰＹＴＨＯＮ入門", "Rust入門"])
+    first = responses[0].json()
+    assert all(response.status_code == 200 for response in responses)
+    assert responses[1].json() == responses[0].json()
+    assert len(model.prompts) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["hit_rate"] == 0.5
+    cache.close()
+
+    # 再起動後もディスクのキャッシュから返す
+    restarted = RecommendationCache(max_entries=10, ttl=60, path=path)
+    [response] = post_queries(model, restarted, ["python入門"])
+    assert response.json() == first
+    assert len(model.prompts) == 2
+    assert restarted.stats()["disk_hits"] == 1
+    restarted.close()
+
+def test_recommendation_cache_purges_expired_rows_periodically(tmp_path):
+    cache = RecommendationCache(max_entries=10, ttl=60, path=str(tmp_path / "recommendations.sqlite3"))
+
+    async def scenario():
+        await cache.set("Python入門", STUB_RECOMMENDATIONS)
+        cache.db.execute("UPDATE recommendations SET expires_at = 0")
+        # 次の掃除の時刻までは書き込みのたびに消さない
+        await cache.set("Rust入門", STUB_RECOMMENDATIONS)
+        assert cache.db.execute("SELECT count(*) FROM recommendations").fetchone()[0] == 2
+        cache.next_purge = 0.0
+        await cache.set("Go入門", STUB_RECOMMENDATIONS)
+        return [row[0] for row in cache.db.execute("SELECT query FROM recommendations ORDER BY query")]
+
+    assert asyncio.run(scenario()) == ["go入門", "rust入門"]
+    cache.close()
+
+def test_recommendations_coalesce_concurrent_queries():
+    model = FakeModel(delay=0.1)
+    flights = SingleFlight()
+    queries = ["Python入門", "python 入門", "ＰＹＴＨＯＮ入門", "Python入門", "Rust入門"]
+    responses = post_queries(model, RecommendationCache(), queries, flights=flights, concurrent=True)
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json() == responses[0].json() for response in responses)
+    assert len(model.prompts) == 2
+    assert flights.stats() == {"in_flight": 0, "calls": 2, "shared": 3}
+
+def test_recommendations_coalesced_errors_are_shared_and_not_cached():
+    model = FakeModel(delay=0.1, error=ValueError("壊れた応答"))
+    cache = RecommendationCache()
+    responses = post_queries(model, cache, ["Python入門"] * 3, concurrent=True)
+    assert [response.status_code for response in responses] == [500] * 3
+    assert len(model.prompts) == 1
+
+    # 失敗した結果は残らず、次のリクエストで改めて問い合わせる
+    model.error = None
+    [response] = post_queries(model, cache, ["Python入門"])
+    assert response.status_code == 200
+    assert len(model.prompts) == 2
+
+def test_recommendations_healthz():
+    with TestClient(app) as client:
+        response = client.get("/api/healthz/recommendations")
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["cache"]) >= {"hits", "misses", "hit_rate"}
+    assert body["flights"] == get_recommendation_flights().stats()
+    assert set(body["flights"]) == {"in_flight", "calls", "shared"}
+
+def test_single_flight_waiter_cancellation():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return "結果"
+
+        first = asyncio.create_task(flights.do("key", fetch))
+        second = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0.01)
+        # 1人がキャンセルしても、もう1人は結果を受け取れる
+        first.cancel()
+        assert await second == "結果"
+        assert first.cancelled()
+
+        # 全員がキャンセルすると呼び出しも止まり、次は新たに呼び出す
+        lone = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0.01)
+        lone.cancel()
+        await asyncio.gather(lone, return_exceptions=True)
+        assert flights.stats()["in_flight"] == 0
+        assert await flights.do("key", fetch) == "結果"
+        return len(calls)
+
+    assert asyncio.run(scenario()) == 3
+
+def test_single_flight_timeout():
+    async def scenario():
+        flights = SingleFlight(timeout=0.05)
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        results = await asyncio.gather(flights.do("key", slow), flights.do("key", slow), return_exceptions=True)
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_recommendations_timeout():
+    responses = post_queries(FakeModel(delay=1), RecommendationCache(), ["Python入門"], flights=SingleFlight(timeout=0.05))
+    assert responses[0].status_code == 504
+
+def test_json_object_stream_parser_one_char_at_a_time():
+    text = (
+        '説明文の"引用"や{括弧}は無視する\n```json\n['
+        '{"title": "波括弧}と[角括弧]", "author": "エスケープ\\"太郎\\"", "reason": "入れ子", "tags": [{"a": 1}]},'
+        '{"title": "二冊目", "author": "花子", "reason": "理由"}'
+        ']\n```\n後書きの{括弧}'
+    )
+    parser = JSONObjectStreamParser()
+    objects = []
+    completed_at = []
+    for i, char in enumerate(text):
+        for item in parser.feed(char):
+            objects.append(item)
+            completed_at.append(i)
+    assert [item["title"] for item in objects] == ["波括弧}と[角括弧]", "二冊目"]
+    assert objects[0]["author"] == 'エスケープ"太郎"'
+    # 1冊目はオブジェクトが閉じた時点で取り出せる
+    assert text[completed_at[0]] == "}" and completed_at[0] < text.index("二冊目")
+
+def test_recommendation_events_first_event_arrives_early():
+    model = FakeModel(delay=0.01)
+    cache = RecommendationCache()
+
+    async def scenario():
+        started = time.perf_counter()
+        events = []
+        first_at = None
+        async for event in recommendation_events("Python入門", model, cache):
+            if first_at is None and event.startswith("event: recommendation"):
+                first_at = time.perf_counter() - started
+            events.append(event)
+        return first_at, time.perf_counter() - started, events
+
+    first_at, total, events = asyncio.run(scenario())
+    assert [event.split("\n")[0] for event in events] == [
+        "event: library", "event: recommendation", "event: recommendation", "event: done"
+    ]
+    # 2冊のうち1冊目は応答の半分ほどが届いた時点で送られる（全体を待たない）
+    assert first_at < total * 0.75
+    assert len(asyncio.run(cache.get("python 入門"))) == 2
+
+def test_stream_recommendations_endpoint():
+    model = FakeModel()
+    cache = RecommendationCache()
+    app.dependency_overrides[get_recommendation_model] = lambda: model
+    app.dependency_overrides[get_recommendation_cache] = lambda: cache
+    app.dependency_overrides[get_catalog_recommender] = lambda: make_catalog()[1]
+    try:
+        with TestClient(app) as client:
+            responses = [client.get("/api/books/recommendations/stream", params={"query": "Python入門"}) for _ in range(2)]
+            model.error = RuntimeError("接続が切れました")
+            failed = client.get("/api/books/recommendations/stream", params={"query": "Rust入門"})
+    finally:
+        app.dependency_overrides = {}
+
+    for response in responses:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+        assert [event["type"] for event in events] == ["library", "recommendation", "recommendation", "done"]
+        assert events[1]["recommendation"]["title"] == "Python入門"
+    # 2回目はキャッシュから返す
+    assert len(model.prompts) == 2
+    assert '"type": "error"' in failed.text
+
+CATALOG_TITLES = [
+    "Python入門", "Pythonによるデータ分析入門", "入門 機械学習", "ミステリー短編集", "日本の歴史", "Rust実践ガイド",
+]
+
+def test_catalog_recommender_ranks_available_books():
+    repository, catalog = make_catalog(*CATALOG_TITLES)
+
+    async def scenario():
+        matches = await catalog.recommend("python 入門", limit=3)
+        assert [match.book.title for match in matches][:2] == ["Python入門", "Pythonによるデータ分析入門"]
+        assert matches[0].score == pytest.approx(1.0)
+        assert all(a.score >= b.score for a, b in zip(matches, matches[1:]))
+        assert await catalog.recommend("量子コンピュータ") == []
+
+        # 貸出中の本は候補から外れ、返却されると戻る
+        await repository.borrow(1, "山田", date(2030, 1, 1))
+        assert "Python入門" not in [match.book.title for match in await catalog.recommend("Python入門")]
+        await repository.return_book(1)
+        assert (await catalog.recommend("Python入門"))[0].book.id == 1
+
+        # 追加・タイトル変更・削除は次の問い合わせで反映される
+        added = await repository.add(Book(id=0, title="量子コンピュータ入門"))
+        assert (await catalog.recommend("量子コンピュータ"))[0].book.id == added.id
+        await repository.update(Book(id=added.id, title="量子力学"))
+        assert [match.book.title for match in await catalog.recommend("量子コンピュータ")] == ["量子力学"]
+        await repository.delete(added.id)
+        assert await catalog.recommend("量子") == []
+
+        # 一括登録はイベントに本が含まれないので読み直す
+        async def books():
+            yield Book(id=0, title="Go言語入門")
+        await repository.bulk_add(books())
+        assert (await catalog.recommend("Go言語"))[0].book.title == "Go言語入門"
+
+        # DBから読み直せなかった通知（本の内容なし）も読み直す
+        repository.repository.add(Book(id=0, title="Rust入門"))
+        catalog.events.publish({"type": "created", "id": 99})
+        assert (await catalog.recommend("Rust"))[0].book.title == "Rust入門"
+
+    asyncio.run(scenario())
+
+def test_catalog_recommender_builds_off_the_event_loop():
+    repository, catalog = make_catalog(*[f"{title} 第{i}巻" for i in range(300) for title in CATALOG_TITLES])
+    # NumPyのimport（拡張モジュールの初期化はGILを持ったまま行われる）は測らない
+    import numpy  # noqa: F401
+
+    async def scenario():
+        gaps = []
+
+        async def ticker():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.001)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        ticking = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        assert await catalog.recommend("Python入門")
+        first_build = catalog.index
+
+        # 作り直している間の問い合わせは前回の索引で答える
+        await repository.add(Book(id=0, title="量子コンピュータ入門"))
+        rebuilding = asyncio.create_task(catalog.recommend("量子コンピュータ"))
+        await asyncio.sleep(0)
+        assert catalog.lock.locked()
+        assert await catalog.recommend("量子コンピュータ") == []
+        assert (await rebuilding)[0].book.title == "量子コンピュータ入門"
+        assert catalog.index is not first_build
+        ticking.cancel()
+        return max(gaps)
+
+    assert asyncio.run(scenario()) < 0.1
+
+def test_recommendations_answered_from_catalog():
+    _, catalog = make_catalog(*CATALOG_TITLES, "Python入門 第2版", "Python入門ドリル")
+    model = FakeModel()
+    [response] = post_queries(model, RecommendationCache(), ["Python入門"], catalog=catalog)
+    assert response.status_code == 200
+    body = response.json()
+    # 蔵書に十分近い本があるのでClaudeには問い合わせない
+    assert model.prompts == []
+    assert body["recommendations"] == []
+    assert body["library_books"][0] == {"id": 1, "title": "Python入門", "score": 1.0}
+
+def test_recommendations_merge_and_fall_back_to_catalog():
+    _, catalog = make_catalog(*CATALOG_TITLES)
+    model = FakeModel()
+    [merged] = post_queries(model, RecommendationCache(), ["機械学習の入門書"], catalog=catalog)
+    assert merged.status_code == 200
+    assert len(merged.json()["recommendations"]) == 2
+    assert merged.json()["library_books"][0]["title"] == "入門 機械学習"
+
+    # Claudeに問い合わせられない場合は蔵書からの推薦だけを返す
+    for failing in (None, FakeModel(error=RuntimeError("接続できません"))):
+        [response] = post_queries(failing, RecommendationCache(), ["機械学習の入門書"], catalog=catalog)
+        assert response.status_code == 200
+        assert response.json()["recommendations"] == []
+        assert response.json()["library_books"] == merged.json()["library_books"]
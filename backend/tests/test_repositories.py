@@ -0,0 +1,232 @@
+import asyncio
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from app.config import settings
+from app.domain.models import Book
+from app.infrastructure.book_events import BookEventBroadcaster
+from app.infrastructure.cache import LRUCache
+from app.infrastructure.caching_repository import CachingBookRepository
+from app.infrastructure.database import configure_connection
+from app.infrastructure.due_date_index import DueDateIndex
+from app.infrastructure.postgres_events import PostgresBookEventListener
+from app.infrastructure.postgres_repository import _search_query
+from app.infrastructure.repositories import InMemoryBookRepository, AsyncInMemoryBookRepository
+
+def make_repository(*titles):
+    repository = InMemoryBookRepository()
+    for title in titles:
+        repository.add(Book(id=0, title=title))
+    return repository
+
+def test_search_japanese_substring():
+    repository = make_repository("吾輩は猫である", "坊っちゃん", "こころ", "猫の事務所")
+
+    result = repository.search(title="猫")
+    assert [book.title for book in result] == ["吾輩は猫である", "猫の事務所"]
+
+    result = repository.search(title="猫であ")
+    assert [book.title for book in result] == ["吾輩は猫である"]
+
+def test_search_normalizes_width_and_case():
+    repository = make_repository("Python入門", "ﾌﾟﾛｸﾞﾗﾐﾝｸﾞ言語", "Rust")
+
+    assert [book.title for book in repository.search(title="ＰＹＴＨＯＮ")] == ["Python入門"]
+    assert [book.title for book in repository.search(title="プログラミング")] == ["ﾌﾟﾛｸﾞﾗﾐﾝｸﾞ言語"]
+    assert [book.title for book in repository.search(title="r")] == ["Rust"]
+
+def test_search_index_follows_update_and_delete():
+    repository = make_repository("リファクタリング", "テスト駆動開発")
+    book = repository.search(title="リファクタ")[0]
+
+    book.borrow("山田太郎", date.today() + timedelta(days=7))
+    repository.update(book)
+    assert repository.search(borrower_name="山田") == [book]
+
+    book.return_book()
+    repository.update(book)
+    assert repository.search(borrower_name="山田") == []
+
+    repository.delete(book.id)
+    assert repository.search(title="リファクタ") == []
+    assert [b.title for b in repository.search(title="開発")] == ["テスト駆動開発"]
+
+def test_caching_repository_hits_and_invalidation():
+    backend = AsyncInMemoryBookRepository(make_repository("キャッシュ入門", "キャッシュ設計"))
+    repository = CachingBookRepository(backend, max_entries=10, ttl=60)
+
+    async def scenario():
+        assert len(await repository.search(title="キャッシュ")) == 2
+        assert len(await repository.search(title="キャッシュ")) == 2
+        assert (await repository.get_by_id(1)).title == "キャッシュ入門"
+        assert (await repository.get_by_id(1)).borrower_name is None
+
+        await repository.borrow(1, "佐藤", date.today() + timedelta(days=7))
+        assert (await repository.get_by_id(1)).borrower_name == "佐藤"
+        assert [book.id for book in await repository.search(borrower_name="佐藤")] == [1]
+
+        await repository.add(Book(id=0, title="キャッシュ運用"))
+        assert len(await repository.search(title="キャッシュ")) == 3
+
+    asyncio.run(scenario())
+    stats = repository.stats()
+    assert stats["searches"]["hits"] == 1
+    assert stats["books"]["hits"] == 1
+
+def test_caching_repository_drops_entries_when_catalog_version_moves():
+    backend = AsyncInMemoryBookRepository(make_repository("版の本"))
+    repository = CachingBookRepository(backend, max_entries=10, ttl=60)
+
+    async def scenario():
+        await repository.get_catalog_version()
+        assert (await repository.get_by_id(1)).borrower_name is None
+        assert len(await repository.search(borrower_name="高橋")) == 0
+
+        # 他のプロセスの書き込み（このキャッシュを通らない）
+        await backend.borrow(1, "高橋", date.today() + timedelta(days=7))
+        assert (await repository.get_by_id(1)).borrower_name is None
+
+        # 新しいバージョンを読んだら、それより前にキャッシュしたものは返さない
+        await repository.get_catalog_version()
+        assert (await repository.get_by_id(1)).borrower_name == "高橋"
+        assert len(await repository.search(borrower_name="高橋")) == 1
+
+        # バージョンが変わらなければキャッシュを使い続ける
+        await repository.get_catalog_version()
+        assert (await repository.get_by_id(1)).borrower_name == "高橋"
+
+    asyncio.run(scenario())
+    assert repository.stats()["books"]["hits"] == 2
+
+class ILikeBookRepository(AsyncInMemoryBookRepository):
+    """PostgreSQLのILIKEと同じく、大文字・小文字だけを区別せずに比較する（全角・半角は正規化しない）"""
+
+    async def search(self, title=None, borrower_name=None, limit=None, rank=False, after=None):
+        books = [
+            book for book in await self.get_all()
+            if (not title or title.lower() in book.title.lower())
+            and (not borrower_name or (book.borrower_name and borrower_name.lower() in book.borrower_name.lower()))
+            and (after is None or book.id > after)
+        ]
+        return books if limit is None else books[:limit]
+
+def test_caching_repository_matches_like_the_wrapped_repository():
+    backend = ILikeBookRepository(make_repository("Python入門", "ＰＹＴＨＯＮ実践"))
+    repository = CachingBookRepository(backend, max_entries=10, ttl=60)
+
+    async def scenario():
+        assert [book.title for book in await repository.search(title="python")] == ["Python入門"]
+        assert [book.title for book in await repository.search(title="ＰＹＴＨＯＮ")] == ["ＰＹＴＨＯＮ実践"]
+        assert [book.title for book in await repository.search(title="ＰＹＴＨＯＮ")] == ["ＰＹＴＨＯＮ実践"]
+        # 大文字・小文字だけが違う本が追加されたら、どちらの比較でも一致しうる検索を無効にする
+        await repository.add(Book(id=0, title="PYTHON応用"))
+        assert [book.title for book in await repository.search(title="python")] == ["Python入門", "PYTHON応用"]
+        await repository.add(Book(id=0, title="ｐｙｔｈｏｎ辞典"))
+        assert [book.title for book in await repository.search(title="ＰＹＴＨＯＮ")] == ["ＰＹＴＨＯＮ実践", "ｐｙｔｈｏｎ辞典"]
+
+    asyncio.run(scenario())
+    assert repository.stats()["searches"]["hits"] == 1
+
+def test_caching_repository_indexes_searches_by_book_and_filter():
+    backend = AsyncInMemoryBookRepository(make_repository("索引本1", "索引本2", "別の本"))
+    repository = CachingBookRepository(backend, max_entries=10, ttl=60, max_searches=2)
+
+    async def scenario():
+        await repository.search(title="索引")
+        await repository.search(title="別")
+        assert set(repository.searches_by_book) == {1, 2, 3}
+        # 書き込まれた本を含まない、条件にも一致しない検索は残る
+        await repository.update(await repository.get_by_id(3))
+        assert repository.searches.stats()["size"] == 1
+        assert set(repository.searches_by_book) == {1, 2}
+        # 追い出された検索は索引からも消える
+        await repository.search(title="別")
+        await repository.search(title="本", after=2)
+        assert set(repository.searches_by_book) == {3}
+        assert set(repository.searches_by_filter) == {("別", None), ("本", None)}
+
+    asyncio.run(scenario())
+
+def test_lru_cache_eviction_and_ttl():
+    now = [0.0]
+    cache = LRUCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_in_memory_repository_publishes_change_events():
+    events = BookEventBroadcaster()
+    repository = AsyncInMemoryBookRepository(events=events)
+
+    async def scenario():
+        with events.subscribe() as queue:
+            book = await repository.add(Book(id=0, title="イベント本"))
+            await repository.borrow(book.id, "鈴木", date(2030, 1, 1))
+            await repository.delete(book.id)
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    received = asyncio.run(scenario())
+    assert [(event["type"], event["id"]) for event in received] == [("created", 1), ("updated", 1), ("deleted", 1)]
+    assert received[1]["book"]["borrower_name"] == "鈴木"
+    assert received[1]["book"]["return_date"] == "2030-01-01"
+    assert events.subscribers == set()
+
+def test_postgres_listener_reloads_changed_books():
+    repository = AsyncInMemoryBookRepository(make_repository("通知本"))
+    listener = PostgresBookEventListener("", BookEventBroadcaster(), repository.get_by_id)
+
+    async def scenario():
+        return [
+            await listener.event_from_payload('{"type": "updated", "id": 1}'),
+            await listener.event_from_payload('{"type": "created", "id": 99}'),
+            await listener.event_from_payload('{"type": "deleted", "id": 2}'),
+            await listener.event_from_payload("not json"),
+        ]
+
+    updated, missing, deleted, invalid = asyncio.run(scenario())
+    assert updated["book"]["title"] == "通知本"
+    assert missing is None
+    assert deleted == {"type": "deleted", "id": 2}
+    assert invalid is None
+
+def test_postgres_search_query_text_is_stable_per_shape():
+    # プリペアドステートメントはSQLの内容ごとに作られるので、同じ条件の組み合わせなら同じ文になる
+    query = _search_query(True, False, True, False, True)
+    assert _search_query(True, False, True, False, True) == query
+    assert query.count("%s") == 3
+    assert _search_query(True, True, False, True, True).count("%s") == 5
+    assert "similarity" not in _search_query(False, False, False, True, False)
+
+def test_configure_connection_applies_prepare_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_PREPARE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "DB_PREPARED_MAX", 50)
+    conn = SimpleNamespace(prepare_threshold=5, prepared_max=100)
+    asyncio.run(configure_connection(conn))
+    assert (conn.prepare_threshold, conn.prepared_max) == (2, 50)
+
+    # 負の値ではプリペアドステートメントを使わない
+    monkeypatch.setattr(settings, "DB_PREPARE_THRESHOLD", -1)
+    asyncio.run(configure_connection(conn))
+    assert conn.prepare_threshold is None
+
+def test_due_date_index_orders_by_date_then_id():
+    index = DueDateIndex()
+    index.add(3, date(2030, 1, 2))
+    index.add(1, date(2030, 1, 2))
+    index.add(2, date(2030, 1, 1))
+    index.add(4, None)
+    assert index.before(date(2030, 1, 3)) == [2, 1, 3]
+    assert index.before(date(2030, 1, 2)) == [2]
+    assert index.before(date(2030, 1, 3), limit=2) == [2, 1]
+
+    index.update(2, date(2030, 1, 5))
+    index.remove(3)
+    assert index.before(date(2031, 1, 1)) == [1, 2]
+    assert index.before(date(2030, 1, 1)) == []
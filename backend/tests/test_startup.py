@@ -0,0 +1,68 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.infrastructure import database
+from app.main import app
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def test_import_does_not_load_heavy_sdks():
+    # 起動時には使わないSDKは、最初に使うときまで読み込まない
+    script = "import sys, app.main; print(' '.join(sorted({m.split('.')[0] for m in sys.modules})))"
+    env = dict(os.environ, TEST_MODE="1")
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    loaded = set(result.stdout.split())
+    assert loaded.isdisjoint({"anthropic", "github", "psycopg", "psycopg_pool", "numpy"})
+
+def test_startup_does_not_wait_for_slow_database(monkeypatch):
+    # 接続は受け付けるが何も応答しないDB
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(16)
+    port = server.getsockname()[1]
+    monkeypatch.setattr(database, "is_test_mode", False)
+    monkeypatch.setattr(settings, "DATABASE_URL", f"postgresql://library@127.0.0.1:{port}/library?connect_timeout=1")
+    monkeypatch.setattr(settings, "DB_CONNECT_TIMEOUT", 1)
+    monkeypatch.setattr(settings, "ANTHROPIC_API_KEY", "")
+
+    async def scenario():
+        started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter() - started
+            assert database.get_pool() is not None
+        return ready
+
+    try:
+        assert asyncio.run(scenario()) < 0.5
+    finally:
+        server.close()
+
+def test_init_db_closes_connection_when_ddl_fails(monkeypatch):
+    class FailingConnection:
+        closed = False
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self.closed = True
+
+        def cursor(self):
+            raise RuntimeError("DDLに失敗しました")
+
+    conn = FailingConnection()
+    monkeypatch.setattr(database, "is_test_mode", False)
+    monkeypatch.setattr(settings, "DATABASE_URL", "postgresql://library@127.0.0.1/library")
+    monkeypatch.setattr(database, "get_connection", lambda: conn)
+    with pytest.raises(RuntimeError):
+        database.init_db()
+    assert conn.closed
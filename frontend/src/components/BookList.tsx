@@ -32,12 +32,19 @@ export function BookList({
   const [borrowerSearch, setBorrowerSearch] = useState('');
   const [loading, setLoading] = useState(false);
   const [titleSortOrder, setTitleSortOrder] = useState<SortOrder>(null);
+  // 続きのページを読むためのカーソルと、そのときの検索条件
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [query, setQuery] = useState<{ title?: string; borrowerName?: string }>({});
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const loadBooks = async () => {
+    const newQuery = { title: titleSearch || undefined, borrowerName: borrowerSearch || undefined };
     setLoading(true);
     try {
-      const data = await fetchBooks(titleSearch || undefined, borrowerSearch || undefined);
-      setBooks(data);
+      const page = await fetchBooks(newQuery.title, newQuery.borrowerName);
+      setBooks(page.books);
+      setNextCursor(page.nextCursor);
+      setQuery(newQuery);
     } catch (error) {
       console.error('Failed to fetch books:', error);
     } finally {
@@ -45,6 +52,20 @@ export function BookList({
     }
   };
 
+  const loadMoreBooks = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchBooks(query.title, query.borrowerName, nextCursor);
+      setBooks((current) => [...current, ...page.books]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Failed to fetch books:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleTitleSort = () => {
     let newSortOrder: SortOrder;
     if (titleSortOrder === null) {
@@ -194,6 +215,13 @@ export function BookList({
             </TableBody>
           </Table>
         )}
+        {!loading && nextCursor && (
+          <div className="text-center mt-4">
+            <Button variant="outline" onClick={loadMoreBooks} disabled={loadingMore}>
+              {loadingMore ? '読み込み中...' : 'さらに読み込む'}
+            </Button>
+          </div>
+        )}
       </CardContent>
     </Card>
   );
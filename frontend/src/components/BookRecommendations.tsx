@@ -2,14 +2,15 @@ import { useState } from 'react';
 import { Button } from './ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/card';
 import { Textarea } from './ui/textarea';
-import { Loader2, ExternalLink, Sparkles } from 'lucide-react';
-import { getBookRecommendations } from '../lib/api';
-import { BookRecommendation } from '../types/recommendation';
+import { Loader2, ExternalLink, Sparkles, Library } from 'lucide-react';
+import { streamBookRecommendations } from '../lib/api';
+import { BookRecommendation, LibraryBookRecommendation } from '../types/recommendation';
 import { Alert, AlertDescription } from './ui/alert';
 
 export const BookRecommendations = () => {
   const [query, setQuery] = useState('');
   const [recommendations, setRecommendations] = useState<BookRecommendation[]>([]);
+  const [libraryBooks, setLibraryBooks] = useState<LibraryBookRecommendation[]>([]);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
@@ -20,10 +21,17 @@ export const BookRecommendations = () => {
     setIsLoading(true);
     setError(null);
     setRecommendations([]);
+    setLibraryBooks([]);
 
     try {
-      const response = await getBookRecommendations(query.trim());
-      setRecommendations(response.recommendations);
+      // 1冊ずつ届いた順に表示する
+      await streamBookRecommendations(
+        query.trim(),
+        (recommendation) => {
+          setRecommendations((current) => [...current, recommendation]);
+        },
+        setLibraryBooks
+      );
     } catch (err) {
       setError(err instanceof Error ? err.message : 'おすすめ書籍の取得に失敗しました');
     } finally {
@@ -104,6 +112,24 @@ export const BookRecommendations = () => {
         </Alert>
       )}
 
+      {libraryBooks.length > 0 && (
+        <div className="space-y-4">
+          <h3 className="text-lg font-semibold flex items-center gap-2">
+            <Library className="h-5 w-5" />
+            図書館で今すぐ借りられる本
+          </h3>
+          <div className="grid gap-2">
+            {libraryBooks.map((book) => (
+              <Card key={book.id}>
+                <CardHeader className="py-3">
+                  <CardTitle className="text-base">{book.title}</CardTitle>
+                </CardHeader>
+              </Card>
+            ))}
+          </div>
+        </div>
+      )}
+
       {recommendations.length > 0 && (
         <div className="space-y-4">
           <h3 className="text-lg font-semibold">おすすめ書籍</h3>
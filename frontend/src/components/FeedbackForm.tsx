@@ -49,7 +49,9 @@ export function FeedbackForm({ onSuccess }: FeedbackFormProps) {
       
       const successMessage = result.github_issue_url 
         ? 'フィードバックを送信し、GitHub Issueを作成しました！'
-        : 'フィードバックを送信しました！';
+        : result.github_issue_status === 'pending'
+          ? 'フィードバックを送信しました！GitHub Issueはまもなく作成されます。'
+          : 'フィードバックを送信しました！';
       
       setSuccess({
         message: successMessage,
@@ -3,6 +3,7 @@ import { fetchFeedbacks } from '../lib/api';
 import { Feedback } from '../types/feedback';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
+import { Button } from './ui/button';
 import { ExternalLink } from 'lucide-react';
 import { format } from 'date-fns';
 
@@ -13,6 +14,9 @@ interface FeedbackListProps {
 export function FeedbackList({ refreshTrigger }: FeedbackListProps) {
   const [feedbacks, setFeedbacks] = useState<Feedback[]>([]);
   const [loading, setLoading] = useState(false);
+  // 続きのページ（より古いフィードバック）を読むためのカーソル
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadFeedbacks();
@@ -21,8 +25,9 @@ export function FeedbackList({ refreshTrigger }: FeedbackListProps) {
   const loadFeedbacks = async () => {
     setLoading(true);
     try {
-      const data = await fetchFeedbacks();
-      setFeedbacks(data);
+      const page = await fetchFeedbacks();
+      setFeedbacks(page.feedbacks);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Failed to fetch feedbacks:', error);
     } finally {
@@ -30,6 +35,20 @@ export function FeedbackList({ refreshTrigger }: FeedbackListProps) {
     }
   };
 
+  const loadMoreFeedbacks = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchFeedbacks(nextCursor);
+      setFeedbacks((current) => [...current, ...page.feedbacks]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Failed to fetch feedbacks:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getCategoryBadgeColor = (category: string) => {
     switch (category) {
       case 'bug':
@@ -113,6 +132,13 @@ export function FeedbackList({ refreshTrigger }: FeedbackListProps) {
             ))}
           </div>
         )}
+        {nextCursor && (
+          <div className="text-center mt-4">
+            <Button variant="outline" onClick={loadMoreFeedbacks} disabled={loadingMore}>
+              {loadingMore ? '読み込み中...' : 'さらに読み込む'}
+            </Button>
+          </div>
+        )}
       </CardContent>
     </Card>
   );
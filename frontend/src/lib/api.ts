@@ -1,26 +1,27 @@
-import { Book } from '../types/book';
-import { Feedback, FeedbackCreate, FeedbackCategory } from '../types/feedback';
-import { RecommendationResponse } from '../types/recommendation';
+import { Book, BookPage } from '../types/book';
+import { Feedback, FeedbackCreate, FeedbackCategory, FeedbackPage } from '../types/feedback';
+import { BookRecommendation, LibraryBookRecommendation, RecommendationResponse } from '../types/recommendation';
 
 // バックエンドがプレフィックスを付与するのでAPIのURLを明示的に指定
 const API_URL = '/api';
 
-export const fetchBooks = async (title?: string, borrowerName?: string): Promise<Book[]> => {
-  let url = `${API_URL}/books/`;
+// 一覧を1回に読む件数（続きは前のページのnextCursorを渡して読む）
+const BOOKS_PAGE_SIZE = 100;
+const FEEDBACK_PAGE_SIZE = 50;
+
+export const fetchBooks = async (title?: string, borrowerName?: string, after?: string): Promise<BookPage> => {
   const params = new URLSearchParams();
   
   if (title) params.append('title', title);
   if (borrowerName) params.append('borrower_name', borrowerName);
+  if (after) params.append('after', after);
+  params.append('limit', String(BOOKS_PAGE_SIZE));
   
-  if (params.toString()) {
-    url += `?${params.toString()}`;
-  }
-  
-  const response = await fetch(url);
+  const response = await fetch(`${API_URL}/books/?${params.toString()}`);
   if (!response.ok) {
     throw new Error('Failed to fetch books');
   }
-  return response.json();
+  return { books: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
 };
 
 export const fetchBook = async (id: number): Promise<Book> => {
@@ -85,12 +86,15 @@ export const deleteBook = async (id: number): Promise<void> => {
 };
 
 // フィードバック関連のAPI
-export const fetchFeedbacks = async (): Promise<Feedback[]> => {
-  const response = await fetch(`${API_URL}/feedback/`);
+export const fetchFeedbacks = async (before?: string): Promise<FeedbackPage> => {
+  const params = new URLSearchParams({ limit: String(FEEDBACK_PAGE_SIZE) });
+  if (before) params.append('before', before);
+  
+  const response = await fetch(`${API_URL}/feedback/?${params.toString()}`);
   if (!response.ok) {
     throw new Error('Failed to fetch feedbacks');
   }
-  return response.json();
+  return { feedbacks: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
 };
 
 export const createFeedback = async (feedback: FeedbackCreate): Promise<Feedback> => {
@@ -133,3 +137,31 @@ export const getBookRecommendations = async (query: string): Promise<Recommendat
   }
   return response.json();
 };
+
+// おすすめ書籍を1冊ずつ受け取る（Server-Sent Events）。最初に蔵書からの推薦が届く。受け取った冊数を返す
+export const streamBookRecommendations = (
+  query: string,
+  onRecommendation: (recommendation: BookRecommendation) => void,
+  onLibraryBooks: (books: LibraryBookRecommendation[]) => void
+): Promise<number> => {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_URL}/books/recommendations/stream?${new URLSearchParams({ query })}`);
+
+    source.addEventListener('library', (event) => {
+      onLibraryBooks(JSON.parse((event as MessageEvent).data).books);
+    });
+    source.addEventListener('recommendation', (event) => {
+      onRecommendation(JSON.parse((event as MessageEvent).data).recommendation);
+    });
+    source.addEventListener('done', (event) => {
+      source.close();
+      resolve(JSON.parse((event as MessageEvent).data).count);
+    });
+    source.addEventListener('error', (event) => {
+      source.close();
+      // サーバーが送ったerrorイベントには詳細がある。接続自体の失敗にはない
+      const data = (event as MessageEvent).data;
+      reject(new Error(data ? JSON.parse(data).detail : 'Failed to get book recommendations'));
+    });
+  });
+};
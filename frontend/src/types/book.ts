@@ -4,3 +4,9 @@ export interface Book {
   borrower_name: string | null;
   return_date: string | null;
 }
+
+// 一覧の1ページ分（nextCursorがあれば続きのページがある）
+export interface BookPage {
+  books: Book[];
+  nextCursor: string | null;
+}
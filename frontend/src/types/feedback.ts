@@ -6,6 +6,13 @@ export interface Feedback {
   author_name: string;
   created_at: string;
   github_issue_url?: string;
+  github_issue_status?: 'pending' | 'sending' | 'created' | 'failed' | 'skipped';
+}
+
+// 一覧の1ページ分（nextCursorがあれば続きのページがある）
+export interface FeedbackPage {
+  feedbacks: Feedback[];
+  nextCursor: string | null;
 }
 
 export interface FeedbackCreate {
@@ -5,10 +5,18 @@ export interface BookRecommendation {
   recommendation_reason: string;
 }
 
+// 蔵書にある貸出可能な本（scoreは問い合わせとの類似度）
+export interface LibraryBookRecommendation {
+  id: number;
+  title: string;
+  score: number;
+}
+
 export interface RecommendationRequest {
   query: string;
 }
 
 export interface RecommendationResponse {
   recommendations: BookRecommendation[];
+  library_books: LibraryBookRecommendation[];
 }
\ No newline at end of file